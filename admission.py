@@ -0,0 +1,246 @@
+"""
+        Admission control: per-tenant rate limits, payload limits and load shedding, per lane.
+
+        Every /metrics route belongs to a lane. "fit" covers fit, update and fit sessions, which
+        run on their own small compute pool; "detect" covers everything else, on the main pool.
+        A request is checked in this order, each step before any work is spent on it:
+            1. body size      Content-Length (or the bytes read so far) over the lane's limit → 413
+            2. load           the lane's pool has a full queue, or queued jobs wait longer than
+                              the target on average → 503 with Retry-After
+            3. rate           the tenant's token bucket for the lane is empty → 429 with Retry-After
+            4. rows           more rows than the lane allows, once the body is parsed → 413
+        A tenant is an API key plus a user_token. The user_token is read from the query string
+        here, or from the parsed body by admit() in the body dependencies; routes with neither
+        are bounded by the lane's limits and pool only.
+
+        A WebSocket handshake goes through steps 2 and 3 and is closed with code 1013 (try again
+        later) when turned away. Every frame after it is then checked by admit_frame() against
+        steps 3 and 4, so a connection spends one token per frame from the same bucket as the
+        tenant's requests, and a refused frame gets an error record while the socket stays open.
+
+        Buckets refill continuously at `rate` tokens per second up to `burst`, and one request
+        takes one token. They are kept per process for the most recent RATE_LIMIT_MAX_TENANTS
+        tenants, so with N workers a tenant gets up to N times the configured rate.
+"""
+import math
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from config import (RATE_LIMIT_FIT_PER_SECOND, RATE_LIMIT_FIT_BURST, RATE_LIMIT_DETECT_PER_SECOND, RATE_LIMIT_DETECT_BURST,
+                    MAX_FIT_BODY_BYTES, MAX_DETECT_BODY_BYTES, MAX_FIT_ROWS, MAX_DETECT_ROWS)
+from executor import compute_executor, fit_executor
+from telemetry import Counter, GaugeCallback, registry
+
+RATE_LIMIT_MAX_TENANTS = 10000
+# Close code for a WebSocket handshake turned away by load or rate limits.
+TRY_AGAIN_LATER = 1013
+FIT_ROUTES = ("/metrics/anomaly/fit", "/metrics/anomaly/update")
+
+rejected_total = registry.register(Counter(
+    "anomaly_admission_rejected_total", "Requests turned away by admission control, by lane and reason.", ("lane", "reason")))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost=1.0):
+        """Takes cost tokens and returns 0, or returns the seconds until they are available and takes nothing."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets of the most recently seen tenants; a rate of 0 admits everything."""
+
+    def __init__(self, rate, burst, max_tenants=RATE_LIMIT_MAX_TENANTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_tenants = max_tenants
+        self._buckets = OrderedDict()
+
+    def acquire(self, tenant):
+        """0 when the tenant may go ahead, otherwise the seconds to wait."""
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+        return bucket.take()
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class Lane:
+    def __init__(self, name, executor, limiter, max_body_bytes, max_rows):
+        self.name = name
+        self.executor = executor
+        self.limiter = limiter
+        self.max_body_bytes = max_body_bytes
+        self.max_rows = max_rows
+
+    def stats(self):
+        executor = self.executor
+        return {"in_flight": executor.in_flight, "queued": executor.queued,
+                "capacity": executor.max_workers + executor.max_queued, "wait_seconds": executor.wait}
+
+
+lanes = {
+    "fit": Lane("fit", fit_executor, RateLimiter(RATE_LIMIT_FIT_PER_SECOND, RATE_LIMIT_FIT_BURST),
+                MAX_FIT_BODY_BYTES, MAX_FIT_ROWS),
+    "detect": Lane("detect", compute_executor, RateLimiter(RATE_LIMIT_DETECT_PER_SECOND, RATE_LIMIT_DETECT_BURST),
+                   MAX_DETECT_BODY_BYTES, MAX_DETECT_ROWS),
+}
+registry.register(GaugeCallback(
+    "anomaly_admission_queue", "Compute jobs running and queued, queue capacity and smoothed queue wait, by lane.",
+    ("lane", "stat"), lambda: {(lane.name, name): value for lane in lanes.values() for name, value in lane.stats().items()}))
+
+
+def lane_for(path):
+    """The lane of a request path, None for routes outside admission control (health checks, the exporter)."""
+    if not path.startswith("/metrics/"):
+        return None
+    return lanes["fit"] if path.startswith(FIT_ROUTES) else lanes["detect"]
+
+
+def _retry_seconds(seconds):
+    return max(1, math.ceil(seconds))
+
+
+def _retry_after(seconds):
+    return {"Retry-After": str(_retry_seconds(seconds))}
+
+
+def _charge(lane, api_key, user_token):
+    # Query strings carry the user_token as text, bodies as a number; both name the same tenant.
+    wait = lane.limiter.acquire((api_key, str(user_token)))
+    if wait > 0:
+        rejected_total.inc(lane.name, "rate_limited")
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=_retry_after(wait))
+
+
+def admit(request, user_token, rows=None):
+    """
+    Applies the row limit and, unless the query string already named the tenant, the rate limit
+    to a parsed body. Raises HTTPException 413 or 429.
+    """
+    admission = request.scope.get("admission")
+    if admission is None:
+        return
+    lane = admission["lane"]
+    if rows is not None and rows > lane.max_rows:
+        rejected_total.inc(lane.name, "too_large")
+        raise HTTPException(status_code=413, detail=f"Too many rows, at most {lane.max_rows} per request")
+    if not admission["charged"] and user_token is not None:
+        admission["charged"] = True
+        _charge(lane, admission["api_key"], user_token)
+
+
+def admit_frame(scope, rows):
+    """
+    Applies the row and rate limits to one WebSocket frame. Returns None when it may be scored,
+    otherwise the error record to answer it with.
+    """
+    admission = scope.get("admission")
+    if admission is None:
+        return None
+    lane = admission["lane"]
+    if rows > lane.max_rows:
+        rejected_total.inc(lane.name, "too_large")
+        return {"error": f"Too many rows, at most {lane.max_rows} per request"}
+    wait = lane.limiter.acquire((admission["api_key"], admission["user_token"]))
+    if wait > 0:
+        rejected_total.inc(lane.name, "rate_limited")
+        return {"error": "Rate limit exceeded", "retry_after": _retry_seconds(wait)}
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware turning requests away before their body is read; see the module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        lane = lane_for(scope["path"]) if scope["type"] in ("http", "websocket") else None
+        if lane is None:
+            return await self.app(scope, receive, send)
+        if scope["type"] == "websocket":
+            return await self._handshake(scope, receive, send, lane)
+
+        # Streams are long-lived by design and read in bounded chunks.
+        streaming = scope["path"].endswith("/stream")
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if not streaming and length is not None and int(length) > lane.max_body_bytes:
+            return await self._reject(scope, receive, send, lane, "too_large", 413,
+                                      f"Request body too large, at most {lane.max_body_bytes} bytes")
+        reason = lane.executor.overloaded()
+        if reason is not None:
+            return await self._reject(scope, receive, send, lane, reason, 503, "Server overloaded, retry later",
+                                      _retry_after(lane.executor.wait))
+
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        query = scope["query_string"]
+        user_token = parse_qs(query.decode("latin-1")).get("user_token", [None])[0] if b"user_token=" in query else None
+        scope["admission"] = {"lane": lane, "api_key": api_key, "charged": user_token is not None}
+        if user_token is not None:
+            wait = lane.limiter.acquire((api_key, user_token))
+            if wait > 0:
+                return await self._reject(scope, receive, send, lane, "rate_limited", 429, "Rate limit exceeded",
+                                          _retry_after(wait))
+
+        if streaming or length is not None:
+            return await self.app(scope, receive, send)
+        # Without a Content-Length the body is counted as it is read.
+        received = 0
+
+        async def bounded_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > lane.max_body_bytes:
+                rejected_total.inc(lane.name, "too_large")
+                raise HTTPException(status_code=413, detail=f"Request body too large, at most {lane.max_body_bytes} bytes")
+            return message
+
+        await self.app(scope, bounded_receive, send)
+
+    async def _handshake(self, scope, receive, send, lane):
+        headers = dict(scope["headers"])
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        user_token = parse_qs(scope["query_string"].decode("latin-1")).get("user_token", [None])[0]
+        reason = lane.executor.overloaded()
+        if reason is not None:
+            return await self._close(send, lane, reason, "Server overloaded, retry later")
+        if user_token is not None and lane.limiter.acquire((api_key, user_token)) > 0:
+            return await self._close(send, lane, "rate_limited", "Rate limit exceeded")
+        scope["admission"] = {"lane": lane, "api_key": api_key, "user_token": user_token, "charged": True}
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _close(send, lane, reason, detail):
+        rejected_total.inc(lane.name, reason)
+        await send({"type": "websocket.close", "code": TRY_AGAIN_LATER, "reason": detail})
+
+    @staticmethod
+    async def _reject(scope, receive, send, lane, reason, status_code, detail, headers=None):
+        rejected_total.inc(lane.name, reason)
+        await JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)(scope, receive, send)
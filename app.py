@@ -1,10 +1,135 @@
-from fastapi import FastAPI
-from routes import router
+import time
 
-app = FastAPI()
+STARTED = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from cache import model_cache
+from db import store
+from admission import AdmissionMiddleware
+from executor import ComputeOverloaded, compute_executor
+from config import (SERVICE_WORKERS, LAST_USED_FLUSH_SECONDS, WARM_UP_MODELS, WARM_UP_TIMEOUT, MODEL_TTL_SECONDS,
+                    MODEL_EXPIRY_SWEEP_SECONDS, MODEL_CATALOG_MAX_PAGE, SEQUENTIAL_CHECKPOINT_SECONDS)
+from routes import anomaly_service, drift_service, sequential_service, router
+from shared_models import shared_models
+from telemetry import GaugeCallback, MetricsMiddleware, registry
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules (SciPy) are imported on first use, so this is mostly FastAPI and NumPy.
+IMPORT_SECONDS = time.perf_counter() - STARTED
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.startup = {"ready": False, "warmed_models": 0, "import_seconds": IMPORT_SECONDS}
+    await store.connect()
+    # Liveness answers at once; readiness waits for the warm-up, which runs next to the server.
+    warming = asyncio.create_task(_warm_up(app.state.startup))
+    flushing = asyncio.create_task(_flush_last_used())
+    checkpointing = asyncio.create_task(_checkpoint_sequential())
+    expiring = asyncio.create_task(_expire_models()) if MODEL_TTL_SECONDS > 0 and not store.expires_models else None
+    yield
+    warming.cancel()
+    flushing.cancel()
+    checkpointing.cancel()
+    if expiring is not None:
+        expiring.cancel()
+    await anomaly_service.flush_last_used()
+    await drift_service.flush_monitors()
+    await sequential_service.flush_monitors()
+    await store.close()
+
+async def _warm_up(startup):
+    try:
+        await store.create_indexes()
+    except Exception:
+        # Requests still work without them, only slower; the next start tries again.
+        logger.exception("Could not create storage indexes")
+    if WARM_UP_MODELS > 0:
+        try:
+            startup["warmed_models"] = await asyncio.wait_for(anomaly_service.warm_up(WARM_UP_MODELS), WARM_UP_TIMEOUT)
+        except Exception:
+            # Models still load on demand; a failed warm-up only costs the first requests some latency.
+            logger.exception("Model warm-up failed")
+    startup["ready"] = True
+    startup["ready_seconds"] = time.perf_counter() - STARTED
+
+async def _flush_last_used():
+    while True:
+        await asyncio.sleep(LAST_USED_FLUSH_SECONDS)
+        try:
+            await anomaly_service.flush_last_used()
+        except Exception:
+            logger.exception("Could not record model last_used times")
+
+async def _checkpoint_sequential():
+    while True:
+        await asyncio.sleep(SEQUENTIAL_CHECKPOINT_SECONDS)
+        try:
+            await sequential_service.flush_monitors()
+        except Exception:
+            logger.exception("Could not checkpoint sequential detectors")
+
+async def _expire_models():
+    while True:
+        await asyncio.sleep(MODEL_EXPIRY_SWEEP_SECONDS)
+        try:
+            # Every expired model goes, one page per pass until none is left.
+            while len(await anomaly_service.delete_unused_models(None, MODEL_TTL_SECONDS, MODEL_CATALOG_MAX_PAGE)) == MODEL_CATALOG_MAX_PAGE:
+                pass
+        except Exception:
+            logger.exception("Could not delete expired models")
+
+app = FastAPI(lifespan=lifespan)
+# Added first so it runs inside MetricsMiddleware, which then counts the rejected requests too.
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(router)
 
+# Gauges are read at scrape time, so they cost nothing on the request path.
+registry.register(GaugeCallback(
+    "anomaly_model_cache", "Model cache size, hits, misses, evictions and hit rate.", ("stat",),
+    lambda: {(name,): value for name, value in model_cache.stats().items()}))
+registry.register(GaugeCallback(
+    "anomaly_compute_jobs", "Compute executor jobs running or waiting for a worker.", ("state",),
+    lambda: {("in_flight",): compute_executor.in_flight, ("queued",): compute_executor.queued}))
+registry.register(GaugeCallback(
+    "anomaly_storage_pool_connections", "Storage connection pool usage.", ("stat",),
+    lambda: {(name,): value for name, value in store.pool_stats().items()}))
+
+if shared_models is not None:
+    registry.register(GaugeCallback(
+        "anomaly_shared_models", "Model parameter segments shared between worker processes.", ("stat",),
+        lambda: {(name,): value for name, value in shared_models.stats().items()}))
+
+registry.register(GaugeCallback(
+    "anomaly_startup", "Import and time-to-ready seconds, readiness and models loaded by the warm-up.", ("stat",),
+    lambda: {(name,): float(value) for name, value in getattr(app.state, "startup", {}).items()}))
+
+@app.get("/healthz")
+async def liveness():
+    """The process is up and its event loop answers; no I/O, so a slow store never restarts the pod."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Ready once the store answers and the warm-up has finished."""
+    startup = getattr(app.state, "startup", {"ready": False})
+    connected = await store.ping()
+    status = "ready" if startup["ready"] and connected else "starting" if connected else "store unavailable"
+    return JSONResponse(status_code=200 if status == "ready" else 503,
+                        content={"status": status, "store": connected, **startup})
+
+@app.exception_handler(ComputeOverloaded)
+async def compute_overloaded(request: Request, exc: ComputeOverloaded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 # Entry point for running locally
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several workers need the app as an import string so each process can load it.
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=SERVICE_WORKERS)
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+        Server-side micro-batching of concurrent calls that share a key.
+
+        The first call for a key opens a batch and arms a timer of `window` seconds; calls for
+        the same key arriving meanwhile join it. The batch closes when the timer fires or when
+        it holds max_size calls, and process(key, items) then runs once for all of them and
+        returns one result per item, which is handed back to each waiting caller.
+
+        The window bounds the latency added to a lone call, max_size the work of one pass.
+        Batches run in a fresh context, so their db/compute time is not charged to the request
+        that opened them; each caller records its whole wait as the "coalesce" stage.
+"""
+import asyncio
+import contextvars
+import time
+
+from telemetry import Histogram, add_stage_time, registry
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+batch_sizes = registry.register(Histogram(
+    "anomaly_coalesced_batch_size", "Calls served by one micro-batch, by what closed it (window or size).",
+    ("batcher", "reason"), BATCH_SIZE_BUCKETS))
+
+
+class MicroBatcher:
+    def __init__(self, name, process, window, max_size):
+        self.name = name
+        self.process = process
+        self.window = window
+        self.max_size = max_size
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+
+    async def submit(self, key, item):
+        """Adds item to the open batch for key and waits for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = []
+            self._timers[key] = loop.call_later(self.window, self._close, key, "window", context=contextvars.Context())
+        pending.append((item, future))
+        if len(pending) >= self.max_size:
+            self._timers[key].cancel()
+            self._close(key, "size")
+
+        start = time.perf_counter()
+        try:
+            return await future
+        finally:
+            add_stage_time("coalesce", time.perf_counter() - start)
+
+    def _close(self, key, reason):
+        batch = self._pending.pop(key)
+        del self._timers[key]
+        batch_sizes.observe(len(batch), self.name, reason)
+        task = contextvars.Context().run(asyncio.ensure_future, self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key, batch):
+        try:
+            results = await self.process(key, [item for item, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            # A caller that went away cancelled its future.
+            if not future.done():
+                future.set_result(result)
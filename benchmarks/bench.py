@@ -0,0 +1,309 @@
+"""
+        Throughput and latency benchmarks for fit and detect.
+
+        Three layers are measured, all in-process against the in-memory store:
+        - metric:  AnomalyMetric.fit / detect / detect_batch on raw NumPy arrays
+        - service: AnomalyService (cache, store, compute executor)
+        - api:     the FastAPI app through httpx's ASGI transport, with concurrent clients
+        - cold:    fresh interpreters importing the app and serving their first detection
+                   from a model on the file store, checked against COLD_START_TARGETS
+
+        Every case reports p50/p95/p99 latency in milliseconds and rows per second.
+
+        Usage:
+            python -m benchmarks.bench --quick --output bench.json
+            python -m benchmarks.bench --baseline benchmarks/baseline.json --tolerance 0.25
+
+        With --baseline, cases slower than the baseline by more than the tolerance (p95 latency
+        up, or rows/sec down) are listed and the exit code is 1.
+"""
+import os
+
+os.environ["STORAGE_BACKEND"] = "memory"
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from app import app
+from cache import model_cache
+from db import store
+from metrics.anomaly.anomaly import AnomalyMetric
+from services.auth_service import API_KEY
+from services.anomaly_service import AnomalyService
+
+HEADERS = {"X-API-Key": API_KEY}
+
+FULL_SWEEP = {
+    "dims": [3, 20, 200],
+    "rows": [1_000, 100_000],
+    "batch_sizes": [1, 100, 10_000],
+    "concurrency": [1, 16, 64],
+    "repeats": 20,
+}
+# p95 milliseconds a new pod may take to import the app and to answer its first detection.
+COLD_START_TARGETS = {"cold.import": 1000.0, "cold.first_detect": 50.0}
+# Runs in a fresh interpreter: prints the import time and the first and second detection latencies.
+COLD_START_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+import httpx
+from app import app
+from db import store
+imported = time.perf_counter() - start
+
+async def detect(client):
+    start = time.perf_counter()
+    response = await client.post("/metrics/anomaly/detect", headers={"X-API-Key": "%s"},
+                                 json={"user_token": 1, "run_id": "cold", "values": [0.0] * %d})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def main():
+    await store.connect()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        return [await detect(client), await detect(client)]
+
+print(json.dumps([imported, *asyncio.run(main())]))
+"""
+
+QUICK_SWEEP = {
+    "dims": [3, 50],
+    "rows": [1_000],
+    "batch_sizes": [1, 1_000],
+    "concurrency": [1, 8],
+    "repeats": 5,
+}
+
+
+def summarize(name, params, latencies, rows_per_call):
+    latencies = np.asarray(latencies)
+    return {
+        "name": name,
+        "params": params,
+        "iterations": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p95_ms": float(np.percentile(latencies, 95) * 1e3),
+        "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        "rows_per_sec": float(rows_per_call * len(latencies) / latencies.sum()) if latencies.sum() else 0.0,
+    }
+
+
+def timed(func, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def timed_async(func, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_metric(sweep, rng):
+    metric = AnomalyMetric()
+    results = []
+    for dim, rows in itertools.product(sweep["dims"], sweep["rows"]):
+        data = rng.normal(size=(rows, dim))
+        latencies = timed(lambda: metric.fit(data), max(3, sweep["repeats"] // 4))
+        results.append(summarize("metric.fit", {"dim": dim, "rows": rows}, latencies, rows))
+
+    for dim, batch_size in itertools.product(sweep["dims"], sweep["batch_sizes"]):
+        model = metric.prepare(metric.fit(rng.normal(size=(max(1_000, 2 * dim), dim))))
+        batch = rng.normal(size=(batch_size, dim))
+        if batch_size == 1:
+            latencies = timed(lambda: metric.detect(batch[0], model), sweep["repeats"] * 10)
+            results.append(summarize("metric.detect", {"dim": dim}, latencies, 1))
+        else:
+            latencies = timed(lambda: metric.detect_batch(batch, model), sweep["repeats"])
+            results.append(summarize("metric.detect_batch", {"dim": dim, "batch_size": batch_size}, latencies, batch_size))
+    return results
+
+
+async def bench_service(sweep, rng):
+    service = AnomalyService()
+    results = []
+    for dim in sweep["dims"]:
+        data = rng.normal(size=(max(1_000, 2 * dim), dim))
+        await service.fit(1, f"bench-{dim}", data)
+        model_cache.clear()
+
+        for batch_size in sweep["batch_sizes"]:
+            batch = rng.normal(size=(batch_size, dim))
+            if batch_size == 1:
+                latencies = await timed_async(lambda: service.detect(1, f"bench-{dim}", batch[0]), sweep["repeats"] * 10)
+                results.append(summarize("service.detect", {"dim": dim}, latencies, 1))
+            else:
+                latencies = await timed_async(lambda: service.detect_batch(1, f"bench-{dim}", batch), sweep["repeats"])
+                results.append(summarize("service.detect_batch", {"dim": dim, "batch_size": batch_size}, latencies, batch_size))
+    return results
+
+
+async def bench_api(sweep, rng):
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for dim in sweep["dims"]:
+            training_data = rng.normal(size=(max(1_000, 2 * dim), dim)).tolist()
+            start = time.perf_counter()
+            response = await client.post("/metrics/anomaly/fit", headers=HEADERS,
+                                         json={"user_token": 1, "run_id": f"api-{dim}", "training_data": training_data})
+            response.raise_for_status()
+            results.append(summarize("api.fit", {"dim": dim, "rows": len(training_data)}, [time.perf_counter() - start], len(training_data)))
+
+            point = rng.normal(size=dim).tolist()
+            for concurrency in sweep["concurrency"]:
+                latencies = []
+
+                async def worker():
+                    for _ in range(sweep["repeats"]):
+                        start = time.perf_counter()
+                        response = await client.post("/metrics/anomaly/detect", headers=HEADERS,
+                                                     json={"user_token": 1, "run_id": f"api-{dim}", "values": point})
+                        response.raise_for_status()
+                        latencies.append(time.perf_counter() - start)
+
+                wall_start = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                wall = time.perf_counter() - wall_start
+                result = summarize("api.detect", {"dim": dim, "concurrency": concurrency}, latencies, 1)
+                result["rows_per_sec"] = len(latencies) / wall
+                results.append(result)
+
+            for batch_size in sweep["batch_sizes"]:
+                if batch_size == 1:
+                    continue
+                values = rng.normal(size=(batch_size, dim)).tolist()
+
+                async def detect_batch():
+                    response = await client.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                                                 json={"user_token": 1, "run_id": f"api-{dim}", "values": values})
+                    response.raise_for_status()
+
+                latencies = await timed_async(detect_batch, max(3, sweep["repeats"] // 2))
+                results.append(summarize("api.detect_batch", {"dim": dim, "batch_size": batch_size}, latencies, batch_size))
+    return results
+
+
+def bench_cold_start(sweep, rng):
+    """Starts a new interpreter per repeat, so imports and first-request costs are paid every time."""
+    results = []
+    with tempfile.TemporaryDirectory() as storage_path:
+        env = {**os.environ, "STORAGE_BACKEND": "file", "STORAGE_PATH": storage_path}
+        for dim in sweep["dims"]:
+            fit = ("import asyncio, numpy as np; from db import store; from services.anomaly_service import AnomalyService; "
+                   f"asyncio.run(store.connect()); asyncio.run(AnomalyService().fit(1, 'cold', np.random.default_rng(0).normal(size=({max(1_000, 2 * dim)}, {dim}))))")
+            subprocess.run([sys.executable, "-c", fit], env=env, check=True)
+            samples = []
+            for _ in range(max(3, sweep["repeats"] // 4)):
+                output = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT % (API_KEY, dim)], env=env,
+                                        check=True, capture_output=True, text=True).stdout
+                samples.append(json.loads(output.splitlines()[-1]))
+            imported, first, second = zip(*samples)
+            results.append(summarize("cold.import", {"dim": dim}, imported, 1))
+            results.append(summarize("cold.first_detect", {"dim": dim}, first, 1))
+            results.append(summarize("cold.second_detect", {"dim": dim}, second, 1))
+    return results
+
+
+def run(sweep, seed=0):
+    rng = np.random.default_rng(seed)
+    store.clear()
+    model_cache.clear()
+    results = bench_metric(sweep, rng)
+    results += asyncio.run(bench_service(sweep, rng))
+    results += asyncio.run(bench_api(sweep, rng))
+    results += bench_cold_start(sweep, rng)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "sweep": sweep,
+        },
+        "results": results,
+    }
+
+
+def case_key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(current, baseline, tolerance):
+    """Returns a description of every case that regressed beyond the tolerance."""
+    previous = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(case_key(result))
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{result['name']} {result['params']}: p95 {before['p95_ms']:.3f} -> {result['p95_ms']:.3f} ms")
+        if result["rows_per_sec"] < before["rows_per_sec"] * (1 - tolerance):
+            regressions.append(f"{result['name']} {result['params']}: {before['rows_per_sec']:.0f} -> {result['rows_per_sec']:.0f} rows/s")
+    return regressions
+
+
+def missed_targets(report):
+    """Returns a description of every cold-start case whose p95 exceeds COLD_START_TARGETS."""
+    return [f"{result['name']} {result['params']}: p95 {result['p95_ms']:.1f} ms > {COLD_START_TARGETS[result['name']]:.0f} ms"
+            for result in report["results"]
+            if result["name"] in COLD_START_TARGETS and result["p95_ms"] > COLD_START_TARGETS[result["name"]]]
+
+
+def print_table(report):
+    print(f"{'case':<22}{'params':<42}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rows/s':>14}")
+    for result in report["results"]:
+        params = ", ".join(f"{name}={value}" for name, value in result["params"].items())
+        print(f"{result['name']:<22}{params:<42}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['rows_per_sec']:>14.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark anomaly fit/detect throughput and latency.")
+    parser.add_argument("--quick", action="store_true", help="run the small sweep")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="compare against a previously saved JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before flagging")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run(QUICK_SWEEP if args.quick else FULL_SWEEP, args.seed)
+    print_table(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    missed = missed_targets(report)
+    for target in missed:
+        print(f"TARGET MISSED {target}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions or missed else 0
+    return 1 if missed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import MODEL_CACHE_SIZE, MODEL_CACHE_TTL
+
+
+class ModelCache:
+    """
+    Bounded LRU cache with per-entry TTL for models keyed by (user_token, run_id).
+
+    Entries remember the stored version they were loaded at and when that was last confirmed,
+    so other processes' saves can be caught with a cheap version read (see due and confirm).
+    """
+
+    def __init__(self, maxsize=MODEL_CACHE_SIZE, ttl=MODEL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_token, run_id):
+        """Returns the cached model, or None if it is missing or expired."""
+        key = (user_token, run_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, model = entry[0], entry[1]
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return model
+
+    def put(self, user_token, run_id, model, version=None):
+        """Caches a model loaded at the given stored version, evicting the least recently used entries past maxsize."""
+        if self.maxsize <= 0:
+            return
+        key = (user_token, run_id)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = [now + self.ttl, model, version, now]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def due(self, user_token, run_ids, interval):
+        """{run_id: cached version} of the listed entries not confirmed for interval seconds; none if interval <= 0."""
+        if interval <= 0:
+            return {}
+        checked_before = time.monotonic() - interval
+        with self._lock:
+            entries = {run_id: self._entries.get((user_token, run_id)) for run_id in run_ids}
+            return {run_id: entry[2] for run_id, entry in entries.items() if entry is not None and entry[3] < checked_before}
+
+    def confirm(self, user_token, run_ids):
+        """Marks the entries as matching the store as of now."""
+        now = time.monotonic()
+        with self._lock:
+            for run_id in run_ids:
+                entry = self._entries.get((user_token, run_id))
+                if entry is not None:
+                    entry[3] = now
+
+    def invalidate(self, run_id):
+        """Drops every cached entry for a run, whichever user loaded it."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == run_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+model_cache = ModelCache()
@@ -1,5 +1,126 @@
 import os
+import tempfile
+
+# Storage backend: "mongo", "memory" (non-persistent) or "file" (memory-mapped .npy files under STORAGE_PATH).
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "./data")
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = "anomalydetection"
-COLLECTION_NAME = "models"
\ No newline at end of file
+COLLECTION_NAME = "models"
+STATE_COLLECTION_NAME = "states"
+
+# Connection pool and timeouts of the async MongoDB client.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+# One of primary, primaryPreferred, secondary, secondaryPreferred, nearest.
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred")
+
+# Threads running NumPy work off the event loop, and how many jobs may wait for one.
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", str(min(4, os.cpu_count() or 1))))
+COMPUTE_QUEUE_SIZE = int(os.getenv("COMPUTE_QUEUE_SIZE", "256"))
+# Fits, updates and fit sessions run on a separate pool of FIT_WORKERS threads with FIT_QUEUE_SIZE waiting jobs.
+FIT_WORKERS = int(os.getenv("FIT_WORKERS", "1"))
+FIT_QUEUE_SIZE = int(os.getenv("FIT_QUEUE_SIZE", "4"))
+# Detections are shed once queued jobs wait longer than this on average (seconds, 0 disables).
+COMPUTE_QUEUE_TARGET_SECONDS = float(os.getenv("COMPUTE_QUEUE_TARGET_SECONDS", "0.5"))
+
+# Uvicorn worker processes (uvicorn reads WEB_CONCURRENCY itself). With more than one, the hot model
+# parameters are published once per node under SHARED_MODEL_PATH (tmpfs) and mapped read-only by
+# every worker; segments nobody attached to for SHARED_MODEL_TTL seconds are removed.
+SERVICE_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+SHARED_MODELS = os.getenv("SHARED_MODELS", str(SERVICE_WORKERS > 1)).lower() == "true"
+SHARED_MODEL_PATH = os.getenv("SHARED_MODEL_PATH", "/dev/shm/anomaly-models" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "anomaly-models"))
+SHARED_MODEL_TTL = float(os.getenv("SHARED_MODEL_TTL", "600"))
+
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "1024"))
+MODEL_CACHE_TTL = float(os.getenv("MODEL_CACHE_TTL", "60"))
+# A cached model is checked against its stored version at most this often (seconds, 0 disables), which
+# bounds how long a save by another worker or pod goes unseen; a save in this process drops it at once.
+# A cache miss reads the version with the model, so only hits pay for the check: one version-only read
+# per request whose models are due, i.e. about one per hot model per interval. Lower it for fresher
+# models across workers at the cost of more store reads, raise it to spare the store.
+MODEL_CACHE_REVALIDATE_SECONDS = float(os.getenv("MODEL_CACHE_REVALIDATE_SECONDS", "10"))
+
+# Models used for detection get a last_used time, written to the store every LAST_USED_FLUSH_SECONDS.
+# At startup the WARM_UP_MODELS most recently used ones are loaded into the cache before /readyz
+# answers 200, giving up after WARM_UP_TIMEOUT seconds; 0 serves straight away and loads on demand.
+LAST_USED_FLUSH_SECONDS = float(os.getenv("LAST_USED_FLUSH_SECONDS", "60"))
+WARM_UP_MODELS = int(os.getenv("WARM_UP_MODELS", "0"))
+WARM_UP_TIMEOUT = float(os.getenv("WARM_UP_TIMEOUT", "30"))
+
+# Models neither saved nor used for detection for MODEL_TTL_SECONDS are deleted; 0 keeps them until
+# deleted. MongoDB expires them through a TTL index, the memory and file stores are swept every
+# MODEL_EXPIRY_SWEEP_SECONDS. Catalog listings, bulk deletes and garbage collection handle at most
+# MODEL_CATALOG_MAX_PAGE models per call.
+MODEL_TTL_SECONDS = float(os.getenv("MODEL_TTL_SECONDS", "0"))
+MODEL_EXPIRY_SWEEP_SECONDS = float(os.getenv("MODEL_EXPIRY_SWEEP_SECONDS", "300"))
+MODEL_CATALOG_MAX_PAGE = int(os.getenv("MODEL_CATALOG_MAX_PAGE", "1000"))
+
+# Detectors other than the Gaussian one flag the points scoring above the (1 - contamination)
+# quantile of their training scores, so in-distribution data, heavy tails included, is flagged at
+# about that rate. At most ANOMALY_CALIBRATION_ROWS training rows are scored for the quantile.
+ANOMALY_CONTAMINATION = float(os.getenv("ANOMALY_CONTAMINATION", "0.001"))
+ANOMALY_CALIBRATION_ROWS = int(os.getenv("ANOMALY_CALIBRATION_ROWS", "20000"))
+HBOS_BINS = int(os.getenv("HBOS_BINS", "32"))
+ISOLATION_FOREST_TREES = int(os.getenv("ISOLATION_FOREST_TREES", "100"))
+ISOLATION_FOREST_SAMPLE_SIZE = int(os.getenv("ISOLATION_FOREST_SAMPLE_SIZE", "256"))
+
+# Concurrent /metrics/anomaly/detect calls for the same model are scored together: a batch closes
+# DETECT_BATCH_WINDOW_MS after its first call or at DETECT_BATCH_MAX_SIZE calls. 0 scores each call alone.
+DETECT_BATCH_WINDOW_MS = float(os.getenv("DETECT_BATCH_WINDOW_MS", "0"))
+DETECT_BATCH_MAX_SIZE = int(os.getenv("DETECT_BATCH_MAX_SIZE", "64"))
+
+# Most models one /metrics/anomaly/detect/many call may score.
+FANOUT_MAX_MODELS = int(os.getenv("FANOUT_MAX_MODELS", "500"))
+
+# Model parameters are stored as packed binary arrays of this dtype ("float64" or "float32").
+MODEL_DTYPE = os.getenv("MODEL_DTYPE", "float64")
+# Raw training rows are only kept when explicitly enabled, and never above this size.
+STORE_TRAINING_DATA = os.getenv("STORE_TRAINING_DATA", "false").lower() == "true"
+MAX_TRAINING_DATA_BYTES = int(os.getenv("MAX_TRAINING_DATA_BYTES", str(8 * 1024 * 1024)))
+
+# Rows buffered per NumPy update while reading an NDJSON fit stream.
+FIT_STREAM_CHUNK_ROWS = int(os.getenv("FIT_STREAM_CHUNK_ROWS", "4096"))
+
+# Attempts at a versioned compare-and-swap before an online update gives up with a conflict.
+MODEL_UPDATE_RETRIES = int(os.getenv("MODEL_UPDATE_RETRIES", "5"))
+
+# Streaming accuracy/fairness counts are kept per time bucket of this width, and dropped after the retention.
+METRIC_BUCKET_SECONDS = int(os.getenv("METRIC_BUCKET_SECONDS", "3600"))
+METRIC_RETENTION_SECONDS = int(os.getenv("METRIC_RETENTION_SECONDS", str(30 * 24 * 3600)))
+
+# Drift baselines: quantile points per feature kept at fit time, and equal-mass histogram bins for
+# Jensen-Shannon (the sketch size should be a multiple of the bin count).
+DRIFT_SKETCH_SIZE = int(os.getenv("DRIFT_SKETCH_SIZE", "256"))
+DRIFT_HISTOGRAM_BINS = int(os.getenv("DRIFT_HISTOGRAM_BINS", "32"))
+# A feature has drifted when its KS p-value falls below DRIFT_P_VALUE or its JS divergence exceeds DRIFT_JS_THRESHOLD.
+DRIFT_P_VALUE = float(os.getenv("DRIFT_P_VALUE", "0.05"))
+DRIFT_JS_THRESHOLD = float(os.getenv("DRIFT_JS_THRESHOLD", "0.1"))
+
+# Sliding-window drift monitors fed by detection requests. JS divergence is biased upwards on few
+# points, so nothing is flagged before the window holds DRIFT_MONITOR_MIN_POINTS. Statistics are
+# re-evaluated every DRIFT_MONITOR_EVALUATE_EVERY points, and the window is checkpointed to the
+# state store every DRIFT_MONITOR_CHECKPOINT_POINTS.
+DRIFT_MONITOR_WINDOW = int(os.getenv("DRIFT_MONITOR_WINDOW", "2000"))
+DRIFT_MONITOR_MIN_POINTS = int(os.getenv("DRIFT_MONITOR_MIN_POINTS", "500"))
+DRIFT_MONITOR_EVALUATE_EVERY = int(os.getenv("DRIFT_MONITOR_EVALUATE_EVERY", "16"))
+DRIFT_MONITOR_CHECKPOINT_POINTS = int(os.getenv("DRIFT_MONITOR_CHECKPOINT_POINTS", "1000"))
+
+# Sequential detectors (EWMA, CUSUM, seasonal baseline) keep their state in process and checkpoint it
+# to the state store at most every SEQUENTIAL_CHECKPOINT_SECONDS per run, and on shutdown.
+SEQUENTIAL_CHECKPOINT_SECONDS = float(os.getenv("SEQUENTIAL_CHECKPOINT_SECONDS", "30"))
+
+# Admission control, per lane ("fit": fit, update and fit sessions; "detect": every other /metrics route).
+# Token buckets per API key and user_token, in requests per second with a burst (a rate of 0 disables them),
+# and the largest body (bytes) and row count one request may carry, answered with 413. Streams are only
+# bounded per chunk.
+RATE_LIMIT_FIT_PER_SECOND = float(os.getenv("RATE_LIMIT_FIT_PER_SECOND", "0"))
+RATE_LIMIT_FIT_BURST = float(os.getenv("RATE_LIMIT_FIT_BURST", "5"))
+RATE_LIMIT_DETECT_PER_SECOND = float(os.getenv("RATE_LIMIT_DETECT_PER_SECOND", "0"))
+RATE_LIMIT_DETECT_BURST = float(os.getenv("RATE_LIMIT_DETECT_BURST", "200"))
+MAX_FIT_BODY_BYTES = int(os.getenv("MAX_FIT_BODY_BYTES", str(256 * 1024 * 1024)))
+MAX_DETECT_BODY_BYTES = int(os.getenv("MAX_DETECT_BODY_BYTES", str(32 * 1024 * 1024)))
+MAX_FIT_ROWS = int(os.getenv("MAX_FIT_ROWS", "5000000"))
+MAX_DETECT_ROWS = int(os.getenv("MAX_DETECT_ROWS", "200000"))
@@ -1,23 +1,21 @@
-from pymongo import MongoClient
-from config import MONGO_URI, DB_NAME, COLLECTION_NAME
+import asyncio
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-models_collection = db[COLLECTION_NAME]
+from config import STORAGE_BACKEND
+from storage import create_store
 
-def save_model(user_token: int, run_id: str, model_data: dict):
-    models_collection.update_one(
-        {"run_id": run_id},
-        {"$set": {"model_data": model_data}, "$addToSet": {"access": user_token}},
-        upsert=True
-    )
+# The configured storage backend; services reach models and states only through it.
+store = create_store(STORAGE_BACKEND)
 
-def load_model(user_token: int, run_id: str) -> dict:
-    model = models_collection.find_one({"run_id": run_id, "access": user_token})
-    if not model:
-        return None
-    return model["model_data"]
+def get_store():
+    return store
 
-def delete_model(user_token: int, run_id: str):
-    result = models_collection.delete_one({"run_id": run_id, "access": user_token})
-    return result.deleted_count > 0
+async def migrate():
+    await store.connect()
+    try:
+        await store.create_indexes()
+        return await store.migrate_models()
+    finally:
+        await store.close()
+
+if __name__ == "__main__":
+    print(f"Migrated {asyncio.run(migrate())} model documents.")
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import COMPUTE_WORKERS, COMPUTE_QUEUE_SIZE, COMPUTE_QUEUE_TARGET_SECONDS, FIT_WORKERS, FIT_QUEUE_SIZE
+from telemetry import add_stage_time
+
+
+class ComputeOverloaded(Exception):
+    """Raised when more CPU-bound jobs are waiting than the executor is allowed to queue."""
+
+
+class ComputeExecutor:
+    """Thread pool for NumPy work with a bounded number of queued jobs, so the event loop never blocks on it."""
+
+    def __init__(self, max_workers=COMPUTE_WORKERS, max_queued=COMPUTE_QUEUE_SIZE, wait_target=0.0, name="compute"):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        # Queued jobs waiting longer than this on average (seconds) count as overload; 0 only sheds on a full queue.
+        self.wait_target = wait_target
+        self.in_flight = 0
+        # Exponentially weighted queue wait of the recent jobs.
+        self.wait = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self):
+        return max(0, self.in_flight - self.max_workers)
+
+    def overloaded(self):
+        """
+        Why a new job should be turned away now ("queue_full" or "queue_wait"), None if it may be queued.
+
+        The wait is only held against the target while jobs are queued, so an idle pool admits
+        again even though its last measured wait was long.
+        """
+        if self.in_flight >= self.max_workers + self.max_queued:
+            return "queue_full"
+        if self.wait_target > 0 and self.queued > 0 and self.wait > self.wait_target:
+            return "queue_wait"
+        return None
+
+    async def run(self, func, *args, **kwargs):
+        """Runs func in the pool and awaits its result, or raises ComputeOverloaded if the queue is full."""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queued:
+                raise ComputeOverloaded("Compute queue is full")
+            self.in_flight += 1
+        try:
+            future = self._pool.submit(self._timed_call, func, args, kwargs, time.perf_counter())
+        except BaseException:
+            self._release(None)
+            raise
+        # A cancelled caller only drops a job that has not started; one already running keeps its
+        # thread until it returns, so the slot is given back when the job is done, not when the caller is.
+        future.add_done_callback(self._release)
+        result, elapsed, waited = await asyncio.wrap_future(future)
+        add_stage_time("compute", elapsed)
+        add_stage_time("compute_queue", waited)
+        return result
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _timed_call(self, func, args, kwargs, submitted):
+        start = time.perf_counter()
+        waited = start - submitted
+        with self._lock:
+            self.wait += 0.2 * (waited - self.wait)
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start, waited
+
+
+compute_executor = ComputeExecutor(wait_target=COMPUTE_QUEUE_TARGET_SECONDS)
+run_compute = compute_executor.run
+# Fits and updates get their own small pool, so a large fit queues behind other fits and never ahead of detections.
+fit_executor = ComputeExecutor(FIT_WORKERS, FIT_QUEUE_SIZE, name="fit")
+run_fit = fit_executor.run
@@ -0,0 +1,243 @@
+"""
+        Binary request and response bodies next to the default JSON.
+
+        Validating a JSON body turns every float into a Python object before NumPy sees it,
+        which costs more than the statistics on large fits. The endpoints that take a matrix
+        or a set of columns also accept:
+            application/x-npy                       a .npy file, read in place with np.frombuffer
+            application/vnd.apache.arrow.stream     Arrow IPC stream (needs pyarrow)
+            application/vnd.apache.arrow.file       Arrow IPC file / Feather v2 (needs pyarrow)
+            application/msgpack                     {"dtype", "shape", "data"} maps (needs msgpack)
+        The other request fields (user_token, run_id, ...) come from the query string.
+
+        A matrix is either a 2-D array, an Arrow table with a single fixed-size-list column
+        (both decoded without a copy) or one column per feature. Columns are a structured
+        .npy array, an Arrow table or a msgpack map of column name to array.
+"""
+import importlib
+import io
+import json
+from typing import get_args, get_origin
+
+import numpy as np
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from admission import admit
+
+JSON = "application/json"
+NPY = "application/x-npy"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+MSGPACK = "application/msgpack"
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.apache.arrow.feather": ARROW_FILE}
+BINARY_TYPES = (NPY, ARROW_STREAM, ARROW_FILE, MSGPACK)
+
+
+def media_type(header):
+    """Normalized media type of a Content-Type or Accept entry, without parameters."""
+    name = header.split(";", 1)[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(name, name)
+
+
+def _require(module, media):
+    """Imports an optional codec package, answering 415 when it is not installed."""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise HTTPException(status_code=415, detail=f"{media} bodies need the optional '{module}' package.")
+
+
+# -----------------------------------[ Decoding ]-----------------------------------
+def read_npy(body):
+    """Reads a .npy file as an array over the body buffer, without copying the data."""
+    stream = io.BytesIO(body)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    else:
+        raise ValueError(f"Unsupported .npy version {version}")
+    if dtype.hasobject:
+        raise ValueError("Object arrays are not accepted")
+    array = np.frombuffer(body, dtype=dtype, count=int(np.prod(shape)), offset=stream.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def _msgpack_array(value):
+    if isinstance(value, dict) and {"dtype", "shape", "data"} <= value.keys():
+        dtype = np.dtype(value["dtype"])
+        if dtype.hasobject:
+            raise ValueError("Object arrays are not accepted")
+        return np.frombuffer(value["data"], dtype=dtype).reshape(value["shape"])
+    return np.asarray(value)
+
+
+def read_msgpack(body):
+    msgpack = _require("msgpack", MSGPACK)
+    decoded = msgpack.unpackb(body, raw=False)
+    if isinstance(decoded, dict) and not {"dtype", "shape", "data"} <= decoded.keys():
+        return {str(name): _msgpack_array(value) for name, value in decoded.items()}
+    return _msgpack_array(decoded)
+
+
+def read_arrow(body, media):
+    pa = _require("pyarrow", media)
+    buffer = pa.py_buffer(body)
+    reader = pa.ipc.open_stream(buffer) if media == ARROW_STREAM else pa.ipc.open_file(buffer)
+    table = reader.read_all()
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(table.schema.field(0).type):
+        column = table.column(0).combine_chunks()
+        return column.flatten().to_numpy().reshape(len(column), column.type.list_size)
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+
+def decode(body, media):
+    """Decodes a binary body into an array or a {name: column} map."""
+    if media == NPY:
+        return read_npy(body)
+    if media == MSGPACK:
+        return read_msgpack(body)
+    return read_arrow(body, media)
+
+
+def as_matrix(decoded, ndim=2):
+    """Turns a decoded body into a float array with ndim dimensions, copying only when it must."""
+    if isinstance(decoded, dict):
+        decoded = np.column_stack(list(decoded.values())) if decoded else np.empty((0, 0))
+    elif decoded.dtype.names:
+        decoded = np.column_stack([decoded[name] for name in decoded.dtype.names])
+    if decoded.dtype.kind not in "fiub":
+        raise ValueError("Values must be numeric")
+    if ndim == 1 and decoded.ndim == 2 and len(decoded) == 1:
+        decoded = decoded[0]
+    if decoded.ndim != ndim:
+        raise ValueError("Dimension mismatch")
+    return decoded.astype(float, copy=False)
+
+
+def as_columns(decoded):
+    """Turns a decoded body into a {name: 1-D array} map."""
+    if isinstance(decoded, np.ndarray):
+        if not decoded.dtype.names:
+            raise ValueError("Expected named columns")
+        decoded = {name: decoded[name] for name in decoded.dtype.names}
+    if any(np.ndim(column) != 1 for column in decoded.values()):
+        raise ValueError("Columns must be one-dimensional")
+    return decoded
+
+
+def _query_fields(request, model):
+    """Query parameters as model fields; list fields take every repeated value (?run_ids=a&run_ids=b)."""
+    fields = {}
+    for name in request.query_params:
+        annotation = model.model_fields[name].annotation if name in model.model_fields else None
+        is_list = any(get_origin(option) is list for option in (annotation, *get_args(annotation)))
+        fields[name] = request.query_params.getlist(name) if is_list else request.query_params[name]
+    return fields
+
+
+def _validation_error(error, location):
+    """Reports Pydantic errors the way FastAPI does for its own body and query parameters."""
+    return RequestValidationError([{**detail, "loc": (location, *detail["loc"])}
+                                   for detail in error.errors(include_url=False)])
+
+
+async def parse_body(request, model, fill):
+    """
+    Validates a JSON body against model, or builds it from a binary body and the query string.
+
+    fill(decoded) returns the fields taken from the binary body; they skip Pydantic validation
+    and are handed to the services as NumPy arrays.
+    """
+    body = await request.body()
+    media = media_type(request.headers.get("content-type", JSON))
+    if media not in BINARY_TYPES:
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as error:
+            raise _validation_error(error, "body")
+
+    try:
+        fields = fill(decode(body, media))
+        # The decoded fields stand in as empty containers while the query string is validated.
+        placeholders = {name: {} if get_origin(model.model_fields[name].annotation) is dict else [] for name in fields}
+    except (ValueError, TypeError, KeyError, OSError):
+        # pyarrow and msgpack errors on malformed input derive from these as well.
+        raise HTTPException(status_code=400, detail="Invalid data format.")
+
+    try:
+        parsed = model.model_validate({**_query_fields(request, model), **placeholders})
+    except ValidationError as error:
+        raise _validation_error(error, "query")
+    return parsed.model_copy(update=fields)
+
+
+def matrix_body(model, field, ndim=2):
+    """Dependency reading model with `field` as a JSON list or a binary float array, within the lane's limits."""
+    async def dependency(request: Request):
+        parsed = await parse_body(request, model, lambda decoded: {field: as_matrix(decoded, ndim)})
+        admit(request, getattr(parsed, "user_token", None), len(getattr(parsed, field)) if ndim == 2 else 1)
+        return parsed
+    return dependency
+
+
+def columns_body(model, fill, field):
+    """Dependency reading model from JSON or from binary columns mapped to fields by fill(columns); `field` counts the rows."""
+    async def dependency(request: Request):
+        parsed = await parse_body(request, model, lambda decoded: fill(as_columns(decoded)))
+        admit(request, getattr(parsed, "user_token", None), len(getattr(parsed, field)))
+        return parsed
+    return dependency
+
+
+# -----------------------------------[ Encoding ]-----------------------------------
+def accepted(request):
+    """First binary media type listed in the Accept header, JSON otherwise."""
+    for entry in request.headers.get("accept", "").split(","):
+        media = media_type(entry)
+        if media in BINARY_TYPES:
+            return media
+    return JSON
+
+
+def npy_table(columns):
+    """Packs equal-length columns as one structured .npy file; (N, k) columns become k-element sub-array fields."""
+    columns = {name: np.asarray(column) for name, column in columns.items()}
+    rows = len(next(iter(columns.values()))) if columns else 0
+    table = np.empty(rows, dtype=[(name, column.dtype, column.shape[1:]) for name, column in columns.items()])
+    for name, column in columns.items():
+        table[name] = column
+    stream = io.BytesIO()
+    np.save(stream, table, allow_pickle=False)
+    return stream.getvalue()
+
+
+def columns_response(media, columns, metadata):
+    """
+    Encodes per-row result columns plus a small JSON-able metadata dict.
+
+    .npy responses are one structured array, with the metadata in an X-Metadata header; Arrow
+    keeps it in the schema metadata and msgpack next to the columns. An (N, k) column, such as
+    the top features of every row, is a k-element sub-array field or a fixed-size-list column.
+    """
+    columns = {name: np.asarray(column) for name, column in columns.items()}
+    if media == NPY:
+        return Response(npy_table(columns), media_type=NPY, headers={"X-Metadata": json.dumps(metadata)})
+    if media == MSGPACK:
+        msgpack = _require("msgpack", MSGPACK)
+        packed = {name: {"dtype": column.dtype.str, "shape": list(column.shape), "data": column.tobytes()}
+                  for name, column in columns.items()}
+        return Response(msgpack.packb({"results": packed, "metadata": metadata}), media_type=MSGPACK)
+
+    pa = _require("pyarrow", media)
+    columns = {name: pa.FixedSizeListArray.from_arrays(column.ravel(), column.shape[1]) if column.ndim == 2 else column
+               for name, column in columns.items()}
+    table = pa.table(columns).replace_schema_metadata({"metadata": json.dumps(metadata)})
+    sink = pa.BufferOutputStream()
+    writer = pa.ipc.new_stream(sink, table.schema) if media == ARROW_STREAM else pa.ipc.new_file(sink, table.schema)
+    with writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=media)
@@ -0,0 +1,39 @@
+import json
+
+import numpy as np
+
+from config import FIT_STREAM_CHUNK_ROWS
+
+
+def parse_rows(lines):
+    """Parses a list of NDJSON lines, each a JSON array of floats, into an (n, d) matrix."""
+    try:
+        rows = np.asarray(json.loads(b"[" + b",".join(lines) + b"]"), dtype=float)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid NDJSON row")
+    if rows.ndim != 2:
+        raise ValueError("Invalid NDJSON row")
+    return rows
+
+
+async def iter_ndjson_rows(byte_stream, chunk_rows=FIT_STREAM_CHUNK_ROWS, flush=False):
+    """
+    Turns a byte stream of NDJSON rows into (n, d) matrices of at most chunk_rows rows.
+
+    With flush, the complete rows of every read are yielded at once instead of waiting for
+    chunk_rows of them, so a slow stream is answered as it arrives.
+    """
+    pending = b""
+    lines = []
+    async for data in byte_stream:
+        pending += data
+        *complete, pending = pending.split(b"\n")
+        lines.extend(line for line in complete if line.strip())
+        while len(lines) >= chunk_rows or (flush and lines):
+            yield parse_rows(lines[:chunk_rows])
+            lines = lines[chunk_rows:]
+
+    if pending.strip():
+        lines.append(pending)
+    if lines:
+        yield parse_rows(lines)
@@ -1,5 +1,10 @@
-from .accuracy import accuracy
-from .anomaly import anomaly
-from .drift import drift
-from .explainability import explainability
-from .fairness import fairness
\ No newline at end of file
+import importlib
+
+# Submodules are imported on first attribute access, so importing one metric does not load the others.
+_SUBMODULES = {"accuracy", "anomaly", "drift", "explainability", "fairness", "sequential"}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1 +1,2 @@
-from .accuracy import AccuracyMetric
\ No newline at end of file
+from .accuracy import AccuracyMetric
+from .accumulator import ClassCountAccumulator
@@ -0,0 +1,73 @@
+import numpy as np
+
+from metrics.accuracy.accuracy import AccuracyMetric, count_codes
+from metrics.buckets import BucketedCounts, bucket_rows, extend_labels
+
+
+class ClassCountAccumulator:
+    """Per-class TP/FP/FN counts per time bucket, enough for accuracy and weighted precision/recall/F1."""
+
+    def __init__(self, bucket_seconds):
+        self.labels = []
+        self.buckets = BucketedCounts(bucket_seconds, (0, 3))
+        self.metric = AccuracyMetric()
+
+    @property
+    def rows(self):
+        return int(self.buckets.counts[..., [0, 2]].sum())
+
+    def update(self, y_true, y_pred, timestamps):
+        """Folds a batch of labelled predictions into the buckets of their timestamps."""
+        n_rows = len(y_true)
+        if len(y_pred) != n_rows:
+            raise ValueError("y_true and y_pred must have the same length")
+        if n_rows == 0:
+            return self
+        self.labels, codes = extend_labels(self.labels, np.concatenate([np.asarray(y_true), np.asarray(y_pred)]))
+        n_classes = len(self.labels)
+        self.buckets.resize((n_classes, 3))
+
+        starts, bucket_codes = bucket_rows(timestamps, n_rows, self.buckets.bucket_seconds)
+        offsets = bucket_codes * n_classes
+        counts = count_codes(offsets + codes[:n_rows], offsets + codes[n_rows:], len(starts) * n_classes)
+        self.buckets.add(starts, counts.reshape(len(starts), n_classes, 3))
+        return self
+
+    def merge(self, other):
+        """Adds another accumulator's counts, matching classes by label."""
+        if other.buckets.bucket_seconds != self.buckets.bucket_seconds:
+            raise ValueError("Cannot merge counts with different bucket widths")
+        self.labels, codes = extend_labels(self.labels, other.labels)
+        counts = np.zeros((len(other.buckets.starts), len(self.labels), 3), dtype=np.int64)
+        counts[:, codes] = other.buckets.counts
+        self.buckets.resize((len(self.labels), 3)).add(other.buckets.starts, counts)
+        return self
+
+    def prune(self, oldest_start):
+        self.buckets.prune(oldest_start)
+        return self
+
+    def report(self, start=None, end=None):
+        """Accuracy metrics over the buckets starting in [start, end)."""
+        counts = self.buckets.total(start, end)
+        return {"rows": int(counts[:, [0, 2]].sum()), **self.metric.from_counts(counts)}
+
+    def tumbling_reports(self, window_seconds):
+        """One report per non-overlapping window of window_seconds that holds data."""
+        starts, counts = self.buckets.tumbling(window_seconds)
+        return [
+            {"start": int(start), "end": int(start + window_seconds), "rows": int(window[:, [0, 2]].sum()),
+             **self.metric.from_counts(window)}
+            for start, window in zip(starts, counts)
+        ]
+
+    def to_state(self):
+        return {"labels": self.labels, "buckets": self.buckets.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        buckets = BucketedCounts.from_state(state["buckets"])
+        accumulator = cls(buckets.bucket_seconds)
+        accumulator.labels = list(state["labels"])
+        accumulator.buckets = buckets
+        return accumulator
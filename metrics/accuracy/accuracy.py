@@ -26,14 +26,62 @@
  """
 
 
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+import numpy as np
+
+from metrics.buckets import encode_groups
+
+
+def class_counts(y_true, y_pred):
+    """
+    Counts TP, FP and FN for every class seen in either array, in one bincount each.
+
+    Returns (labels, counts) with counts an (n_classes, 3) array of [TP, FP, FN].
+    """
+    n_rows = len(y_true)
+    if len(y_pred) != n_rows:
+        raise ValueError("y_true and y_pred must have the same length")
+    labels, codes = encode_groups(np.concatenate([np.asarray(y_true), np.asarray(y_pred)]))
+    return labels, count_codes(codes[:n_rows], codes[n_rows:], len(labels))
+
+
+def count_codes(true_codes, pred_codes, n_classes):
+    """(n_classes, 3) [TP, FP, FN] counts of already encoded labels."""
+    correct = true_codes == pred_codes
+    return np.stack([
+        np.bincount(true_codes[correct], minlength=n_classes),
+        np.bincount(pred_codes[~correct], minlength=n_classes),
+        np.bincount(true_codes[~correct], minlength=n_classes),
+    ], axis=-1)
+
+
+def _safe_divide(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
 
 class AccuracyMetric:
     def calculate(self, y_true, y_pred):
         """Computes accuracy, precision, recall, and F1-score."""
+        _, counts = class_counts(y_true, y_pred)
+        return self.from_counts(counts)
+
+    def from_counts(self, counts):
+        """
+        Computes the metrics from (n_classes, 3) [TP, FP, FN] counts.
+
+        Precision, recall and F1 are averaged over classes weighted by support (TP + FN), with a
+        class that has no predictions scoring 0, the same as sklearn's average="weighted".
+        """
+        tp, fp, fn = np.asarray(counts, dtype=np.int64).T
+        support = tp + fn
+        total = support.sum()
+        if total == 0:
+            return {"accuracy": None, "precision": None, "recall": None, "f1_score": None}
+
+        weights = support / total
         return {
-            "accuracy": accuracy_score(y_true, y_pred),
-            "precision": precision_score(y_true, y_pred, average="weighted"),
-            "recall": recall_score(y_true, y_pred, average="weighted"),
-            "f1_score": f1_score(y_true, y_pred, average="weighted"),
+            "accuracy": float(tp.sum() / total),
+            "precision": float(weights @ _safe_divide(tp, tp + fp)),
+            "recall": float(weights @ _safe_divide(tp, support)),
+            "f1_score": float(weights @ _safe_divide(2 * tp, 2 * tp + fp + fn)),
         }
@@ -1 +1,6 @@
-from .anomaly import AnomalyMetric
\ No newline at end of file
+from .anomaly import AnomalyMetric
+from .hbos import HBOSDetector
+from .isolation_forest import IsolationForestDetector
+from .moments import MomentAccumulator
+from .registry import DETECTORS, detector_for, get_detector
+from .robust import RobustDetector
@@ -31,48 +31,235 @@
 	•	Ignores feature correlations → If features are correlated, distances are misleading
 	•	Doesn’t normalize feature scales → Features with larger ranges dominate the distance calculation.
         """
+import math
+
 import numpy as np
-from scipy.stats import norm
 
-class AnomalyMetric:
-    def fit(self, training_data):
-        """Fits a simple Gaussian anomaly detection model."""
-        data = np.array(training_data)
+from metrics.explainability.explainability import explain, explained_rows, mahalanobis_contributions
+from serialization import UPDATE_ONLY_FIELDS
+from .detector import Detector, training_matrix
+from .moments import MomentAccumulator
+
+# P(|Z| <= 3) for a standard normal, reused to set the Mahalanobis threshold.
+THREE_SIGMA_COVERAGE = math.erf(3 / math.sqrt(2))
+
+
+def ledoit_wolf_covariance(n_samples, comoment, fourth_moment):
+    """
+    Ledoit-Wolf shrinkage of the sample covariance towards μ·I, from the moments of the data.
+
+        S = M2 / n,  μ = tr(S) / d,  δ² = ||S - μI||²,  β² = Σₖ ||zₖzₖᵀ - S||² / n²
+        Σ = (β²/δ²)·μI + (1 - β²/δ²)·S,  with β² capped at δ²
+    """
+    n_features = len(comoment)
+    sample_cov = comoment / n_samples
+    mu = np.trace(sample_cov) / n_features
+    delta = np.sum(np.square(sample_cov - mu * np.eye(n_features)))
+    if delta == 0:
+        return sample_cov
+
+    # Σₖ ||zₖzₖᵀ - S||² expands to Σₖ |zₖ|⁴ - n·||S||²
+    beta = (fourth_moment - n_samples * np.sum(np.square(sample_cov))) / n_samples ** 2
+    shrinkage = min(beta, delta) / delta
+    return shrinkage * mu * np.eye(n_features) + (1 - shrinkage) * sample_cov
+
+
+def precision_cholesky(cov_matrix):
+    """Returns the upper-triangular U with U·Uᵀ = Σ⁻¹, adding a small ridge when Σ is singular."""
+    n_features = len(cov_matrix)
+    scale = np.trace(cov_matrix) / n_features if n_features else 0.0
+    jitter = 0.0
+    for _ in range(10):
+        try:
+            lower = np.linalg.cholesky(cov_matrix + jitter * np.eye(n_features))
+            break
+        except np.linalg.LinAlgError:
+            jitter = max(jitter * 10, 1e-10 * scale, 1e-12)
+    else:
+        raise np.linalg.LinAlgError("Covariance matrix is not positive definite")
+    # SciPy is only needed to fit, so it is imported here rather than on the detection path.
+    from scipy.linalg import solve_triangular
+    return solve_triangular(lower, np.eye(n_features), lower=True).T
+
+
+def mahalanobis_threshold(n_features):
+    """Distance below which a Gaussian point falls with three-sigma probability (3.0 for d = 1)."""
+    # chdtri is the inverse chi-square survival function.
+    from scipy.special import chdtri
+    return float(np.sqrt(chdtri(n_features, 1 - THREE_SIGMA_COVERAGE)))
+
+
+def anomaly_scores(x, means, stds, precision_factors, thresholds, top_k=0):
+    """
+    Scores an (N, d) matrix against one model, or against k stacked models.
+
+    For one model the parameters are (d,), (d,), (d, d) and a scalar and the scores are (N,)
+    arrays; for k models they are (k, 1, d), (k, 1, d), (k, d, d) and (k, 1), giving (k, N) arrays.
+    With top_k, the top_k features of every flagged row by Mahalanobis contribution are added
+    as (N, top_k) columns, with their z-scores, reusing the deviations of this pass.
+    """
+    diff = x - means
+
+    # Compute Z-score anomaly detection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_scores = np.where(stds > 0, diff / stds, 0)
+    anomaly_score_z = np.max(np.abs(z_scores), axis=-1)
+
+    # Gaussian probability
+    variance = np.square(stds)
+    probability_density = np.exp(-np.square(diff) / (2 * variance)) / (np.sqrt(2 * np.pi * variance))
+    anomaly_score_prob = np.min(probability_density, axis=-1)
+
+    # Mahalanobis distance with the precision factor fitted at training time
+    whitened = diff @ precision_factors
+    mahalanobis_distance = np.sqrt(np.vecdot(whitened, whitened))
+
+    # Define anomaly detection thresholds
+    anomaly_detected = (anomaly_score_z > 3) | (anomaly_score_prob < 0.01) | (mahalanobis_distance > thresholds)
+
+    scores = {
+        "z_score_anomaly": anomaly_score_z,
+        "gaussian_probability": anomaly_score_prob,
+        "mahalanobis_distance": mahalanobis_distance,
+        "anomaly_detected": anomaly_detected,
+    }
+    if top_k:
+        rows = explained_rows(anomaly_detected)
+        contributions = mahalanobis_contributions(diff[rows], whitened[rows], precision_factors)
+        scores.update(explain(len(x), rows, top_k, contributions, z_scores=z_scores[rows]))
+    return scores
+
+
+class AnomalyMetric(Detector):
+    algorithm = "gaussian"
+    options = ("covariance",)
+    explains = True
+    summary_maxima = ("z_score_anomaly", "mahalanobis_distance")
+
+    def fit(self, training_data, covariance="empirical"):
+        """
+        Fits a multivariate Gaussian anomaly detection model.
+
+        The full training covariance is estimated once here, optionally shrunk towards a scaled
+        identity with the Ledoit-Wolf estimator (better conditioned when there are few rows per
+        feature), and stored as the upper-triangular Cholesky factor U of its inverse, so that
+        D_M(x)² = |(x - μ) U|² costs one matrix-vector product per point at detection time.
+        """
+        return self.fit_moments(MomentAccumulator().update(training_matrix(training_data)), covariance)
+
+    def fit_moments(self, moments, covariance="empirical"):
+        """Builds the model from accumulated moments, so chunked and one-shot fits give the same parameters."""
+        n_samples = moments.count
+        # One row has no spread: the stds would be NaN and the precision only the jitter.
+        if n_samples < 2:
+            raise ValueError("Training data must be a matrix with at least two rows")
+        if covariance == "ledoit_wolf":
+            cov_matrix = ledoit_wolf_covariance(n_samples, moments.comoment, moments.fourth_moment)
+        else:
+            cov_matrix = moments.covariance(ddof=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stds = np.sqrt(np.diag(moments.comoment) / (n_samples - 1))
+
         return {
-            "means": np.mean(data, axis=0).tolist(),
-            "stds": np.std(data, axis=0, ddof=1).tolist(),
+            "algorithm": self.algorithm,
+            "means": moments.mean.copy(),
+            "stds": stds,
+            "covariance": covariance,
+            "n_samples": n_samples,
+            "precision_cholesky": precision_cholesky(cov_matrix),
+            "mahalanobis_threshold": mahalanobis_threshold(moments.n_features),
+            "moments": moments.to_state(),
         }
 
-    def detect(self, values, model_data):
-        """Detects anomalies based on Gaussian probability."""
-        metric_mean = np.array(model_data["means"])
-        metric_stds = np.array(model_data["stds"])
-        x = np.array(values)
+    def update(self, model_data, new_data, decay=None, window=None):
+        """
+        Merges new observations into a fitted model without the original training data.
+
+        With decay (0 < λ ≤ 1) the stored moments are down-weighted by λ before the merge. With
+        window = k the model is rebuilt from the moments of the last k update batches only.
+        """
+        if model_data.get("moments") is None:
+            raise ValueError("Model has no stored moments, refit it to enable updates")
+
+        batch = MomentAccumulator().update(new_data)
+        if batch.n_features != len(model_data["means"]):
+            raise ValueError("Dimension mismatch")
+
+        if window:
+            history = model_data.get("window") or [model_data["moments"]]
+            history = (list(history) + [batch.to_state()])[-window:]
+            moments = MomentAccumulator()
+            for state in history:
+                moments.merge(MomentAccumulator.from_state(state))
+        else:
+            history = None
+            moments = MomentAccumulator.from_state(model_data["moments"])
+            if decay is not None:
+                moments.scale(decay)
+            moments.merge(batch)
+
+        updated = self.fit_moments(moments, model_data.get("covariance", "empirical"))
+        if history is not None:
+            updated["window"] = history
+        return updated
+
+    def prepare(self, model_data):
+        """Converts stored parameters to read-only NumPy arrays so they can be shared between requests."""
+        prepared = {name: value for name, value in model_data.items() if name not in UPDATE_ONLY_FIELDS}
+        for name in ("means", "stds"):
+            prepared[name] = np.array(model_data[name], dtype=float, copy=None)
+
+        if model_data.get("precision_cholesky") is not None:
+            prepared["precision_cholesky"] = np.array(model_data["precision_cholesky"], dtype=float, copy=None)
+        else:
+            # Models fitted before the covariance was stored: fall back to a diagonal covariance.
+            stds = prepared["stds"]
+            with np.errstate(divide="ignore"):
+                prepared["precision_cholesky"] = np.diag(np.where(stds > 0, 1 / stds, 0.0))
 
-        if len(x) != len(metric_mean):
+        for name in ("means", "stds", "precision_cholesky"):
+            prepared[name].flags.writeable = False
+        return prepared
+
+    def detect_many(self, values, models):
+        """
+        Scores an (N, d) matrix against several models in one vectorized pass.
+
+        The models of dimension d are stacked into (k, 1, d) means and stds and a (k, d, d)
+        precision factor, so every score is one broadcast or batched matmul over all of them. Returns one
+        result per model, in order, or "Dimension mismatch" for models of another dimension.
+        """
+        x = np.asarray(values, dtype=float)
+        if x.ndim != 2:
             return "Dimension mismatch"
 
-        # Compute Z-score anomaly detection
-        z_scores = np.where(metric_stds > 0, (x - metric_mean) / metric_stds, 0)
-        anomaly_score_z = np.max(np.abs(z_scores))
+        prepared = [model if isinstance(model.get("precision_cholesky"), np.ndarray) else self.prepare(model) for model in models]
+        matching = [i for i, model in enumerate(prepared) if len(model["means"]) == x.shape[1]]
+        results = ["Dimension mismatch"] * len(models)
+        if not matching:
+            return results
 
-        # Gaussian probability
-        variance = np.square(metric_stds)
-        probability_density = np.exp(-np.square(x - metric_mean) / (2 * variance)) / (np.sqrt(2 * np.pi * variance))
-        anomaly_score_prob = np.min(probability_density)
+        scores = anomaly_scores(
+            x,
+            np.stack([prepared[i]["means"] for i in matching])[:, np.newaxis],
+            np.stack([prepared[i]["stds"] for i in matching])[:, np.newaxis],
+            np.stack([prepared[i]["precision_cholesky"] for i in matching]),
+            np.array([[prepared[i].get("mahalanobis_threshold", 3)] for i in matching], dtype=float),
+        )
+        for k, i in enumerate(matching):
+            results[i] = {name: column[k].tolist() for name, column in scores.items()}
+        return results
 
-        # Mahalanobis distance
-        cov_matrix = np.cov(np.vstack([metric_mean, x]), rowvar=False)
-        inv_cov_matrix = np.linalg.pinv(cov_matrix)
-        diff = x - metric_mean
-        mahalanobis_distance = np.sqrt(np.dot(np.dot(diff, inv_cov_matrix), diff.T))
+    def _score(self, x, model_data, top_k=0):
+        """Computes the per-row anomaly scores for an (N, d) matrix, or None on a dimension mismatch."""
+        metric_mean = np.asarray(model_data["means"], dtype=float)
+        metric_stds = np.asarray(model_data["stds"], dtype=float)
 
-        # Define anomaly detection thresholds
-        anomaly_detected = (anomaly_score_z > 3) or (anomaly_score_prob < 0.01) or (mahalanobis_distance > 3)
+        if x.shape[1] != len(metric_mean):
+            return None
 
-        return {
-            "z_score_anomaly": float(anomaly_score_z),
-            "gaussian_probability": float(anomaly_score_prob),
-            "mahalanobis_distance": float(mahalanobis_distance),
-            "anomaly_detected": bool(anomaly_detected)
-        }
\ No newline at end of file
+        if not isinstance(model_data.get("precision_cholesky"), np.ndarray):
+            model_data = self.prepare(model_data)
+        return anomaly_scores(x, metric_mean, metric_stds, model_data["precision_cholesky"],
+                              model_data.get("mahalanobis_threshold", 3), top_k)
@@ -0,0 +1,126 @@
+import numpy as np
+
+from config import ANOMALY_CONTAMINATION, ANOMALY_CALIBRATION_ROWS
+
+
+def training_matrix(training_data):
+    x = np.asarray(training_data, dtype=float)
+    if x.ndim != 2 or len(x) < 2:
+        raise ValueError("Training data must be a matrix with at least two rows")
+    return x
+
+
+def calibrate_threshold(score, x, contamination=None, seed=0):
+    """
+    Score above which a fraction `contamination` of the training rows falls.
+
+    score maps an (N, d) matrix to (N,) scores; at most ANOMALY_CALIBRATION_ROWS rows are scored.
+    """
+    contamination = ANOMALY_CONTAMINATION if contamination is None else contamination
+    if len(x) > ANOMALY_CALIBRATION_ROWS:
+        x = x[np.random.default_rng(seed).choice(len(x), ANOMALY_CALIBRATION_ROWS, replace=False)]
+    return float(np.quantile(score(x), 1 - contamination))
+
+
+class Detector:
+    """
+    Interface shared by the anomaly detectors of the registry.
+
+    fit turns training rows into a compact model document of NumPy arrays and scalars, tagged
+    with the detector's "algorithm"; _score turns an (N, d) matrix into per-row score columns,
+    one of them the boolean anomaly_detected, or returns None on a dimension mismatch. Detectors
+    that explain their scores add (N, top_k) attribution columns when asked for top_k features.
+    The single-point and batch paths below are shared by every detector.
+    """
+
+    algorithm = None
+    # Keyword arguments of fit that callers may set per run.
+    options = ()
+    # Score columns reported as max_<name> in the batch summary.
+    summary_maxima = ("anomaly_score",)
+    # Whether _score can attribute its score to the top_k features (see metrics.explainability).
+    explains = False
+
+    def fit(self, training_data, **options):
+        raise NotImplementedError
+
+    def update(self, model_data, new_data, decay=None, window=None):
+        raise ValueError(f"The {self.algorithm} detector does not support online updates, refit the model instead")
+
+    def prepare(self, model_data):
+        """Converts stored parameters into the form kept in the model cache."""
+        return model_data
+
+    def _score(self, x, model_data, top_k=0):
+        raise NotImplementedError
+
+    def _unexplained(self, top_k):
+        if top_k and not self.explains:
+            return f"The {self.algorithm} detector does not explain its scores"
+        return None
+
+    def detect(self, values, model_data, top_k=0):
+        """Scores a single point, with its top_k contributing features when asked."""
+        x = np.asarray(values, dtype=float)
+        if x.ndim != 1:
+            return "Dimension mismatch"
+        if self._unexplained(top_k):
+            return self._unexplained(top_k)
+
+        scores = self._score(x[np.newaxis, :], model_data, top_k)
+        if scores is None:
+            return "Dimension mismatch"
+
+        return {name: column[0].tolist() for name, column in scores.items()}
+
+    def detect_points(self, points, model_data):
+        """Scores single points of separate requests in one pass; one result per point, as detect returns it."""
+        results = ["Dimension mismatch"] * len(points)
+        by_length = {}
+        for i, point in enumerate(points):
+            if np.ndim(point) == 1:
+                by_length.setdefault(len(point), []).append(i)
+        # Points of the model's length form one group; the others fail _score's dimension check.
+        for indices in by_length.values():
+            scores = self._score(np.asarray([points[i] for i in indices], dtype=float), model_data)
+            if scores is None:
+                continue
+            columns = {name: column.tolist() for name, column in scores.items()}
+            for row, i in enumerate(indices):
+                results[i] = {name: column[row] for name, column in columns.items()}
+        return results
+
+    def detect_batch(self, values, model_data, as_arrays=False, top_k=0):
+        """Scores an (N, d) matrix of points against the model in one vectorized pass, as lists or NumPy columns."""
+        try:
+            x = np.asarray(values, dtype=float)
+        except ValueError:
+            return "Dimension mismatch"
+        if x.ndim != 2:
+            return "Dimension mismatch"
+        if self._unexplained(top_k):
+            return self._unexplained(top_k)
+
+        scores = self._score(x, model_data, top_k)
+        if scores is None:
+            return "Dimension mismatch"
+
+        flagged = np.flatnonzero(scores["anomaly_detected"])
+        return {
+            "results": scores if as_arrays else {name: column.tolist() for name, column in scores.items()},
+            "summary": {
+                "count": len(x),
+                "anomalies": len(flagged),
+                "anomaly_rate": len(flagged) / len(x) if len(x) else 0.0,
+                "anomaly_indices": flagged.tolist(),
+                **{f"max_{name}": float(np.max(scores[name], initial=0.0)) for name in self.summary_maxima},
+            },
+        }
+
+    def detect_many(self, values, models):
+        """Scores an (N, d) matrix against several models; returns one result per model or "Dimension mismatch"."""
+        results = []
+        for model_data in models:
+            result = self.detect_batch(values, model_data)
+            results.append(result if isinstance(result, str) else result["results"])
+        return results
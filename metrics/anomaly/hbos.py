@@ -0,0 +1,92 @@
+"""
+        Histogram-Based Outlier Score (HBOS).
+
+        → Formula:
+          HBOS(x) = Σ_f log(1 / hist_f(x_f))
+        - hist_f is the density histogram of feature f scaled so its highest bin is 1.
+
+        Bin edges are training quantiles, so every bin holds about the same number of rows and
+        the histogram follows heavy tails instead of leaving most equal-width bins empty; tied
+        edges leave zero-width bins that no value can fall into. Densities use (count + 0.5)
+        and values outside the training range score as a half-row bin of typical width.
+        Features are treated independently, so fitting and scoring are O(n·d) and the model
+        is two (bins, d) tables. The score is a sum over features, so each term log(1 / hist_f)
+        is that feature's contribution when explaining a point.
+"""
+import numpy as np
+
+from config import HBOS_BINS
+from metrics.explainability.explainability import explain, explained_rows
+from .detector import Detector, calibrate_threshold, training_matrix
+
+# Comparisons done at once when placing a batch in the bins.
+BIN_CHUNK_ELEMENTS = 1 << 22
+PSEUDO_COUNT = 0.5
+
+
+def bin_indices(x, edges):
+    """Bin of every value of an (N, d) matrix: 0 below the first edge, len(edges) above the last, 1 … len(edges) - 1 inside."""
+    inner = edges[1:-1]
+    chunk = max(1, BIN_CHUNK_ELEMENTS // max(1, inner.size))
+    bins = np.concatenate([
+        np.count_nonzero(inner[np.newaxis] <= x[start:start + chunk, np.newaxis], axis=1)
+        for start in range(0, len(x), chunk)
+    ]) + 1
+    bins[x < edges[0]] = 0
+    bins[x > edges[-1]] = len(edges)
+    return bins
+
+
+class HBOSDetector(Detector):
+    algorithm = "hbos"
+    options = ("bins", "contamination")
+    explains = True
+
+    def fit(self, training_data, bins=HBOS_BINS, contamination=None):
+        x = training_matrix(training_data)
+        n_samples, n_features = x.shape
+        ordered = np.sort(x, axis=0)
+        edges = ordered[np.round(np.linspace(0, n_samples - 1, bins + 1)).astype(np.intp)]
+
+        placed = bin_indices(x, edges)
+        columns = np.broadcast_to(np.arange(n_features), placed.shape)
+        counts = np.bincount((placed * n_features + columns).ravel(), minlength=(bins + 2) * n_features)
+        counts = counts.reshape(bins + 2, n_features)[1:-1]
+
+        typical = (edges[-1] - edges[0]) / bins
+        typical = np.where(typical > 0, typical, 1.0)
+        widths = np.maximum(np.diff(edges, axis=0), typical * 1e-3)
+        density = (counts + PSEUDO_COUNT) / (n_samples * widths)
+        peak = np.max(np.where(counts > 0, density, 0), axis=0)
+        outside = PSEUDO_COUNT / (n_samples * typical)
+        log_height = np.log(np.vstack([outside, density, outside]) / peak)
+
+        model_data = {"algorithm": self.algorithm, "edges": edges, "log_height": np.minimum(log_height, 0.0),
+                      "n_samples": n_samples}
+        model_data["threshold"] = calibrate_threshold(lambda rows: self._terms(rows, model_data).sum(axis=1), x, contamination)
+        return model_data
+
+    def prepare(self, model_data):
+        prepared = dict(model_data)
+        for name in ("edges", "log_height"):
+            prepared[name] = np.array(model_data[name], dtype=float, copy=None)
+            prepared[name].flags.writeable = False
+        return prepared
+
+    @staticmethod
+    def _terms(x, model_data):
+        """log(1 / hist_f(x_f)) for every value of an (N, d) matrix."""
+        log_height = np.asarray(model_data["log_height"], dtype=float)
+        bins = bin_indices(x, np.asarray(model_data["edges"], dtype=float))
+        return -np.take_along_axis(log_height, bins, axis=0)
+
+    def _score(self, x, model_data, top_k=0):
+        if x.shape[1] != np.shape(model_data["edges"])[1]:
+            return None
+        terms = self._terms(x, model_data)
+        score = terms.sum(axis=1)
+        scores = {"anomaly_score": score, "anomaly_detected": score > model_data["threshold"]}
+        if top_k:
+            rows = explained_rows(scores["anomaly_detected"])
+            scores.update(explain(len(x), rows, top_k, terms[rows]))
+        return scores
@@ -0,0 +1,125 @@
+"""
+        Isolation forest in NumPy.
+
+        Anomalies are few and different, so random axis-aligned splits isolate them in fewer
+        steps than normal points.
+        → Formula:
+          s(x) = 2^(-E[h(x)] / c(ψ)),   c(n) = 2·H(n - 1) - 2(n - 1)/n
+        - h(x) is the path length of x in one tree, averaged over the trees; ψ is the subsample
+          size. s close to 1 is an anomaly, well below 0.5 is normal.
+
+        Every tree is a complete binary tree of depth ⌈log₂ ψ⌉ stored level by level, as a split
+        feature and threshold per node (threshold +inf when the node could not be split, sending
+        every value left), plus the path length of every leaf, c(size) included. All trees are
+        grown together one level at a time, and a batch is scored by walking every row down every
+        tree at once, so neither fit nor detection loops over nodes in Python.
+"""
+import numpy as np
+
+from config import ISOLATION_FOREST_TREES, ISOLATION_FOREST_SAMPLE_SIZE
+from .detector import Detector, calibrate_threshold, training_matrix
+
+EULER_GAMMA = 0.5772156649015329
+# Rows walked down the forest at once, bounding the (rows, trees) index arrays.
+SCORE_CHUNK_ROWS = 4096
+
+
+def average_path_length(n):
+    """c(n): average path length of an unsuccessful binary search tree lookup among n points."""
+    n = np.asarray(n, dtype=float)
+    harmonic = np.log(np.maximum(n - 1, 1)) + EULER_GAMMA
+    return np.where(n > 2, 2 * harmonic - 2 * (n - 1) / np.maximum(n, 1), np.where(n == 2, 1.0, 0.0))
+
+
+class IsolationForestDetector(Detector):
+    algorithm = "isolation_forest"
+    options = ("n_trees", "sample_size", "contamination")
+
+    def fit(self, training_data, n_trees=ISOLATION_FOREST_TREES, sample_size=ISOLATION_FOREST_SAMPLE_SIZE,
+            contamination=None, seed=0):
+        x = training_matrix(training_data)
+        n_samples, n_features = x.shape
+        sample_size = min(sample_size, n_samples)
+        depth = max(1, int(np.ceil(np.log2(sample_size))))
+        rng = np.random.default_rng(seed)
+
+        trees = np.arange(n_trees)[:, np.newaxis]
+        samples = x[np.stack([rng.choice(n_samples, sample_size, replace=False) for _ in range(n_trees)])]
+        node = np.zeros((n_trees, sample_size), dtype=np.intp)
+        splits = np.zeros((n_trees, sample_size), dtype=np.intp)
+        features = np.zeros((n_trees, 2 ** depth - 1), dtype=np.int32)
+        thresholds = np.full((n_trees, 2 ** depth - 1), np.inf)
+
+        for level in range(depth):
+            width = 2 ** level
+            feature = rng.integers(n_features, size=(n_trees, width))
+            values = np.take_along_axis(samples, np.take_along_axis(feature, node, axis=1)[..., np.newaxis], axis=2)[..., 0]
+            cells = (trees * width + node).ravel()
+            low = np.full(n_trees * width, np.inf)
+            high = np.full(n_trees * width, -np.inf)
+            np.minimum.at(low, cells, values.ravel())
+            np.maximum.at(high, cells, values.ravel())
+            splittable = high > low
+            # Uniform in (low, high], so both children keep at least one sample.
+            span = np.where(splittable, high - low, 0.0)
+            threshold = np.where(splittable, np.where(splittable, low, 0.0) + (1 - rng.random(n_trees * width)) * span, np.inf)
+
+            features[:, width - 1:2 * width - 1] = feature
+            thresholds[:, width - 1:2 * width - 1] = threshold.reshape(n_trees, width)
+            splits += splittable[cells].reshape(n_trees, sample_size)
+            node = node * 2 + (values >= threshold[cells].reshape(n_trees, sample_size))
+
+        leaves = (trees * 2 ** depth + node).ravel()
+        leaf_size = np.bincount(leaves, minlength=n_trees * 2 ** depth)
+        leaf_splits = np.zeros(n_trees * 2 ** depth)
+        leaf_splits[leaves] = splits.ravel()
+        path_lengths = (leaf_splits + average_path_length(leaf_size)).reshape(n_trees, 2 ** depth)
+
+        model_data = {
+            "algorithm": self.algorithm,
+            "features": features,
+            "thresholds": thresholds,
+            "path_lengths": path_lengths,
+            "normalizer": float(average_path_length(sample_size)),
+            "n_features": n_features,
+            "n_samples": n_samples,
+        }
+        model_data["threshold"] = calibrate_threshold(lambda rows: self._paths(rows, model_data)[0], x, contamination)
+        return model_data
+
+    def prepare(self, model_data):
+        prepared = dict(model_data)
+        prepared["features"] = np.array(model_data["features"], dtype=np.intp)
+        for name in ("thresholds", "path_lengths"):
+            prepared[name] = np.array(model_data[name], dtype=float, copy=None)
+        for name in ("features", "thresholds", "path_lengths"):
+            prepared[name].flags.writeable = False
+        return prepared
+
+    @staticmethod
+    def _paths(x, model_data):
+        """Returns (anomaly score, mean path length) per row."""
+        features = np.asarray(model_data["features"], dtype=np.intp)
+        thresholds = np.asarray(model_data["thresholds"], dtype=float)
+        path_lengths = np.asarray(model_data["path_lengths"], dtype=float)
+        n_trees, n_nodes = features.shape
+        trees = np.arange(n_trees)
+
+        mean_paths = np.empty(len(x))
+        for start in range(0, len(x), SCORE_CHUNK_ROWS):
+            rows = x[start:start + SCORE_CHUNK_ROWS]
+            node = np.zeros((len(rows), n_trees), dtype=np.intp)
+            width = 1
+            while width <= n_nodes:
+                index = width - 1 + node
+                values = np.take_along_axis(rows, features[trees, index], axis=1)
+                node = node * 2 + (values >= thresholds[trees, index])
+                width *= 2
+            mean_paths[start:start + len(rows)] = path_lengths[trees, node].mean(axis=1)
+        return np.exp2(-mean_paths / model_data["normalizer"]), mean_paths
+
+    def _score(self, x, model_data, top_k=0):
+        if x.shape[1] != model_data["n_features"]:
+            return None
+        score, mean_paths = self._paths(x, model_data)
+        return {"anomaly_score": score, "path_length": mean_paths, "anomaly_detected": score > model_data["threshold"]}
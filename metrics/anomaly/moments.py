@@ -0,0 +1,125 @@
+"""
+        Mergeable sufficient statistics for the Gaussian anomaly model.
+
+        Each partial summary keeps, around its own mean μ:
+            n,  μ,  M2 = Σ zzᵀ,  T3 = Σ |z|² z,  Q4 = Σ |z|⁴      with z = x - μ
+
+        Two summaries are combined with Chan et al.'s pairwise update: both are shifted to the
+        combined mean, δ = μ_ab - μ, and then added:
+            M2' = M2 + n δδᵀ
+            T3' = T3 - 2 M2 δ - tr(M2) δ - n |δ|² δ
+            Q4' = Q4 + 4 δᵀM2δ - 4 T3ᵀδ + 2 |δ|² tr(M2) + n |δ|⁴
+
+        M2 gives the covariance, T3 and Q4 are only needed for Ledoit-Wolf shrinkage. Scaling
+        every term by λ (count included) down-weights old data for exponential forgetting.
+        Memory is O(d²) whatever the number of rows, and chunks can be merged in any order.
+"""
+import numpy as np
+
+
+class MomentAccumulator:
+    def __init__(self, n_features=None):
+        self.count = 0.0
+        self.mean = None
+        self.comoment = None
+        self.third_moment = None
+        self.fourth_moment = 0.0
+        if n_features is not None:
+            self._reset(n_features)
+
+    @property
+    def n_features(self):
+        return None if self.mean is None else len(self.mean)
+
+    def _reset(self, n_features):
+        self.mean = np.zeros(n_features)
+        self.comoment = np.zeros((n_features, n_features))
+        self.third_moment = np.zeros(n_features)
+
+    def update(self, chunk):
+        """Folds an (n, d) chunk of rows into the summary."""
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim != 2:
+            raise ValueError("Expected a 2-D chunk of rows")
+        if len(chunk) == 0:
+            return self
+
+        mean = chunk.mean(axis=0)
+        centered = chunk - mean
+        squared_norms = np.einsum("ij,ij->i", centered, centered)
+        partial = MomentAccumulator()
+        partial.count = float(len(chunk))
+        partial.mean = mean
+        partial.comoment = centered.T @ centered
+        partial.third_moment = squared_norms @ centered
+        partial.fourth_moment = float(squared_norms @ squared_norms)
+        return self.merge(partial)
+
+    def merge(self, other):
+        """Combines another summary into this one."""
+        if other.count == 0:
+            return self
+        if self.mean is None:
+            self._reset(other.n_features)
+        if other.n_features != self.n_features:
+            raise ValueError("Dimension mismatch")
+
+        count = self.count + other.count
+        mean = self.mean + (other.mean - self.mean) * (other.count / count)
+        parts = [self._shifted(mean), other._shifted(mean)]
+
+        self.count = count
+        self.mean = mean
+        self.comoment = parts[0][0] + parts[1][0]
+        self.third_moment = parts[0][1] + parts[1][1]
+        self.fourth_moment = parts[0][2] + parts[1][2]
+        return self
+
+    def _shifted(self, new_mean):
+        """Returns (M2, T3, Q4) re-centred on new_mean."""
+        if self.count == 0:
+            return 0.0, 0.0, 0.0
+        delta = new_mean - self.mean
+        delta_sq = float(delta @ delta)
+        trace = float(np.trace(self.comoment))
+        comoment_delta = self.comoment @ delta
+        comoment = self.comoment + self.count * np.outer(delta, delta)
+        third = self.third_moment - 2 * comoment_delta - trace * delta - self.count * delta_sq * delta
+        fourth = (self.fourth_moment + 4 * float(delta @ comoment_delta) - 4 * float(self.third_moment @ delta)
+                  + 2 * delta_sq * trace + self.count * delta_sq ** 2)
+        return comoment, third, fourth
+
+    def scale(self, factor):
+        """Down-weights everything seen so far, e.g. for exponential forgetting before a merge."""
+        self.count *= factor
+        if self.mean is not None:
+            self.comoment = self.comoment * factor
+            self.third_moment = self.third_moment * factor
+            self.fourth_moment *= factor
+        return self
+
+    def covariance(self, ddof=1):
+        """Sample covariance of everything seen so far."""
+        if self.count - ddof <= 0:
+            return np.zeros_like(self.comoment)
+        return self.comoment / (self.count - ddof)
+
+    def to_state(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "comoment": self.comoment,
+            "third_moment": self.third_moment,
+            "fourth_moment": self.fourth_moment,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls()
+        if state and state.get("mean") is not None:
+            accumulator.count = float(state["count"])
+            accumulator.mean = np.array(state["mean"], dtype=float)
+            accumulator.comoment = np.array(state["comoment"], dtype=float)
+            accumulator.third_moment = np.array(state["third_moment"], dtype=float)
+            accumulator.fourth_moment = float(state["fourth_moment"])
+        return accumulator
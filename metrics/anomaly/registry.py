@@ -0,0 +1,38 @@
+from .anomaly import AnomalyMetric
+from .hbos import HBOSDetector
+from .isolation_forest import IsolationForestDetector
+from .robust import RobustDetector
+
+# One instance per algorithm; detectors keep no per-model state, so they are shared.
+DETECTORS = {detector.algorithm: detector for detector in (
+    AnomalyMetric(), RobustDetector(), HBOSDetector(), IsolationForestDetector())}
+# Models stored before the registry existed are Gaussian.
+DEFAULT_ALGORITHM = "gaussian"
+
+
+def get_detector(algorithm):
+    """Returns the detector registered under algorithm, or raises ValueError."""
+    try:
+        return DETECTORS[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown algorithm '{algorithm}', expected one of {sorted(DETECTORS)}")
+
+
+def detector_for(model_data):
+    """Returns the detector a stored model was fitted with."""
+    return get_detector(model_data.get("algorithm", DEFAULT_ALGORITHM))
+
+
+def detect_many(values, models):
+    """Scores the rows against several models, each algorithm's models together; one result per model."""
+    results = [None] * len(models)
+    by_algorithm = {}
+    for i, model_data in enumerate(models):
+        by_algorithm.setdefault(model_data.get("algorithm", DEFAULT_ALGORITHM), []).append(i)
+    for algorithm, indices in by_algorithm.items():
+        scores = get_detector(algorithm).detect_many(values, [models[i] for i in indices])
+        if isinstance(scores, str):
+            return scores
+        for i, score in zip(indices, scores):
+            results[i] = score
+    return results
@@ -0,0 +1,122 @@
+"""
+        Time-bucketed count arrays shared by the streaming accuracy and fairness accumulators.
+
+        Counts are kept per fixed-width time bucket (e.g. one hour), as one int64 array of shape
+        (n_buckets, *cell_shape) next to the sorted bucket start times. Because counts only ever
+        add up, any window is a sum over a slice of buckets:
+            current   sum over every retained bucket
+            sliding   sum over the buckets overlapping [now - window, now), so the bucket holding
+                      the window start counts whole and a window shorter than a bucket still sees it
+            tumbling  np.add.reduceat over runs of buckets sharing start // window
+
+        Two summaries merge by adding counts bucket by bucket, so a client only ever sends the
+        new predictions and the stored state stays O(retained buckets × cells).
+
+        Group and class labels are kept in order of first appearance, so the index of a label
+        never changes and a new label only appends a zero-padded slot.
+"""
+import numpy as np
+
+# Integer labels below this bound are counted directly instead of going through np.unique's sort.
+DIRECT_ENCODING_LIMIT = 1 << 16
+
+
+def encode_groups(values):
+    """Returns (labels, codes) with codes[i] the index of values[i] in labels."""
+    values = np.asarray(values)
+    if values.ndim != 1:
+        raise ValueError("Labels must be a 1-D sequence")
+    if values.dtype.kind in "iub" and values.size and 0 <= values.min() and values.max() < DIRECT_ENCODING_LIMIT:
+        values = values.astype(np.intp, copy=False)
+        present = np.bincount(values) > 0
+        lookup = np.cumsum(present) - 1
+        return np.flatnonzero(present), lookup[values]
+    return np.unique(values, return_inverse=True)
+
+
+def extend_labels(labels, values):
+    """Encodes values against a list of known labels, appending unseen ones; returns (labels, codes)."""
+    batch_labels, batch_codes = encode_groups(values)
+    labels = list(labels)
+    index = {label: i for i, label in enumerate(labels)}
+    mapping = np.empty(len(batch_labels), dtype=np.intp)
+    for i, label in enumerate(batch_labels.tolist()):
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+        mapping[i] = index[label]
+    return labels, mapping[batch_codes]
+
+
+def bucket_rows(timestamps, n_rows, bucket_seconds):
+    """Returns (bucket starts, per-row bucket index) for one timestamp per row or one for the batch."""
+    timestamps = np.broadcast_to(np.asarray(timestamps, dtype=float), (n_rows,))
+    starts = (np.floor(timestamps / bucket_seconds) * bucket_seconds).astype(np.int64)
+    return np.unique(starts, return_inverse=True)
+
+
+class BucketedCounts:
+    def __init__(self, bucket_seconds, cell_shape):
+        self.bucket_seconds = int(bucket_seconds)
+        self.starts = np.empty(0, dtype=np.int64)
+        self.counts = np.zeros((0, *cell_shape), dtype=np.int64)
+
+    @property
+    def cell_shape(self):
+        return self.counts.shape[1:]
+
+    def resize(self, cell_shape):
+        """Zero-pads every bucket to a larger cell shape, e.g. when a new group or class shows up."""
+        cell_shape = tuple(cell_shape)
+        if cell_shape == self.cell_shape:
+            return self
+        padding = [(0, 0)] + [(0, new - old) for new, old in zip(cell_shape, self.cell_shape)]
+        self.counts = np.pad(self.counts, padding)
+        return self
+
+    def add(self, starts, counts):
+        """Adds (k, *cell_shape) counts for the sorted, unique bucket starts."""
+        starts = np.asarray(starts, dtype=np.int64)
+        merged = np.union1d(self.starts, starts)
+        if len(merged) != len(self.starts):
+            grown = np.zeros((len(merged), *self.cell_shape), dtype=np.int64)
+            grown[np.searchsorted(merged, self.starts)] = self.counts
+            self.starts, self.counts = merged, grown
+        np.add.at(self.counts, np.searchsorted(self.starts, starts), counts)
+        return self
+
+    def prune(self, oldest_start):
+        """Drops every bucket that started before oldest_start."""
+        keep = self.starts >= oldest_start
+        self.starts, self.counts = self.starts[keep], self.counts[keep]
+        return self
+
+    def total(self, start=None, end=None):
+        """Summed counts of the buckets overlapping [start, end), whole buckets at both edges."""
+        keep = np.ones(len(self.starts), dtype=bool)
+        if start is not None:
+            keep &= self.starts + self.bucket_seconds > start
+        if end is not None:
+            keep &= self.starts < end
+        return self.counts[keep].sum(axis=0)
+
+    def tumbling(self, window_seconds):
+        """Returns (window_starts, counts) for consecutive non-overlapping windows that hold data."""
+        if window_seconds % self.bucket_seconds:
+            raise ValueError(f"Tumbling windows must be a multiple of the {self.bucket_seconds}s bucket width")
+        if len(self.starts) == 0:
+            return self.starts, self.counts
+        windows = self.starts // window_seconds
+        _, first = np.unique(windows, return_index=True)
+        return windows[first] * window_seconds, np.add.reduceat(self.counts, first, axis=0)
+
+    def to_state(self):
+        return {"bucket_seconds": self.bucket_seconds, "starts": self.starts, "counts": self.counts}
+
+    @classmethod
+    def from_state(cls, state):
+        counts = np.array(state["counts"], dtype=np.int64)
+        bucketed = cls(state["bucket_seconds"], counts.shape[1:])
+        bucketed.starts = np.array(state["starts"], dtype=np.int64)
+        bucketed.counts = counts
+        return bucketed
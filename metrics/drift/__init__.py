@@ -1 +1,2 @@
-from .drift import DriftMetric
\ No newline at end of file
+from .drift import DriftMetric
+from .sketch import QuantileSketch
@@ -11,14 +11,145 @@
 
         Formula:
         JS(P || Q) = 1/2 KL(P || M) + 1/2 KL(Q || M)
+
+        Both tests run on every feature at once. The reference sample and the new batch are
+        concatenated and sorted column-wise with one argsort; a running sum of +1/n_ref and
+        -1/n_new along that order, read at the last of each run of equal values, is
+        F1(x) - F2(x) at every point, so KS is the column-wise maximum of its absolute value.
+        The JS histogram bins are edged by sketch points, so the same merged sort also counts
+        the batch per bin. The reference is the quantile sketch stored with the model, so a
+        check costs O(batch) instead of re-sorting the training set.
+
+        A sketch of m points pins the reference CDF down to about 1/(2m), so the KS p-value
+        counts the reference as min(n_samples, m) points: with the full training count, the
+        critical value of a million-row training set and batch falls below the sketch's own
+        error and healthy batches are flagged.
 """
 
-from scipy.stats import ks_2samp
 import numpy as np
 
+from config import DRIFT_SKETCH_SIZE, DRIFT_HISTOGRAM_BINS, DRIFT_P_VALUE, DRIFT_JS_THRESHOLD
+from .sketch import QuantileSketch
+
+
+def _merge_sorted(reference, values):
+    """
+    Sorts the columns of two (n, d) arrays together, in feature-major (d, n_reference + n_values) layout.
+
+    Returns the argsort order and, for every sorted entry, the index of the last entry equal to
+    it, so ties are resolved the same way whatever order the sort left them in.
+    """
+    combined = np.concatenate([np.asarray(reference).T, np.asarray(values).T], axis=1)
+    order = np.argsort(combined, axis=1)
+    ordered = np.take_along_axis(combined, order, axis=1)
+    distinct = np.ones(ordered.shape, dtype=bool)
+    distinct[:, :-1] = ordered[:, 1:] != ordered[:, :-1]
+    tie_end = np.where(distinct, np.arange(ordered.shape[1]), ordered.shape[1])
+    return order, np.minimum.accumulate(tie_end[:, ::-1], axis=1)[:, ::-1]
+
+
+def edge_rows(n_points, bins):
+    """Rows of a sorted sketch used as the bin edges that split it into `bins` equal-mass bins."""
+    return np.arange(1, bins) * n_points // bins
+
+
+def ks_and_histogram(reference, new_data, edges=()):
+    """
+    KS statistic per column between a reference sample and new_data, and the (bins, d) histogram of new_data.
+
+    Both come from one merged sort. The bin edges are the reference rows listed in `edges`
+    (reference sorted per column); a value equal to an edge falls in the bin to its right.
+    """
+    n_reference, n_new = len(reference), len(new_data)
+    order, tie_end = _merge_sorted(reference, new_data)
+    is_reference = order < n_reference
+    gaps = np.cumsum(np.where(is_reference, 1.0 / n_reference, -1.0 / n_new), axis=1)
+    statistics = np.abs(np.take_along_axis(gaps, tie_end, axis=1)).max(axis=1)
+
+    is_edge = np.zeros(n_reference + n_new, dtype=bool)
+    is_edge[np.asarray(edges, dtype=np.intp)] = True
+    bins = np.take_along_axis(np.cumsum(is_edge[order], axis=1), tie_end, axis=1)
+    n_features, n_bins = len(order), len(edges) + 1
+    rows = np.broadcast_to(np.arange(n_features)[:, np.newaxis], bins.shape)
+    counts = np.bincount((rows * n_bins + bins)[~is_reference], minlength=n_features * n_bins)
+    return statistics, counts.reshape(n_features, n_bins).T
+
+
+def ks_statistics(reference, new_data):
+    """Two-sample KS statistic for every column of two (n, d) arrays, rows weighted equally."""
+    return ks_and_histogram(reference, new_data)[0]
+
+
+def ks_p_values(statistics, n_reference, n_new):
+    """Asymptotic two-sided p-values, as in scipy's ks_2samp(method="asymp")."""
+    # scipy.stats takes most of a cold start to import, so it is loaded on the first drift check.
+    from scipy.stats import kstwo
+    effective = max(1, round(n_reference * n_new / (n_reference + n_new)))
+    return np.clip(kstwo.sf(statistics, effective), 0.0, 1.0)
+
+
+def reference_size(baseline):
+    """Reference sample size for the KS p-value: the training rows, at most the sketch resolution."""
+    return min(baseline["n_samples"], len(baseline["quantiles"]))
+
+
+def js_divergence(p, q):
+    """Column-wise Jensen-Shannon divergence (base 2, between 0 and 1) of two (bins, d) distributions."""
+    m = (p + q) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kl_p = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=0)
+        kl_q = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=0)
+    return np.clip((kl_p + kl_q) / 2, 0.0, 1.0)
+
+
 class DriftMetric:
+    def __init__(self, sketch_size=DRIFT_SKETCH_SIZE, bins=DRIFT_HISTOGRAM_BINS):
+        self.sketch_size = sketch_size
+        self.bins = bins
+
+    def sketch(self, training_data=None):
+        """Returns a quantile sketch, filled with training_data when given."""
+        sketch = QuantileSketch(self.sketch_size)
+        return sketch if training_data is None else sketch.update(training_data)
+
+    def baseline(self, sketch):
+        """Builds the compact baseline stored with a model: quantile points plus the JS histogram."""
+        points = sketch.points
+        _, histogram = ks_and_histogram(points, points, edge_rows(len(points), self.bins))
+        return {"n_samples": sketch.count, "quantiles": points, "histogram": histogram / len(points)}
+
+    def compare(self, baseline, new_data, p_value=DRIFT_P_VALUE, js_threshold=DRIFT_JS_THRESHOLD):
+        """
+        Tests an (n, d) batch against a stored baseline, every feature in one vectorized pass.
+
+        A feature has drifted when its JS divergence exceeds js_threshold or its KS p-value is
+        below p_value / d (Bonferroni), so wide models do not flag drift by chance alone.
+        """
+        x = np.asarray(new_data, dtype=float)
+        quantiles = np.asarray(baseline["quantiles"], dtype=float)
+        histogram = np.asarray(baseline["histogram"], dtype=float)
+        if x.ndim != 2 or x.shape[1] != quantiles.shape[1]:
+            return "Dimension mismatch"
+        if len(x) == 0:
+            return "No data to compare"
+
+        statistics, counts = ks_and_histogram(quantiles, x, edge_rows(len(quantiles), len(histogram)))
+        p_values = ks_p_values(statistics, reference_size(baseline), len(x))
+        divergence = js_divergence(histogram, counts / len(x))
+
+        drifted = (p_values < p_value / x.shape[1]) | (divergence > js_threshold)
+        return {
+            "ks_statistic": statistics.tolist(),
+            "p_values": p_values.tolist(),
+            "js_divergence": divergence.tolist(),
+            "drifted_features": np.flatnonzero(drifted).tolist(),
+            "drift_detected": bool(drifted.any()),
+        }
+
     def check(self, baseline, new_data):
         """Uses Kolmogorov-Smirnov test to detect data drift."""
-        p_values = [ks_2samp(baseline[:, i], new_data[:, i]).pvalue for i in range(baseline.shape[1])]
+        baseline = np.asarray(baseline, dtype=float)
+        new_data = np.asarray(new_data, dtype=float)
+        p_values = ks_p_values(ks_statistics(baseline, new_data), len(baseline), len(new_data)).tolist()
         drift_detected = any(p < 0.05 for p in p_values)
-        return {"p_values": p_values, "drift_detected": drift_detected}
\ No newline at end of file
+        return {"p_values": p_values, "drift_detected": drift_detected}
@@ -0,0 +1,150 @@
+"""
+        Sliding-window drift monitor fed one detection request at a time.
+
+        Every incoming value is reduced to its rank among the baseline sketch points of its
+        feature, r = #(points ≤ x), and the monitor keeps:
+            ranks    (window, d) ring buffer of the ranks of the last `window` points
+            counts   (size + 1, d) number of window points per rank
+        Adding a point and evicting the oldest one only increments and decrements counts.
+
+        Between consecutive sketch points the baseline CDF is flat at k / size while the window
+        CDF climbs from C[k - 1] / m to C[k] / m (C = cumulative counts), so the exact KS
+        statistic against the sketch is
+            D = max_k max(|k/size - C[k-1]/m|, |k/size - C[k]/m|)
+        and the JS histogram is the counts summed over the ranks of each bin. Both cost
+        O(size × d) whatever the window length, instead of re-running ks_2samp on the window,
+        and are re-evaluated every `evaluate_every` points; the flag is kept in between.
+"""
+import threading
+
+import numpy as np
+
+from .drift import edge_rows, js_divergence, ks_p_values, reference_size
+
+# Largest number of comparisons done at once when ranking a batch against the sketch.
+RANK_CHUNK_ELEMENTS = 1 << 22
+
+
+class DriftMonitor:
+    def __init__(self, baseline, window, p_value, js_threshold, min_points, evaluate_every=1):
+        self.quantiles = np.asarray(baseline["quantiles"], dtype=float)
+        self.histogram = np.asarray(baseline["histogram"], dtype=float)
+        self.n_reference = float(reference_size(baseline))
+        self.window = int(window)
+        self.p_value = p_value
+        self.js_threshold = js_threshold
+        self.min_points = int(min_points)
+        self.evaluate_every = int(evaluate_every)
+
+        size, n_features = self.quantiles.shape
+        # Bin b holds the ranks in (edge[b - 1], edge[b]], i.e. the values between two edge points.
+        self.bin_starts = np.concatenate([[0], edge_rows(size, len(self.histogram)) + 1])
+        self.ranks = np.zeros((self.window, n_features), dtype=np.int32)
+        self.counts = np.zeros((size + 1, n_features), dtype=np.int64)
+        self.head = 0
+        self.filled = 0
+        self.observed = 0
+        self.checkpointed = 0
+        self.evaluated = 0
+        self.drift_detected = False
+        self._critical = {}
+        self._lock = threading.Lock()
+
+    @property
+    def n_features(self):
+        return self.quantiles.shape[1]
+
+    def rank(self, values):
+        """Number of sketch points ≤ each value, per feature, for an (m, d) array."""
+        chunk = max(1, RANK_CHUNK_ELEMENTS // self.quantiles.size)
+        return np.concatenate([
+            np.count_nonzero(self.quantiles[np.newaxis] <= values[start:start + chunk, np.newaxis], axis=1)
+            for start in range(0, len(values), chunk)
+        ]).astype(np.int32)
+
+    def observe(self, values):
+        """Slides the window over an (m, d) batch of points, returns whether drift is flagged afterwards."""
+        x = np.asarray(values, dtype=float)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            raise ValueError("Dimension mismatch")
+
+        ranks = self.rank(x[-self.window:])
+        with self._lock:
+            slots = (self.head + np.arange(len(ranks))) % self.window
+            occupied = self.filled + np.arange(len(ranks)) >= self.window
+            self._add(self.ranks[slots[occupied]], -1)
+            self._add(ranks, 1)
+            self.ranks[slots] = ranks
+            self.head = int((self.head + len(ranks)) % self.window)
+            self.filled = min(self.window, self.filled + len(ranks))
+            self.observed += len(x)
+            if self.observed - self.evaluated >= self.evaluate_every:
+                self.drift_detected = self._flagged()
+                self.evaluated = self.observed
+            return self.drift_detected
+
+    def _add(self, ranks, step):
+        """Adds step to the count of every (rank, feature) cell of an (m, d) array of ranks."""
+        np.add.at(self.counts, (ranks, np.arange(self.n_features)), step)
+
+    def _ks_and_js(self):
+        size = len(self.quantiles)
+        cumulative = np.cumsum(self.counts, axis=0) / self.filled
+        steps = (np.arange(size + 1) / size)[:, np.newaxis]
+        below = np.vstack([np.zeros((1, self.n_features)), cumulative[:-1]])
+        statistics = np.maximum(np.abs(steps - below), np.abs(steps - cumulative)).max(axis=0)
+        observed = np.add.reduceat(self.counts, self.bin_starts, axis=0) / self.filled
+        return statistics, js_divergence(self.histogram, observed)
+
+    def _critical_statistic(self):
+        """KS statistic above which the Bonferroni-corrected p-value falls below p_value, per window fill."""
+        critical = self._critical.get(self.filled)
+        if critical is None:
+            from scipy.stats import kstwo
+            effective = max(1, round(self.n_reference * self.filled / (self.n_reference + self.filled)))
+            critical = self._critical[self.filled] = float(kstwo.isf(self.p_value / self.n_features, effective))
+        return critical
+
+    def _flagged(self, statistics=None, divergence=None):
+        if self.filled < self.min_points:
+            return False
+        if statistics is None:
+            statistics, divergence = self._ks_and_js()
+        return bool(np.any(statistics > self._critical_statistic()) or np.any(divergence > self.js_threshold))
+
+    def status(self):
+        """Current window statistics per feature and the drift flag."""
+        with self._lock:
+            if self.filled == 0:
+                return {"points": 0, "observed": self.observed, "drift_detected": False}
+            statistics, divergence = self._ks_and_js()
+            p_values = ks_p_values(statistics, self.n_reference, self.filled)
+            drifted = (p_values < self.p_value / self.n_features) | (divergence > self.js_threshold)
+            self.drift_detected = self._flagged(statistics, divergence)
+            self.evaluated = self.observed
+            return {
+                "points": self.filled,
+                "observed": self.observed,
+                "ks_statistic": statistics.tolist(),
+                "p_values": p_values.tolist(),
+                "js_divergence": divergence.tolist(),
+                "drifted_features": np.flatnonzero(drifted).tolist() if self.filled >= self.min_points else [],
+                "drift_detected": self.drift_detected,
+            }
+
+    def to_state(self):
+        with self._lock:
+            return {"ranks": self.ranks.copy(), "head": self.head, "filled": self.filled, "observed": self.observed}
+
+    def restore(self, state):
+        """Reloads a checkpoint taken with to_state, if it matches this monitor's window and baseline."""
+        ranks = np.array(state["ranks"], dtype=np.int32)
+        if ranks.shape != self.ranks.shape or (ranks.size and ranks.max() > len(self.quantiles)):
+            return self
+        self.ranks = ranks
+        self.head, self.filled, self.observed = int(state["head"]), int(state["filled"]), int(state["observed"])
+        self.checkpointed = self.evaluated = self.observed
+        self.counts[:] = 0
+        self._add(self.ranks[:self.filled] if self.filled < self.window else self.ranks, 1)
+        self.drift_detected = self._flagged() if self.filled else False
+        return self
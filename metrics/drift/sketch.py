@@ -0,0 +1,84 @@
+"""
+        Mergeable per-feature quantile sketch used as the drift baseline.
+
+        A sketch keeps `size` sorted points per feature, the quantiles at probabilities
+        (k + 0.5) / size, so every point stands for an equal share of the rows seen. Two sketches
+        are merged by pooling their points with weights count / size, sorting each feature and
+        reading the pooled weighted CDF back at the same probabilities. A one-shot fit takes exact
+        quantiles of the data; a chunked fit merges one sketch per chunk, with an error of about
+        one point's mass. Memory is O(size × d) whatever the number of rows.
+"""
+import numpy as np
+
+
+class QuantileSketch:
+    def __init__(self, size):
+        self.size = int(size)
+        self.count = 0.0
+        self.points = None
+
+    @property
+    def n_features(self):
+        return None if self.points is None else self.points.shape[1]
+
+    @property
+    def probabilities(self):
+        return (np.arange(self.size) + 0.5) / self.size
+
+    def update(self, chunk):
+        """Folds an (n, d) chunk of rows into the sketch."""
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim != 2:
+            raise ValueError("Expected a 2-D chunk of rows")
+        if len(chunk) == 0:
+            return self
+        partial = QuantileSketch(self.size)
+        partial.count = float(len(chunk))
+        partial.points = _sorted_quantiles(np.sort(chunk, axis=0), partial.probabilities)
+        return self.merge(partial)
+
+    def merge(self, other):
+        """Combines another sketch of the same size into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.points = other.count, other.points.copy()
+            return self
+        if other.n_features != self.n_features:
+            raise ValueError("Dimension mismatch")
+
+        pooled = np.concatenate([self.points, other.points])
+        weights = np.concatenate([np.full(len(self.points), self.count / len(self.points)),
+                                  np.full(len(other.points), other.count / len(other.points))])
+        order = np.argsort(pooled, axis=0, kind="stable")
+        ordered = np.take_along_axis(pooled, order, axis=0)
+        mass = weights[order]
+        # Each point sits at the middle of its own mass on the pooled CDF.
+        positions = np.cumsum(mass, axis=0) - mass / 2
+
+        self.count += other.count
+        targets = self.probabilities * self.count
+        self.points = np.column_stack([
+            np.interp(targets, positions[:, feature], ordered[:, feature]) for feature in range(ordered.shape[1])
+        ])
+        return self
+
+    def to_state(self):
+        return {"size": self.size, "count": self.count, "points": self.points}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["size"])
+        if state.get("points") is not None:
+            sketch.count = float(state["count"])
+            sketch.points = np.array(state["points"], dtype=float)
+        return sketch
+
+
+def _sorted_quantiles(ordered, probabilities):
+    """np.quantile's linear interpolation on column-sorted rows, without its per-quantile partitioning."""
+    positions = probabilities * (len(ordered) - 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, len(ordered) - 1)
+    fraction = (positions - lower)[:, np.newaxis]
+    return ordered[lower] * (1 - fraction) + ordered[upper] * fraction
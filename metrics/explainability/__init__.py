@@ -0,0 +1 @@
+from .explainability import ExplainabilityMetric, explain, top_k
@@ -1 +1,71 @@
-# This file should include explainability metrics, such as SHAP values, feature importance scores, and local interpretable methods.
+"""
+        Per-feature attributions of the anomaly scores, computed in the scoring pass itself.
+
+        Z-score: z_f = (x_f - μ_f) / σ_f, so a point's z-score anomaly is its largest |z_f|.
+
+        Mahalanobis decomposition with the precision matrix Σ⁻¹ = U·Uᵀ (U is the factor stored
+        with the model) and δ = x - μ:
+            D² = δᵀ Σ⁻¹ δ = Σ_f δ_f · (Σ⁻¹ δ)_f,   c_f = δ_f · ((δU)·Uᵀ)_f
+        The contributions c_f add up to D² exactly. δU is already computed for the distance, so
+        the attribution costs one more (N, d) × (d, d) product. A contribution is negative when
+        the feature deviates in the direction its correlations with the others predict.
+
+        Only the top k features of every row are returned. They are picked with np.argpartition,
+        O(d) per row, and only those k are sorted, so wide models pay O(d + k log k) per row
+        instead of a full sort. In a batch only the flagged rows are explained, so the cost
+        follows the anomaly rate; the other rows get feature -1 and contribution 0.
+"""
+import numpy as np
+
+
+def top_k(contributions, k):
+    """Indices of the k largest values of every row, largest first, and those values."""
+    n_features = contributions.shape[-1]
+    k = min(k, n_features)
+    if k < n_features:
+        candidates = np.argpartition(-contributions, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_features), contributions.shape)
+    values = np.take_along_axis(contributions, candidates, axis=-1)
+    order = np.argsort(-values, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1), np.take_along_axis(values, order, axis=-1)
+
+
+def explained_rows(anomaly_detected):
+    """Rows worth explaining: the flagged rows of a batch, or every row (slice(None)) for a single point."""
+    return slice(None) if len(anomaly_detected) == 1 else np.flatnonzero(anomaly_detected)
+
+
+def explain(n_rows, rows, k, contributions, **aligned):
+    """
+    (n_rows, k) attribution columns: top_features, top_contributions and top_<name> per aligned array.
+
+    contributions and the aligned arrays (e.g. z-scores) are (m, d), for the rows selected by
+    rows (indices or a slice) only; features are ranked by contribution and the aligned arrays read at the same features.
+    """
+    features, values = top_k(contributions, k)
+    columns = {"top_features": features, "top_contributions": values}
+    for name, array in aligned.items():
+        columns[f"top_{name}"] = np.take_along_axis(array, features, axis=-1)
+    if len(features) == n_rows:
+        return columns
+    filled = {}
+    for name, column in columns.items():
+        filled[name] = np.full((n_rows, column.shape[1]), -1 if name == "top_features" else 0, dtype=column.dtype)
+        filled[name][rows] = column
+    return filled
+
+
+def mahalanobis_contributions(diff, whitened, precision_factor):
+    """Per-feature terms of D² = δᵀ Σ⁻¹ δ, from δ and the whitened δU of the scoring pass."""
+    return diff * (whitened @ precision_factor.T)
+
+
+class ExplainabilityMetric:
+    def rank(self, feature_importances, k=None):
+        """Ranks features by importance, largest first, as (index, importance) pairs; only the top k when given."""
+        importances = np.asarray(feature_importances, dtype=float)
+        if importances.ndim != 1:
+            return "Feature importances must be a flat list"
+        features, values = top_k(importances, len(importances) if k is None else k)
+        return {"importance_rank": [[int(feature), float(value)] for feature, value in zip(features, values)]}
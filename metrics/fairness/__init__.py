@@ -1 +1,2 @@
-from .fairness import FairnessMetric
\ No newline at end of file
+from .fairness import FairnessMetric
+from .accumulator import GroupConfusionAccumulator
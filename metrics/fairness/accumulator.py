@@ -0,0 +1,103 @@
+import numpy as np
+
+from metrics.buckets import BucketedCounts, bucket_rows, extend_labels
+from metrics.fairness.fairness import FairnessMetric, group_confusion_matrices
+
+
+class GroupConfusionAccumulator:
+    """Per-group confusion matrices per time bucket, for each sensitive attribute."""
+
+    def __init__(self, bucket_seconds):
+        self.bucket_seconds = int(bucket_seconds)
+        self.attributes = {}
+        self.metric = FairnessMetric()
+
+    @property
+    def rows(self):
+        return max((int(buckets.counts.sum()) for _, buckets in self.attributes.values()), default=0)
+
+    def update(self, predictions, actuals, sensitive_attributes, timestamps):
+        """Folds a batch of predictions into the buckets of their timestamps, for every attribute."""
+        n_rows = len(predictions)
+        if len(actuals) != n_rows:
+            raise ValueError("predictions and actuals must have the same length")
+        if n_rows == 0:
+            return self
+
+        starts, bucket_codes = bucket_rows(timestamps, n_rows, self.bucket_seconds)
+        for name, values in sensitive_attributes.items():
+            if len(values) != n_rows:
+                raise ValueError(f"Sensitive attribute '{name}' must have one value per prediction")
+            labels, buckets = self.attributes.get(name) or ([], BucketedCounts(self.bucket_seconds, (0, 2, 2)))
+            labels, codes = extend_labels(labels, values)
+            n_groups = len(labels)
+            matrices = group_confusion_matrices(predictions, actuals, bucket_codes * n_groups + codes, len(starts) * n_groups)
+            buckets.resize((n_groups, 2, 2)).add(starts, matrices.reshape(len(starts), n_groups, 2, 2))
+            self.attributes[name] = (labels, buckets)
+        return self
+
+    def merge(self, other):
+        """Adds another accumulator's counts, matching attributes by name and groups by label."""
+        if other.bucket_seconds != self.bucket_seconds:
+            raise ValueError("Cannot merge counts with different bucket widths")
+        for name, (other_labels, other_buckets) in other.attributes.items():
+            labels, buckets = self.attributes.get(name) or ([], BucketedCounts(self.bucket_seconds, (0, 2, 2)))
+            labels, codes = extend_labels(labels, other_labels)
+            counts = np.zeros((len(other_buckets.starts), len(labels), 2, 2), dtype=np.int64)
+            counts[:, codes] = other_buckets.counts
+            buckets.resize((len(labels), 2, 2)).add(other_buckets.starts, counts)
+            self.attributes[name] = (labels, buckets)
+        return self
+
+    def prune(self, oldest_start):
+        for _, buckets in self.attributes.values():
+            buckets.prune(oldest_start)
+        return self
+
+    def report(self, start=None, end=None, reference_groups=None):
+        """Fairness report per attribute over the buckets starting in [start, end)."""
+        reference_groups = reference_groups or {}
+        return {
+            name: self._attribute_report(labels, buckets.total(start, end), reference_groups.get(name))
+            for name, (labels, buckets) in self.attributes.items()
+        }
+
+    def tumbling_reports(self, window_seconds, reference_groups=None):
+        """One report per non-overlapping window of window_seconds that holds data."""
+        reference_groups = reference_groups or {}
+        windows = {}
+        for name, (labels, buckets) in self.attributes.items():
+            starts, counts = buckets.tumbling(window_seconds)
+            for start, matrices in zip(starts.tolist(), counts):
+                window = windows.setdefault(start, {"start": start, "end": start + window_seconds, "attributes": {}})
+                window["attributes"][name] = self._attribute_report(labels, matrices, reference_groups.get(name))
+        return [windows[start] for start in sorted(windows)]
+
+    def _attribute_report(self, labels, matrices, reference):
+        """Report over the groups that have rows, sorted so the default reference is the smallest label."""
+        present = np.flatnonzero(matrices.sum(axis=(1, 2)))
+        if len(present) == 0:
+            return {"rows": 0}
+        present_labels = [labels[i] for i in present]
+        order = np.argsort(np.asarray(present_labels), kind="stable")
+        present_labels = [present_labels[i] for i in order]
+        if reference not in present_labels:
+            reference = None
+        report = self.metric.from_confusion_matrices(present_labels, matrices[present[order]], reference)
+        return {"rows": int(matrices.sum()), **report}
+
+    def to_state(self):
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "attributes": {name: {"labels": labels, "buckets": buckets.to_state()}
+                           for name, (labels, buckets) in self.attributes.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls(state["bucket_seconds"])
+        accumulator.attributes = {
+            name: (list(attribute["labels"]), BucketedCounts.from_state(attribute["buckets"]))
+            for name, attribute in state["attributes"].items()
+        }
+        return accumulator
@@ -1,32 +1,158 @@
 # - Disparate Impact: Measures if the model disproportionately favors or disadvantages one group.
 # - Equalized Odds: Ensures that different demographic groups have similar true positive and false positive rates.
-# - [SOON] Demographic Parity: Ensures that predictions are independent of sensitive attributes.
-# - [SOON] Predictive Parity: Ensures that positive predictions are equally reliable across different groups.
-# - [SOON] Statistical Parity Difference: Measures the difference in positive outcome rates between groups.
+# - Demographic Parity: Ensures that predictions are independent of sensitive attributes.
+# - Predictive Parity: Ensures that positive predictions are equally reliable across different groups.
+# - Statistical Parity Difference: Measures the difference in positive outcome rates between groups
+#   (reported as the demographic parity difference).
+#
+# Every metric is derived from one 2x2 confusion matrix per group. The matrices come from a single
+# np.bincount over the code (group * 2 + prediction) * 2 + actual, so an audit batch is one O(n) pass
+# whatever the number of groups, instead of a Python loop per count.
+import numpy as np
+
+from metrics.buckets import encode_groups
+
+
+def group_confusion_matrices(predictions, actuals, codes, n_groups):
+    """
+    Counts one confusion matrix per group in a single pass.
+
+    Returns an (n_groups, 2, 2) array indexed [group, predicted, actual], where label 1 is the
+    positive class and everything else is negative.
+    """
+    predicted = np.asarray(predictions) == 1
+    actual = np.asarray(actuals) == 1
+    cells = (codes * 2 + predicted) * 2 + actual
+    return np.bincount(cells, minlength=4 * n_groups).reshape(n_groups, 2, 2)
+
+
+def _rate(numerator, denominator):
+    """Elementwise ratio with NaN where the denominator is zero."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.full_like(numerator, np.nan), where=denominator > 0)
+
+
+def _spread(rates):
+    """Largest minus smallest defined rate, or NaN if fewer than two groups have one."""
+    defined = rates[~np.isnan(rates)]
+    return float(defined.max() - defined.min()) if len(defined) > 1 else np.nan
+
+
+def _to_json(value):
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def _binary_groups(predictions, actuals, sensitive_attribute):
+    """Keeps the rows with S in {0, 1} and returns them with S as group codes."""
+    sensitive = np.asarray(sensitive_attribute)
+    rows = (sensitive == 0) | (sensitive == 1)
+    return np.asarray(predictions)[rows], np.asarray(actuals)[rows], sensitive[rows].astype(np.intp)
+
 
 class FairnessMetric:
+    def compute(self, predictions, actuals, sensitive_attributes, reference_groups=None):
+        """
+        Computes every fairness metric for each sensitive attribute.
+
+        `sensitive_attributes` maps an attribute name to one group label per row; any number of
+        groups is supported. Ratios are taken against the reference group of each attribute, which
+        defaults to the smallest label (group 0 for a binary attribute). Rates a group cannot
+        define (e.g. TPR with no actual positives) are reported as None and left out of the
+        differences.
+
+        Returns:
+            {attribute: {"reference_group", "groups", "disparate_impact", "equalized_odds",
+                         "demographic_parity", "predictive_parity"}}
+        """
+        n_rows = len(predictions)
+        if len(actuals) != n_rows:
+            raise ValueError("predictions and actuals must have the same length")
+        reference_groups = reference_groups or {}
+
+        report = {}
+        for name, values in sensitive_attributes.items():
+            if len(values) != n_rows:
+                raise ValueError(f"Sensitive attribute '{name}' must have one value per prediction")
+            labels, codes = encode_groups(values)
+            matrices = group_confusion_matrices(predictions, actuals, codes, len(labels))
+            report[name] = self.from_confusion_matrices(labels, matrices, reference_groups.get(name))
+        return report
+
+    def from_confusion_matrices(self, labels, matrices, reference=None):
+        """Builds one attribute's report from its (n_groups, 2, 2) [group, predicted, actual] counts."""
+        tn, fn = matrices[:, 0, 0], matrices[:, 0, 1]
+        fp, tp = matrices[:, 1, 0], matrices[:, 1, 1]
+        count = matrices.sum(axis=(1, 2))
+        positive_predictions = tp + fp
+
+        selection_rate = _rate(positive_predictions, count)
+        tpr = _rate(tp, tp + fn)
+        fpr = _rate(fp, fp + tn)
+        ppv = _rate(tp, positive_predictions)
+
+        label_list = labels.tolist() if isinstance(labels, np.ndarray) else list(labels)
+        if reference is None:
+            reference_index = 0
+        elif reference in label_list:
+            reference_index = label_list.index(reference)
+        else:
+            raise ValueError(f"Reference group {reference!r} does not occur in the data")
+
+        impact = _rate(selection_rate, np.full_like(selection_rate, selection_rate[reference_index]))
+        others = np.delete(impact, reference_index)
+        others = others[~np.isnan(others)]
+        defined_selection = selection_rate[~np.isnan(selection_rate)]
+
+        groups = {
+            str(label): {name: _to_json(value) for name, value in (
+                ("count", count[i]), ("tp", tp[i]), ("fp", fp[i]), ("tn", tn[i]), ("fn", fn[i]),
+                ("selection_rate", selection_rate[i]), ("TPR", tpr[i]), ("FPR", fpr[i]), ("PPV", ppv[i]),
+            )}
+            for i, label in enumerate(label_list)
+        }
+        return {
+            "reference_group": label_list[reference_index],
+            "groups": groups,
+            "disparate_impact": {
+                "ratio": _to_json(others.min()) if len(others) else None,
+                "by_group": {str(label): _to_json(value) for label, value in zip(label_list, impact)},
+            },
+            "equalized_odds": {"TPR_difference": _to_json(_spread(tpr)), "FPR_difference": _to_json(_spread(fpr))},
+            "demographic_parity": {
+                "difference": _to_json(_spread(selection_rate)),
+                "ratio": _to_json(float(_rate(defined_selection.min(), defined_selection.max()))) if len(defined_selection) > 1 else None,
+            },
+            "predictive_parity": {"PPV_difference": _to_json(_spread(ppv))},
+        }
+
     def disparate_impact(self, predictions, sensitive_attribute):
         """
         Computes Disparate Impact, a measure of fairness in classification models.
 
         A model is considered fair if the probability of a positive prediction is similar across different groups.
-        The 80% Rule states that the positive rate for the disadvantaged group should be at least 80% of 
+        The 80% Rule states that the positive rate for the disadvantaged group should be at least 80% of
         the advantaged group.
 
         Formula:
-            DI = P(Ŷ = 1 | S = 1) / P(Ŷ = 1 | S = 0)
+            DI = P(Ŷ = 1 | S = 1) / P(Ŷ = 1 | S = 0)
 
         Where:
-            - P(Ŷ = 1 | S = 1) is the probability of a positive prediction for Group 1.
-            - P(Ŷ = 1 | S = 0) is the probability of a positive prediction for Group 0.
+            - P(Ŷ = 1 | S = 1) is the probability of a positive prediction for Group 1.
+            - P(Ŷ = 1 | S = 0) is the probability of a positive prediction for Group 0.
             - If DI < 0.8, the model may be biased.
 
         Returns:
             A dictionary containing the disparate impact ratio.
         """
-        group_0_prob = sum(1 for p, s in zip(predictions, sensitive_attribute) if p == 1 and s == 0) / max(1, sum(1 for s in sensitive_attribute if s == 0))
-        group_1_prob = sum(1 for p, s in zip(predictions, sensitive_attribute) if p == 1 and s == 1) / max(1, sum(1 for s in sensitive_attribute if s == 1))
-        
+        predictions, _, codes = _binary_groups(predictions, np.zeros(len(predictions)), sensitive_attribute)
+        matrices = group_confusion_matrices(predictions, np.zeros(len(predictions)), codes, 2)
+        group_0_prob, group_1_prob = matrices[:, 1, 0] / np.maximum(1, matrices.sum(axis=(1, 2)))
+
         di = group_1_prob / group_0_prob if group_0_prob > 0 else None
         return {"disparate_impact": di}
 
@@ -43,10 +169,8 @@ class FairnessMetric:
         Returns:
             A dictionary containing the TPR and FPR differences between the two groups.
         """
-        tpr_0 = sum(1 for p, a, s in zip(predictions, actuals, sensitive_attribute) if p == 1 and a == 1 and s == 0) / max(1, sum(1 for a, s in zip(actuals, sensitive_attribute) if a == 1 and s == 0))
-        tpr_1 = sum(1 for p, a, s in zip(predictions, actuals, sensitive_attribute) if p == 1 and a == 1 and s == 1) / max(1, sum(1 for a, s in zip(actuals, sensitive_attribute) if a == 1 and s == 1))
-
-        fpr_0 = sum(1 for p, a, s in zip(predictions, actuals, sensitive_attribute) if p == 1 and a == 0 and s == 0) / max(1, sum(1 for a, s in zip(actuals, sensitive_attribute) if a == 0 and s == 0))
-        fpr_1 = sum(1 for p, a, s in zip(predictions, actuals, sensitive_attribute) if p == 1 and a == 0 and s == 1) / max(1, sum(1 for a, s in zip(actuals, sensitive_attribute) if a == 0 and s == 1))
-
-        return {"TPR_difference": abs(tpr_0 - tpr_1), "FPR_difference": abs(fpr_0 - fpr_1)}
+        predictions, actuals, codes = _binary_groups(predictions, actuals, sensitive_attribute)
+        matrices = group_confusion_matrices(predictions, actuals, codes, 2)
+        tpr = matrices[:, 1, 1] / np.maximum(1, matrices[:, :, 1].sum(axis=1))
+        fpr = matrices[:, 1, 0] / np.maximum(1, matrices[:, :, 0].sum(axis=1))
+        return {"TPR_difference": abs(tpr[0] - tpr[1]), "FPR_difference": abs(fpr[0] - fpr[1])}
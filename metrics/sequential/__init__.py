@@ -0,0 +1 @@
+from .sequential import CusumChart, EwmaChart, SeasonalBaseline, SequentialMonitor, in_control
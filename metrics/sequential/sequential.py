@@ -0,0 +1,233 @@
+"""
+        Sequential detectors: per-run charts that remember the points already seen.
+
+        EWMA and CUSUM watch the standardized points u = (x - μ) / σ, with the in-control
+        centre μ and scale σ of each feature taken from the fitted model:
+            EWMA      z_t = λ u_t + (1 - λ) z_{t-1}
+                      alarm when |z_t| > L √(λ / (2 - λ) · (1 - (1 - λ)^{2t}))
+            CUSUM     S⁺_t = max(0, S⁺_{t-1} + u_t - k),  S⁻_t = max(0, S⁻_{t-1} - u_t - k)
+                      alarm when S⁺_t or S⁻_t > h
+        The seasonal baseline learns its own reference instead: per season slot (hour of day,
+        day of week or hour of week, in UTC) an exponentially weighted mean and mean square of x,
+        bias-corrected for the slot's point count, and each point is z-scored against its slot
+        as it was just before the point.
+
+        Every chart keeps O(d) state (O(slots × d) for the seasonal one) and a batch is a scan,
+        not a Python loop over points: EWMA and the seasonal moments are first-order linear
+        filters (scipy.signal.lfilter, carrying the state in zi), and the CUSUM recursion is
+        solved in closed form, S_t = C_t - min(-S_0, min_{j≤t} C_j) with C the cumulative sum
+        of u - k, i.e. one cumsum and one running minimum. A chart's score is its largest
+        per-feature statistic over its alarm limit, so an alarm is a score above 1. CUSUM is
+        not reset on alarm: the alarm lasts while the shift does, and S drains by k per
+        in-control point afterwards.
+"""
+import threading
+
+import numpy as np
+
+# Interquartile range of the standard normal distribution, turning an IQR into a standard deviation.
+NORMAL_IQR = 1.3489795003921634
+SEASON_SLOTS = {"hour_of_day": 24, "day_of_week": 7, "hour_of_week": 168}
+
+
+def _linear_scan(values, smoothing, last):
+    """Runs y_t = smoothing · values_t + (1 - smoothing) · y_{t-1} down the rows, starting from y_0 = last."""
+    if len(values) == 1:
+        # One step costs less than setting up the filter.
+        return smoothing * values + (1.0 - smoothing) * last
+    from scipy.signal import lfilter
+    return lfilter([smoothing], [1.0, smoothing - 1.0], values, axis=0, zi=((1.0 - smoothing) * last)[np.newaxis])[0]
+
+
+def in_control(model_data):
+    """
+    Per-feature centre and scale of a fitted model.
+
+    Gaussian models give their mean and standard deviation; the others give the median and
+    IQR / 1.349 of the drift baseline sketch, which match them on normal data.
+    """
+    if model_data.get("means") is not None and model_data.get("stds") is not None:
+        return np.asarray(model_data["means"], dtype=float), np.asarray(model_data["stds"], dtype=float)
+    quantiles = np.asarray(model_data["drift_baseline"]["quantiles"], dtype=float)
+    size = len(quantiles)
+    return quantiles[size // 2], (quantiles[(3 * size) // 4] - quantiles[size // 4]) / NORMAL_IQR
+
+
+def season_slots(timestamps, season):
+    """Slot of every unix timestamp: hour of day, day of week (Monday is 0) or hour of week, in UTC."""
+    hours = np.floor_divide(np.asarray(timestamps, dtype=float), 3600).astype(np.int64)
+    # 1 January 1970 was a Thursday.
+    day_of_week = (hours // 24 + 3) % 7
+    if season == "hour_of_day":
+        return hours % 24
+    if season == "day_of_week":
+        return day_of_week
+    return day_of_week * 24 + hours % 24
+
+
+class EwmaChart:
+    def __init__(self, n_features, smoothing, width):
+        self.smoothing = smoothing
+        self.width = width
+        self.statistic = np.zeros(n_features)
+        self.count = 0
+
+    def update(self, u):
+        statistics = _linear_scan(u, self.smoothing, self.statistic)
+        steps = self.count + np.arange(1, len(u) + 1)
+        variance = self.smoothing / (2 - self.smoothing) * -np.expm1(2 * steps * np.log1p(-self.smoothing))
+        limits = self.width * np.sqrt(variance)
+        self.statistic = statistics[-1].copy()
+        self.count += len(u)
+        return np.abs(statistics).max(axis=1) / limits
+
+    def to_state(self):
+        return {"statistic": self.statistic, "count": self.count}
+
+    def restore(self, state):
+        self.statistic = np.array(state["statistic"], dtype=float)
+        self.count = int(state["count"])
+
+
+class CusumChart:
+    def __init__(self, n_features, slack, threshold):
+        self.slack = slack
+        self.threshold = threshold
+        self.high = np.zeros(n_features)
+        self.low = np.zeros(n_features)
+
+    @staticmethod
+    def _scan(steps, start):
+        """max(0, S_{t-1} + steps_t) down the rows from S_0 = start, as a cumsum and a running minimum."""
+        cumulative = np.cumsum(steps, axis=0)
+        return cumulative - np.minimum(-start, np.minimum.accumulate(cumulative, axis=0))
+
+    def update(self, u):
+        high = self._scan(u - self.slack, self.high)
+        low = self._scan(-u - self.slack, self.low)
+        self.high, self.low = high[-1].copy(), low[-1].copy()
+        return np.maximum(high, low).max(axis=1) / self.threshold
+
+    def to_state(self):
+        return {"high": self.high, "low": self.low}
+
+    def restore(self, state):
+        self.high = np.array(state["high"], dtype=float)
+        self.low = np.array(state["low"], dtype=float)
+
+
+class SeasonalBaseline:
+    def __init__(self, n_features, season, smoothing, threshold, min_points):
+        self.season = season
+        self.smoothing = smoothing
+        self.threshold = threshold
+        self.min_points = min_points
+        slots = SEASON_SLOTS[season]
+        self.mean = np.zeros((slots, n_features))
+        self.square = np.zeros((slots, n_features))
+        self.count = np.zeros(slots, dtype=np.int64)
+
+    def update(self, x, timestamps):
+        slots = season_slots(timestamps, self.season)
+        scores = np.zeros(len(x))
+        if len(x) == 1:
+            scores[:] = self._update_slot(slots[0], x)
+            return scores
+        order = np.argsort(slots, kind="stable")
+        present, starts = np.unique(slots[order], return_index=True)
+        # One scan per slot present in the batch, at most SEASON_SLOTS of them.
+        for slot, rows in zip(present, np.split(order, starts[1:])):
+            scores[rows] = self._update_slot(slot, x[rows])
+        return scores
+
+    def _update_slot(self, slot, points):
+        """Scores the points of one slot, in order, against the slot's state before each of them, then folds them in."""
+        means = _linear_scan(points, self.smoothing, self.mean[slot])
+        squares = _linear_scan(np.square(points), self.smoothing, self.square[slot])
+        counts = self.count[slot] + np.arange(len(points))
+        # Each point against the slot before it: the first row is the stored state, then the scan shifted by one.
+        before_mean = np.vstack([self.mean[slot], means[:-1]])
+        before_square = np.vstack([self.square[slot], squares[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = -np.expm1(counts * np.log1p(-self.smoothing))[:, np.newaxis]
+            mean = before_mean / weight
+            std = np.sqrt(np.maximum(before_square / weight - np.square(mean), 0.0))
+            z_scores = np.where(std > 0, np.abs(points - mean) / std, 0.0)
+        scores = np.where(counts >= self.min_points, z_scores.max(axis=1) / self.threshold, 0.0)
+        self.mean[slot], self.square[slot] = means[-1], squares[-1]
+        self.count[slot] += len(points)
+        return scores
+
+    def to_state(self):
+        return {"mean": self.mean, "square": self.square, "count": self.count}
+
+    def restore(self, state):
+        mean = np.array(state["mean"], dtype=float)
+        if mean.shape == self.mean.shape:
+            self.mean = mean
+            self.square = np.array(state["square"], dtype=float)
+            self.count = np.array(state["count"], dtype=np.int64)
+
+
+class SequentialMonitor:
+    """The charts registered on one run, fed the same stream of points."""
+
+    def __init__(self, centre, scale, ewma=None, cusum=None, seasonal=None):
+        self.centre = np.asarray(centre, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        n_features = len(self.centre)
+        self.charts = {}
+        if ewma is not None:
+            self.charts["ewma"] = EwmaChart(n_features, ewma["smoothing"], ewma["width"])
+        if cusum is not None:
+            self.charts["cusum"] = CusumChart(n_features, cusum["slack"], cusum["threshold"])
+        if seasonal is not None:
+            self.charts["seasonal"] = SeasonalBaseline(n_features, seasonal["season"], seasonal["smoothing"],
+                                                       seasonal["threshold"], seasonal["min_points"])
+        self.observed = 0
+        self.checkpointed = 0
+        self._lock = threading.Lock()
+
+    def observe(self, values, timestamps):
+        """Feeds an (n, d) batch with one unix timestamp per row to every chart, returns per-row scores and alarms."""
+        x = np.asarray(values, dtype=float)
+        if x.ndim != 2 or x.shape[1] != len(self.centre):
+            raise ValueError("Dimension mismatch")
+        timestamps = np.broadcast_to(np.asarray(timestamps, dtype=float), (len(x),))
+        # A constant feature cannot move in control, so it is left out like a zero std in the Gaussian scores.
+        u = np.where(self.scale > 0, (x - self.centre) / np.where(self.scale > 0, self.scale, 1.0), 0.0)
+
+        with self._lock:
+            scores = {}
+            for name, chart in self.charts.items():
+                scores[name] = chart.update(x, timestamps) if name == "seasonal" else chart.update(u)
+            self.observed += len(x)
+
+        results, alarms = {}, {}
+        for name, score in scores.items():
+            alarm = score > 1
+            results[f"{name}_score"] = score.tolist()
+            results[f"{name}_alarm"] = alarm.tolist()
+            alarms[name] = int(np.count_nonzero(alarm))
+        return {"results": results, "summary": {"count": len(x), "alarms": alarms}}
+
+    def status(self):
+        """Current statistics of every chart."""
+        with self._lock:
+            charts = {name: {key: np.asarray(value).tolist() for key, value in chart.to_state().items()}
+                      for name, chart in self.charts.items()}
+            return {"observed": self.observed, **charts}
+
+    def to_state(self):
+        with self._lock:
+            return {"observed": self.observed,
+                    **{name: {key: np.array(value) for key, value in chart.to_state().items()}
+                       for name, chart in self.charts.items()}}
+
+    def restore(self, state):
+        """Reloads a checkpoint taken with to_state; charts without a saved state start fresh."""
+        for name, chart in self.charts.items():
+            if state.get(name) is not None:
+                chart.restore(state[name])
+        self.observed = self.checkpointed = int(state.get("observed", 0))
+        return self
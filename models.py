@@ -1,20 +1,140 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Union
+
+from config import MODEL_CATALOG_MAX_PAGE
 
 class TrainingDataRequest(BaseModel):
     user_token: int
     run_id: Optional[str] = None
     training_data: List[List[float]]
+    covariance: Literal["empirical", "ledoit_wolf"] = "empirical"
+    algorithm: Literal["gaussian", "robust", "hbos", "isolation_forest"] = "gaussian"
+    contamination: Optional[float] = Field(default=None, gt=0, lt=0.5)
+
+class UpdateRequest(BaseModel):
+    user_token: int
+    run_id: str
+    training_data: List[List[float]]
+    decay: Optional[float] = Field(default=None, gt=0, le=1)
+    window: Optional[int] = Field(default=None, ge=1)
+
+class FitSessionRequest(BaseModel):
+    user_token: int
+    run_id: Optional[str] = None
+    covariance: Literal["empirical", "ledoit_wolf"] = "empirical"
+
+class FitChunkRequest(BaseModel):
+    user_token: int
+    training_data: List[List[float]]
+
+class FitFinalizeRequest(BaseModel):
+    user_token: int
 
 class DataPoint(BaseModel):
     user_token: int
     run_id: str
     values: List[float]
+    # Return the features that contributed most to the score, computed in the same pass; 0 skips it.
+    explain_top_k: int = Field(default=0, ge=0)
+
+class BatchDataPoint(BaseModel):
+    user_token: int
+    run_id: str
+    values: List[List[float]]
+    explain_top_k: int = Field(default=0, ge=0)
+
+class FanOutRequest(BaseModel):
+    user_token: int
+    run_ids: Optional[List[str]] = None
+    run_id_prefix: Optional[str] = Field(default=None, min_length=1)
+    values: List[List[float]]
+
+class DriftRequest(BaseModel):
+    user_token: int
+    run_id: str
+    values: List[List[float]]
+
+class DriftMonitorRequest(BaseModel):
+    user_token: int
+    run_id: str
+    window: Optional[int] = Field(default=None, ge=1)
+    p_value: Optional[float] = Field(default=None, gt=0, lt=1)
+    js_threshold: Optional[float] = Field(default=None, gt=0, le=1)
+    min_points: Optional[int] = Field(default=None, ge=1)
+
+class EwmaOptions(BaseModel):
+    smoothing: float = Field(default=0.2, gt=0, lt=1)
+    width: float = Field(default=3.0, gt=0)
+
+class CusumOptions(BaseModel):
+    slack: float = Field(default=0.5, ge=0)
+    threshold: float = Field(default=5.0, gt=0)
+
+class SeasonalOptions(BaseModel):
+    season: Literal["hour_of_day", "day_of_week", "hour_of_week"] = "hour_of_day"
+    smoothing: float = Field(default=0.05, gt=0, lt=1)
+    threshold: float = Field(default=4.0, gt=0)
+    min_points: int = Field(default=10, ge=2)
+
+class SequentialRequest(BaseModel):
+    user_token: int
+    run_id: str
+    ewma: Optional[EwmaOptions] = None
+    cusum: Optional[CusumOptions] = None
+    seasonal: Optional[SeasonalOptions] = None
+
+class SequentialBatch(BaseModel):
+    user_token: int
+    run_id: str
+    values: List[List[float]]
+    timestamps: Optional[List[float]] = None
 
 class FairnessRequest(BaseModel):
     predictions: List[int]
     actuals: List[int]
-    sensitive_attribute: List[int]
+    sensitive_attribute: Optional[List[Union[int, str]]] = None
+    sensitive_attributes: Dict[str, List[Union[int, str]]] = Field(default_factory=dict)
+    reference_groups: Dict[str, Union[int, str]] = Field(default_factory=dict)
+
+class FairnessBatch(BaseModel):
+    user_token: int
+    run_id: str
+    predictions: List[int]
+    actuals: List[int]
+    sensitive_attributes: Dict[str, List[Union[int, str]]]
+    timestamps: Optional[List[float]] = None
+
+class AccuracyRequest(BaseModel):
+    y_true: List[Union[int, str]]
+    y_pred: List[Union[int, str]]
+
+class AccuracyBatch(BaseModel):
+    user_token: int
+    run_id: str
+    y_true: List[Union[int, str]]
+    y_pred: List[Union[int, str]]
+    timestamps: Optional[List[float]] = None
+
+class WindowQuery(BaseModel):
+    user_token: int
+    run_id: str
+    window_seconds: Optional[int] = Field(default=None, gt=0)
+    tumbling_seconds: Optional[int] = Field(default=None, gt=0)
+    reference_groups: Dict[str, Union[int, str]] = Field(default_factory=dict)
 
 class ExplainabilityRequest(BaseModel):
     feature_importances: List[float]
+    top_k: Optional[int] = Field(default=None, ge=1)
+
+class ModelCatalogQuery(BaseModel):
+    limit: int = Field(default=100, ge=1, le=MODEL_CATALOG_MAX_PAGE)
+    after: Optional[str] = None
+
+class ModelDeleteRequest(BaseModel):
+    user_token: int
+    run_ids: List[str] = Field(min_length=1, max_length=MODEL_CATALOG_MAX_PAGE)
+
+class ModelCollectRequest(BaseModel):
+    user_token: int
+    unused_seconds: float = Field(gt=0)
+    limit: int = Field(default=MODEL_CATALOG_MAX_PAGE, ge=1, le=MODEL_CATALOG_MAX_PAGE)
@@ -1,55 +1,400 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models import TrainingDataRequest, DataPoint, FairnessRequest, ExplainabilityRequest
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from starlette.requests import ClientDisconnect
+from models import TrainingDataRequest, UpdateRequest, FitSessionRequest, FitChunkRequest, FitFinalizeRequest, DataPoint, BatchDataPoint, FanOutRequest, DriftRequest, DriftMonitorRequest, FairnessRequest, FairnessBatch, AccuracyRequest, AccuracyBatch, WindowQuery, ExplainabilityRequest, ModelCatalogQuery, ModelDeleteRequest, ModelCollectRequest, SequentialRequest, SequentialBatch
+from formats import JSON, accepted, columns_body, columns_response, matrix_body
+from admission import admit_frame
+from executor import ComputeOverloaded
+from ingest import iter_ndjson_rows
 from services.anomaly_service import AnomalyService
 from services.fairness_service import FairnessService
 from services.explainability_service import ExplainabilityService
 from services.auth_service import AuthService
 from services.drift_service import DriftService
+from services.sequential_service import SequentialService
 from services.accuracy_service import AccuracyService
+from streaming import POLICY_VIOLATION, DuplexStreamingResponse, decode_frame, ndjson_line, open_streams, overloaded_error, points_total, send_error, send_result
+from telemetry import TimedRoute, registry
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 anomaly_service = AnomalyService()
 fairness_service = FairnessService()
 explainability_service = ExplainabilityService()
 drift_service = DriftService()
+sequential_service = SequentialService()
 accuracy_service = AccuracyService()
 
+def _fairness_columns(columns):
+    """Binary fairness bodies: predictions, actuals and optional timestamps columns, every other column is a sensitive attribute."""
+    columns = dict(columns)
+    fields = {"predictions": columns.pop("predictions"), "actuals": columns.pop("actuals")}
+    if "timestamps" in columns:
+        fields["timestamps"] = columns.pop("timestamps")
+    fields["sensitive_attributes"] = columns
+    return fields
+
+
 # ---------------------------------[ FAIRNESS ]---------------------------------
 @router.post("/metrics/fairness/compute", dependencies=[Depends(AuthService.authenticate)])
-def compute_fairness(request: FairnessRequest):
-    return fairness_service.compute(request.predictions, request.actuals, request.sensitive_attribute)
+async def compute_fairness(request: FairnessRequest = Depends(columns_body(FairnessRequest, _fairness_columns, "predictions"))):
+    sensitive_attributes = dict(request.sensitive_attributes)
+    if request.sensitive_attribute is not None:
+        sensitive_attributes.setdefault("sensitive_attribute", request.sensitive_attribute)
+    result = await fairness_service.compute(request.predictions, request.actuals, sensitive_attributes, request.reference_groups)
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.post("/metrics/fairness/stream/push", dependencies=[Depends(AuthService.authenticate)])
+async def push_fairness_batch(request: FairnessBatch = Depends(columns_body(FairnessBatch, _fairness_columns, "predictions"))):
+    result = await fairness_service.push(request.user_token, request.run_id, request.predictions, request.actuals,
+                                         request.sensitive_attributes, request.timestamps)
+    return _pushed(result)
+
+@router.post("/metrics/fairness/stream/report", dependencies=[Depends(AuthService.authenticate)])
+async def report_fairness(request: WindowQuery):
+    result = await fairness_service.report(request.user_token, request.run_id, request.window_seconds,
+                                           request.tumbling_seconds, request.reference_groups)
+    return _windowed_report(result)
 # -----------------------------[ -- ---------- -- ]-----------------------------
 
 
 # ---------------------------------[ ANOMALY ]----------------------------------
 @router.post("/metrics/anomaly/fit", dependencies=[Depends(AuthService.authenticate)])
-def fit_model(request: TrainingDataRequest):
-    if not request.training_data:
+async def fit_model(request: TrainingDataRequest = Depends(matrix_body(TrainingDataRequest, "training_data"))):
+    if len(request.training_data) == 0:
         raise HTTPException(status_code=400, detail="Invalid training data format.")
-    run_id = anomaly_service.fit(request.user_token, request.run_id, request.training_data)
+    try:
+        run_id = await anomaly_service.fit(request.user_token, request.run_id, request.training_data,
+                                           request.covariance, request.algorithm, request.contamination)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
     return {"message": "Model fitted and saved.", "run_id": run_id}
 
+@router.post("/metrics/anomaly/update", dependencies=[Depends(AuthService.authenticate)])
+async def update_model(request: UpdateRequest = Depends(matrix_body(UpdateRequest, "training_data"))):
+    if len(request.training_data) == 0:
+        raise HTTPException(status_code=400, detail="Invalid training data format.")
+    result = await anomaly_service.update(request.user_token, request.run_id, request.training_data, request.decay, request.window)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No fitted model found.")
+    if result == "Concurrent update conflict":
+        raise HTTPException(status_code=409, detail=result)
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return {"message": "Model updated.", **result}
+
+@router.post("/metrics/anomaly/fit/session", dependencies=[Depends(AuthService.authenticate)])
+async def open_fit_session(request: FitSessionRequest):
+    session_id = await anomaly_service.open_fit_session(request.user_token, request.run_id, request.covariance)
+    return {"message": "Fit session opened.", "session_id": session_id}
+
+@router.post("/metrics/anomaly/fit/session/{session_id}/chunk", dependencies=[Depends(AuthService.authenticate)])
+async def add_fit_chunk(session_id: str, request: FitChunkRequest = Depends(matrix_body(FitChunkRequest, "training_data"))):
+    if len(request.training_data) == 0:
+        raise HTTPException(status_code=400, detail="Invalid training data format.")
+    rows = await anomaly_service.add_fit_chunk(request.user_token, session_id, request.training_data)
+    return _fit_session_progress(rows)
+
+@router.post("/metrics/anomaly/fit/session/{session_id}/stream", dependencies=[Depends(AuthService.authenticate)])
+async def stream_fit_chunks(session_id: str, user_token: int, request: Request):
+    """Accepts an application/x-ndjson body with one JSON array of floats per line."""
+    rows = await anomaly_service.add_fit_stream(user_token, session_id, iter_ndjson_rows(request.stream()))
+    return _fit_session_progress(rows)
+
+@router.post("/metrics/anomaly/fit/session/{session_id}/finalize", dependencies=[Depends(AuthService.authenticate)])
+async def finalize_fit_session(session_id: str, request: FitFinalizeRequest):
+    result = await anomaly_service.finalize_fit_session(request.user_token, session_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Fit session not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return {"message": "Model fitted and saved.", **result}
+
+def _fit_session_progress(rows):
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Fit session not found.")
+    if isinstance(rows, str):
+        raise HTTPException(status_code=400, detail=rows)
+    return {"message": "Chunk received.", "rows": rows}
+
 @router.post("/metrics/anomaly/detect", dependencies=[Depends(AuthService.authenticate)])
-def detect_anomalies(request: DataPoint):
-    result = anomaly_service.detect(request.user_token, request.run_id, request.values)
+async def detect_anomalies(request: DataPoint = Depends(matrix_body(DataPoint, "values", ndim=1))):
+    result = await anomaly_service.detect(request.user_token, request.run_id, request.values, request.explain_top_k)
     if result is None:
         raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
     return {"result": result}
+
+@router.post("/metrics/anomaly/detect/batch", dependencies=[Depends(AuthService.authenticate)])
+async def detect_anomalies_batch(http_request: Request,
+                                 request: BatchDataPoint = Depends(matrix_body(BatchDataPoint, "values"))):
+    """Also answers in .npy, Arrow or msgpack when asked in Accept, one column per score."""
+    if len(request.values) == 0:
+        raise HTTPException(status_code=400, detail="Invalid data format.")
+    media = accepted(http_request)
+    result = await anomaly_service.detect_batch(request.user_token, request.run_id, request.values,
+                                                as_arrays=media != JSON, explain_top_k=request.explain_top_k)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    if media != JSON:
+        # The indices are the anomaly_detected column already.
+        summary = {name: value for name, value in result["summary"].items() if name != "anomaly_indices"}
+        return columns_response(media, result["results"], summary)
+    return result
+
+@router.post("/metrics/anomaly/detect/stream", dependencies=[Depends(AuthService.authenticate)])
+async def detect_anomalies_stream(user_token: int, run_id: str, request: Request, explain_top_k: int = Query(0, ge=0)):
+    """Scores an application/x-ndjson body as it arrives, answering one NDJSON result per chunk of rows read."""
+    model_data = await anomaly_service.pin_model(user_token, run_id)
+    if model_data is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    return DuplexStreamingResponse(_ndjson_results(user_token, run_id, model_data, request.stream(), explain_top_k),
+                                   media_type="application/x-ndjson")
+
+async def _ndjson_results(user_token, run_id, model_data, body, explain_top_k):
+    open_streams["ndjson"] += 1
+    try:
+        async for rows in iter_ndjson_rows(body, flush=True):
+            try:
+                result = await anomaly_service.detect_pinned(user_token, run_id, model_data, rows, explain_top_k=explain_top_k)
+            except ComputeOverloaded:
+                yield ndjson_line(overloaded_error())
+                continue
+            if isinstance(result, str):
+                yield ndjson_line({"error": result})
+                continue
+            points_total.inc("ndjson", amount=len(rows))
+            yield ndjson_line(result)
+    except ValueError as error:
+        # A malformed line leaves the rest of the body unframed, so the stream ends here.
+        yield ndjson_line({"error": str(error)})
+    except ClientDisconnect:
+        pass
+    finally:
+        open_streams["ndjson"] -= 1
+
+@router.websocket("/metrics/anomaly/detect/ws")
+async def detect_anomalies_websocket(websocket: WebSocket, user_token: int, run_id: str, explain_top_k: int = Query(0, ge=0)):
+    """Scores every frame against the model pinned at the handshake, which takes the X-API-Key header."""
+    if not AuthService.valid_key(websocket.headers.get("x-api-key")):
+        await websocket.close(code=POLICY_VIOLATION, reason="Unauthorized: Invalid API Key")
+        return
+    model_data = await anomaly_service.pin_model(user_token, run_id)
+    if model_data is None:
+        await websocket.close(code=POLICY_VIOLATION, reason="Unauthorized or model not found.")
+        return
+
+    await websocket.accept()
+    open_streams["websocket"] += 1
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                points, binary = decode_frame(message)
+            except (ValueError, TypeError, KeyError, OSError):
+                await send_error(websocket, "Invalid data format.")
+                continue
+            refused = admit_frame(websocket.scope, len(points))
+            if refused is not None:
+                await websocket.send_json(refused)
+                continue
+            try:
+                result = await anomaly_service.detect_pinned(user_token, run_id, model_data, points, as_arrays=binary,
+                                                             explain_top_k=explain_top_k)
+            except ComputeOverloaded:
+                await websocket.send_json(overloaded_error())
+                continue
+            if isinstance(result, str):
+                await send_error(websocket, result)
+                continue
+            points_total.inc("websocket", amount=len(points))
+            await send_result(websocket, result, binary)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        open_streams["websocket"] -= 1
+
+@router.post("/metrics/anomaly/detect/many", dependencies=[Depends(AuthService.authenticate)])
+async def detect_anomalies_many(request: FanOutRequest = Depends(matrix_body(FanOutRequest, "values"))):
+    """Scores the rows against every listed run_id, or every run_id starting with run_id_prefix."""
+    if len(request.values) == 0:
+        raise HTTPException(status_code=400, detail="Invalid data format.")
+    if (request.run_ids is None) == (request.run_id_prefix is None):
+        raise HTTPException(status_code=400, detail="Give either run_ids or run_id_prefix.")
+    result = await anomaly_service.detect_many(request.user_token, request.values, request.run_ids, request.run_id_prefix)
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+# -----------------------------[ -- ---------- -- ]-----------------------------
+
+
+# ---------------------------------[ ACCURACY ]---------------------------------
+@router.post("/metrics/accuracy/compute", dependencies=[Depends(AuthService.authenticate)])
+async def compute_accuracy(request: AccuracyRequest):
+    if not request.y_true:
+        raise HTTPException(status_code=400, detail="Invalid data format.")
+    result = await accuracy_service.compute(request.y_true, request.y_pred)
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.post("/metrics/accuracy/stream/push", dependencies=[Depends(AuthService.authenticate)])
+async def push_accuracy_batch(request: AccuracyBatch):
+    result = await accuracy_service.push(request.user_token, request.run_id, request.y_true, request.y_pred, request.timestamps)
+    return _pushed(result)
+
+@router.post("/metrics/accuracy/stream/report", dependencies=[Depends(AuthService.authenticate)])
+async def report_accuracy(request: WindowQuery):
+    result = await accuracy_service.report(request.user_token, request.run_id, request.window_seconds, request.tumbling_seconds)
+    return _windowed_report(result)
+
+def _pushed(result):
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return {"message": "Batch received.", **result}
+
+def _windowed_report(result):
+    if result is None:
+        raise HTTPException(status_code=404, detail="No counts recorded for this run.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+# -----------------------------[ -- ---------- -- ]-----------------------------
+
+
+# ----------------------------------[ DRIFT ]-----------------------------------
+@router.post("/metrics/drift/compute", dependencies=[Depends(AuthService.authenticate)])
+async def compute_drift(request: DriftRequest = Depends(matrix_body(DriftRequest, "values"))):
+    if len(request.values) == 0:
+        raise HTTPException(status_code=400, detail="Invalid data format.")
+    result = await drift_service.compute(request.user_token, request.run_id, request.values)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.post("/metrics/drift/monitor", dependencies=[Depends(AuthService.authenticate)])
+async def register_drift_monitor(request: DriftMonitorRequest):
+    result = await drift_service.register_monitor(request.user_token, request.run_id, request.window,
+                                                  request.p_value, request.js_threshold, request.min_points)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.get("/metrics/drift/monitor/{user_token}/{run_id}", dependencies=[Depends(AuthService.authenticate)])
+async def drift_monitor_status(user_token: int, run_id: str):
+    result = await drift_service.status(user_token, run_id)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=404, detail=result)
+    return result
+
+@router.delete("/metrics/drift/monitor/{user_token}/{run_id}", dependencies=[Depends(AuthService.authenticate)])
+async def unregister_drift_monitor(user_token: int, run_id: str):
+    result = await drift_service.unregister_monitor(user_token, run_id)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return {"message": "Drift monitor removed."}
+# -----------------------------[ -- ---------- -- ]-----------------------------
+
+
+# --------------------------------[ SEQUENTIAL ]--------------------------------
+@router.post("/metrics/sequential/register", dependencies=[Depends(AuthService.authenticate)])
+async def register_sequential(request: SequentialRequest):
+    charts = {name: getattr(request, name) for name in ("ewma", "cusum", "seasonal")}
+    if all(options is None for options in charts.values()):
+        raise HTTPException(status_code=400, detail="Give at least one of ewma, cusum or seasonal.")
+    result = await sequential_service.register(
+        request.user_token, request.run_id,
+        **{name: None if options is None else options.model_dump() for name, options in charts.items()})
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.post("/metrics/sequential/observe", dependencies=[Depends(AuthService.authenticate)])
+async def observe_sequential(request: SequentialBatch = Depends(matrix_body(SequentialBatch, "values"))):
+    """Feeds points in time order; timestamps (unix seconds) place them in season slots and default to now."""
+    if len(request.values) == 0:
+        raise HTTPException(status_code=400, detail="Invalid data format.")
+    result = await sequential_service.observe(request.user_token, request.run_id, request.values, request.timestamps)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.get("/metrics/sequential/{user_token}/{run_id}", dependencies=[Depends(AuthService.authenticate)])
+async def sequential_status(user_token: int, run_id: str):
+    result = await sequential_service.status(user_token, run_id)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=404, detail=result)
+    return result
+
+@router.delete("/metrics/sequential/{user_token}/{run_id}", dependencies=[Depends(AuthService.authenticate)])
+async def unregister_sequential(user_token: int, run_id: str):
+    result = await sequential_service.unregister(user_token, run_id)
+    if result is None:
+        raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return {"message": "Sequential detectors removed."}
 # -----------------------------[ -- ---------- -- ]-----------------------------
 
 
 # ------------------------------[ EXPLAINABILITY ]------------------------------
 @router.post("/metrics/explainability/compute", dependencies=[Depends(AuthService.authenticate)])
 def compute_explainability(request: ExplainabilityRequest):
-    return explainability_service.compute(request.feature_importances)
+    result = explainability_service.compute(request.feature_importances, request.top_k)
+    if isinstance(result, str):
+        raise HTTPException(status_code=400, detail=result)
+    return result
 # -----------------------------[ -- ---------- -- ]-----------------------------
 
 
 # -----------------------------[ Common Endpoints ]-----------------------------
 @router.delete("/metrics/delete/{user_token}/{run_id}", dependencies=[Depends(AuthService.authenticate)])
-def delete_data(user_token: int, run_id: str):
-    if not anomaly_service.delete_model(user_token, run_id):
+async def delete_data(user_token: int, run_id: str):
+    if not await anomaly_service.delete_model(user_token, run_id):
         raise HTTPException(status_code=403, detail="Unauthorized or model not found.")
     return {"message": "Data successfully deleted."}
+
+@router.get("/metrics/models/{user_token}", dependencies=[Depends(AuthService.authenticate)])
+async def list_models(user_token: int, query: Annotated[ModelCatalogQuery, Query()]):
+    """One page of the user's models by run_id; pass next_after back as `after` for the next page."""
+    models = await anomaly_service.list_models(user_token, query.limit, query.after)
+    return {"models": models, "next_after": models[-1]["run_id"] if len(models) == query.limit else None}
+
+@router.post("/metrics/models/delete", dependencies=[Depends(AuthService.authenticate)])
+async def delete_models(request: ModelDeleteRequest):
+    return {"deleted": await anomaly_service.delete_models(request.user_token, request.run_ids)}
+
+@router.post("/metrics/models/collect", dependencies=[Depends(AuthService.authenticate)])
+async def collect_unused_models(request: ModelCollectRequest):
+    """Deletes the user's models neither saved nor used for detection in the last unused_seconds."""
+    deleted = await anomaly_service.delete_unused_models(request.user_token, request.unused_seconds, request.limit)
+    return {"deleted": len(deleted), "run_ids": deleted}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint; unauthenticated like any other scrape target."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 # -----------------------------[ -- ---------- -- ]-----------------------------
\ No newline at end of file
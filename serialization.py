@@ -0,0 +1,94 @@
+"""
+        Compact storage format for model documents.
+
+        NumPy arrays are packed as raw little-endian bytes (BSON binary) next to their dtype
+        and shape, instead of being BSON-encoded as one double per element:
+
+            {"format_version": 2, "means": {"dtype": "<f8", "shape": [d], "data": Binary(...)}, ...}
+
+        Decoding wraps the stored bytes with np.frombuffer, so loading a model never goes
+        through Python lists. Documents written before the format existed carry no
+        format_version; they are still readable and can be rewritten with db.migrate_models().
+"""
+import numpy as np
+from bson.binary import Binary
+
+from config import MODEL_DTYPE
+
+MODEL_FORMAT_VERSION = 2
+
+# Fields that legacy documents stored as (nested) Python lists.
+LEGACY_ARRAY_FIELDS = ("means", "stds", "cov", "precision_cholesky", "data_points")
+# Statistics only needed to update a model or check it for drift, left out when loading it for detection.
+UPDATE_ONLY_FIELDS = ("moments", "window", "data_points", "drift_baseline")
+# Sufficient statistics keep accumulating after the fit, so they are never stored below float64.
+FULL_PRECISION_FIELDS = ("moments", "window")
+
+
+def as_storage_array(array, dtype=MODEL_DTYPE):
+    """Returns a contiguous little-endian copy of the array, with floating arrays cast to `dtype`."""
+    array = np.asarray(array)
+    target = np.dtype(dtype) if array.dtype.kind == "f" else array.dtype
+    return np.ascontiguousarray(array, dtype=target.newbyteorder("<"))
+
+
+def encode_array(array, dtype=MODEL_DTYPE):
+    """Packs an array as BSON binary with its dtype and shape."""
+    array = as_storage_array(array, dtype)
+    return {"dtype": array.dtype.str, "shape": list(array.shape), "data": Binary(array.tobytes())}
+
+
+def decode_array(encoded):
+    """Wraps the stored bytes in a read-only array without copying them."""
+    return np.frombuffer(encoded["data"], dtype=np.dtype(encoded["dtype"])).reshape(encoded["shape"])
+
+
+def is_encoded_array(value):
+    return isinstance(value, dict) and "dtype" in value and "shape" in value
+
+
+def encode_model_data(model_data, dtype=MODEL_DTYPE, encode=encode_array):
+    """
+    Encodes every NumPy array in a model document, recursing into nested dicts and lists.
+
+    `encode` turns one array into its stored placeholder; it defaults to inline BSON binary,
+    and other storage backends pass their own (e.g. one .npy file per array).
+    """
+    encoded = {
+        name: _encode_value(value, "float64" if name in FULL_PRECISION_FIELDS else dtype, encode)
+        for name, value in model_data.items()
+    }
+    encoded["format_version"] = MODEL_FORMAT_VERSION
+    return encoded
+
+
+def decode_model_data(stored, decode=decode_array):
+    """Decodes a stored model document, converting legacy list-based documents as well."""
+    if stored.get("format_version") is None:
+        return {
+            name: np.asarray(value, dtype=float) if name in LEGACY_ARRAY_FIELDS else value
+            for name, value in stored.items()
+        }
+    return {name: _decode_value(value, decode) for name, value in stored.items() if name != "format_version"}
+
+
+def _encode_value(value, dtype, encode):
+    if isinstance(value, np.ndarray):
+        return encode(value, dtype)
+    if isinstance(value, dict):
+        return {name: _encode_value(item, dtype, encode) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_encode_value(item, dtype, encode) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode_value(value, decode):
+    if is_encoded_array(value):
+        return decode(value)
+    if isinstance(value, dict):
+        return {name: _decode_value(item, decode) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_decode_value(item, decode) for item in value]
+    return value
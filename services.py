@@ -1,21 +1,24 @@
 import numpy as np
 import uuid
 from scipy.stats import norm
-from db import save_model, load_model
+from config import STORE_TRAINING_DATA, MAX_TRAINING_DATA_BYTES
+from db import store
 
-def fit_anomaly_model(user_token: int, run_id: str, training_data: list):
-    data = np.array(training_data)
+async def fit_anomaly_model(user_token: int, run_id: str, training_data: list):
+    data = np.array(training_data, dtype=float)
     metric_mean = np.mean(data, axis=0)
     metric_stds = np.std(data, axis=0, ddof=1)
 
     run_id = run_id if run_id else str(uuid.uuid4())[:8]
-    model_data = {"means": metric_mean.tolist(), "stds": metric_stds.tolist(), "data_points": training_data}
+    model_data = {"means": metric_mean, "stds": metric_stds}
+    if STORE_TRAINING_DATA and data.nbytes <= MAX_TRAINING_DATA_BYTES:
+        model_data["data_points"] = data
     
-    save_model(user_token, run_id, model_data)
+    await store.save_model(user_token, run_id, model_data)
     return run_id
 
-def detect_anomaly(user_token: int, run_id: str, values: list):
-    model_data = load_model(user_token, run_id)
+async def detect_anomaly(user_token: int, run_id: str, values: list):
+    model_data = await store.load_model(user_token, run_id)
     if not model_data:
         return None
 
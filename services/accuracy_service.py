@@ -1,11 +1,50 @@
-from metrics.explainability.explainability import AccuracyMetric
+import time
+
+from config import METRIC_BUCKET_SECONDS, METRIC_RETENTION_SECONDS
+from metrics.accuracy.accuracy import AccuracyMetric
+from metrics.accuracy.accumulator import ClassCountAccumulator
 from services.base_service import BaseService
+from executor import run_compute
+
+ACCURACY_COUNTS = "accuracy_counts"
 
 class AccuracyService(BaseService):
     def __init__(self):
         super().__init__()
         self.metric = AccuracyMetric()
 
-    def compute(self, feature_importances):
-        """Computes explainability metrics."""
-        return "in production"
\ No newline at end of file
+    async def compute(self, y_true, y_pred):
+        """Computes accuracy metrics for one batch, returns an error string on bad input."""
+        try:
+            return await run_compute(self.metric.calculate, y_true, y_pred)
+        except ValueError as error:
+            return str(error)
+
+    async def push(self, user_token, run_id, y_true, y_pred, timestamps=None):
+        """Adds a batch of labelled predictions to the run's time-bucketed class counts."""
+        async with self.state_lock(ACCURACY_COUNTS, user_token, run_id):
+            state = await self.load_state(ACCURACY_COUNTS, user_token, run_id)
+            counts = ClassCountAccumulator.from_state(state) if state else ClassCountAccumulator(METRIC_BUCKET_SECONDS)
+            now = time.time()
+            try:
+                await run_compute(counts.update, y_true, y_pred, now if timestamps is None else timestamps)
+            except ValueError as error:
+                return str(error)
+            counts.prune(now - METRIC_RETENTION_SECONDS)
+            await self.save_state(ACCURACY_COUNTS, user_token, run_id, counts.to_state())
+        return {"run_id": run_id, "rows": counts.rows}
+
+    async def report(self, user_token, run_id, window_seconds=None, tumbling_seconds=None):
+        """Metrics over everything retained, the last window_seconds, or per tumbling window."""
+        state = await self.load_state(ACCURACY_COUNTS, user_token, run_id)
+        if state is None:
+            return None
+        counts = ClassCountAccumulator.from_state(state)
+        if tumbling_seconds:
+            try:
+                windows = counts.tumbling_reports(tumbling_seconds)
+            except ValueError as error:
+                return str(error)
+            return {"run_id": run_id, "windows": windows}
+        start = time.time() - window_seconds if window_seconds else None
+        return {"run_id": run_id, **counts.report(start=start)}
@@ -1,22 +1,238 @@
-from metrics.anomaly.anomaly import AnomalyDetector
+import time
+import uuid
+
+import numpy as np
+from batcher import MicroBatcher
+from config import (STORE_TRAINING_DATA, MAX_TRAINING_DATA_BYTES, MODEL_UPDATE_RETRIES, FANOUT_MAX_MODELS,
+                    DETECT_BATCH_WINDOW_MS, DETECT_BATCH_MAX_SIZE)
+from executor import run_compute, run_fit
+from telemetry import stage
+from metrics.anomaly.anomaly import AnomalyMetric
+from metrics.anomaly import registry
+from metrics.anomaly.moments import MomentAccumulator
+from metrics.drift.drift import DriftMetric
+from metrics.drift.sketch import QuantileSketch
 from services.base_service import BaseService
+from shared_models import shared_models
+from services.drift_service import DriftService
+
+FIT_SESSION = "fit_session"
 
 class AnomalyService(BaseService):
     def __init__(self):
         super().__init__()
-        self.detector = AnomalyDetector()
+        self.detector = AnomalyMetric()
+        self.drift = DriftMetric()
+        self.drift_service = DriftService()
+        self.batcher = None
+        if DETECT_BATCH_WINDOW_MS > 0:
+            self.batcher = MicroBatcher("detect", self._detect_points, DETECT_BATCH_WINDOW_MS / 1000, DETECT_BATCH_MAX_SIZE)
 
-    def fit(self, user_token, run_id, training_data):
-        """Fits an anomaly detection model and saves it."""
-        model_data = self.detector.fit(training_data)
+    async def fit(self, user_token, run_id, training_data, covariance="empirical", algorithm="gaussian",
+                  contamination=None):
+        """Fits an anomaly detection model with the registered algorithm and saves it; raises ValueError on bad input."""
+        detector = registry.get_detector(algorithm)
+        options = {name: value for name, value in (("covariance", covariance), ("contamination", contamination))
+                   if name in detector.options and value is not None}
+        model_data = await run_fit(self._fit, detector, training_data, options)
         run_id = run_id if run_id else self.generate_run_id()
-        self.save_model(user_token, run_id, model_data)
+        await self.save_model(user_token, run_id, model_data)
         return run_id
 
-    def detect(self, user_token, run_id, values):
-        """Loads the model and performs anomaly detection."""
-        model_data = self.authenticate_user(user_token, run_id)
+    def _fit(self, detector, training_data, options):
+        data = np.asarray(training_data, dtype=float)
+        model_data = detector.fit(data, **options)
+        model_data["drift_baseline"] = self.drift.baseline(self.drift.sketch(data))
+        if STORE_TRAINING_DATA and data.nbytes <= MAX_TRAINING_DATA_BYTES:
+            model_data["data_points"] = data
+        return model_data
+
+    async def update(self, user_token, run_id, training_data, decay=None, window=None):
+        """Merges new observations into an existing model with a versioned compare-and-swap."""
+        for _ in range(MODEL_UPDATE_RETRIES):
+            model_data, version = await self.load_model_version(user_token, run_id)
+            if model_data is None:
+                return None
+            try:
+                updated = await run_fit(registry.detector_for(model_data).update, model_data, training_data, decay, window)
+            except ValueError as error:
+                return str(error)
+            # Drift is measured against the original training distribution, not the updated model;
+            # sequential charts keep the settings they were registered with.
+            for name in ("drift_baseline", "drift_monitor", "sequential"):
+                if model_data.get(name) is not None:
+                    updated[name] = model_data[name]
+            if await self.update_model_if_version(user_token, run_id, updated, version):
+                return {"run_id": run_id, "version": version + 1, "n_samples": updated["n_samples"]}
+        return "Concurrent update conflict"
+
+    async def open_fit_session(self, user_token, run_id=None, covariance="empirical"):
+        """Starts a chunked fit. Only the O(d²) moments are kept between uploads."""
+        session_id = uuid.uuid4().hex
+        session = {"run_id": run_id, "covariance": covariance, "moments": MomentAccumulator().to_state(),
+                   "sketch": self.drift.sketch().to_state()}
+        await self.save_state(FIT_SESSION, user_token, session_id, session)
+        return session_id
+
+    async def add_fit_chunk(self, user_token, session_id, training_data):
+        """Folds a chunk of training rows into an open session, returns the number of rows seen so far."""
+        return await self.add_fit_stream(user_token, session_id, _single_chunk(training_data))
+
+    async def add_fit_stream(self, user_token, session_id, chunks):
+        """Folds an async stream of row chunks into an open session, saving the moments once at the end."""
+        # Held for the whole upload: overlapping uploads would both start from the old moments and the
+        # last save would drop the other's rows, and a finalize must not fit half an upload.
+        async with self.state_lock(FIT_SESSION, user_token, session_id):
+            session = await self.load_state(FIT_SESSION, user_token, session_id)
+            if session is None:
+                return None
+
+            moments = MomentAccumulator.from_state(session["moments"])
+            sketch = QuantileSketch.from_state(session["sketch"]) if session.get("sketch") else self.drift.sketch()
+            try:
+                async for chunk in chunks:
+                    await run_fit(_fold_chunk, moments, sketch, chunk)
+            except ValueError as error:
+                return str(error)
+
+            session["moments"] = moments.to_state()
+            session["sketch"] = sketch.to_state()
+            await self.save_state(FIT_SESSION, user_token, session_id, session)
+            return int(moments.count)
+
+    async def finalize_fit_session(self, user_token, session_id):
+        """Turns the accumulated moments into a model, saves it and closes the session."""
+        async with self.state_lock(FIT_SESSION, user_token, session_id):
+            session = await self.load_state(FIT_SESSION, user_token, session_id)
+            if session is None:
+                return None
+
+            moments = MomentAccumulator.from_state(session["moments"])
+            if moments.count == 0:
+                return "No training data received"
+
+            try:
+                model_data = await run_fit(self.detector.fit_moments, moments, session["covariance"])
+            except ValueError as error:
+                return str(error)
+            sketch = QuantileSketch.from_state(session["sketch"]) if session.get("sketch") else None
+            if sketch is not None and sketch.count:
+                model_data["drift_baseline"] = self.drift.baseline(sketch)
+            run_id = session["run_id"] if session["run_id"] else self.generate_run_id()
+            await self.save_model(user_token, run_id, model_data)
+            await self.delete_state(FIT_SESSION, user_token, session_id)
+            return {"run_id": run_id, "rows": int(moments.count)}
+
+    def prepare_model(self, model_data):
+        """Keeps the model parameters as ready-to-use NumPy arrays, shared between workers when enabled."""
+        prepared = registry.detector_for(model_data).prepare(model_data)
+        return shared_models.share(prepared) if shared_models is not None else prepared
+
+    async def detect(self, user_token, run_id, values, explain_top_k=0):
+        """Loads the model and performs anomaly detection, attributing the score to the top features when asked."""
+        # Explained calls are scored alone, since a batch only explains its flagged rows.
+        if self.batcher is not None and not explain_top_k:
+            return await self.batcher.submit((user_token, run_id), values)
+        model_data = await self.authenticate_user(user_token, run_id)
+        if model_data is None:
+            return None
+
+        # A single point is O(d²) work, cheaper than the hop to the compute pool.
+        with stage("compute"):
+            result = registry.detector_for(model_data).detect(values, model_data, explain_top_k)
+        if model_data.get("drift_monitor") is not None and isinstance(result, dict):
+            drift = await self.drift_service.observe(user_token, run_id, model_data["drift_monitor"], [values])
+            if drift is not None:
+                result["drift_detected"] = drift
+        return result
+
+    async def _detect_points(self, key, points):
+        """Scores the points of concurrent detect calls on one model with a single lookup and pass."""
+        user_token, run_id = key
+        model_data = await self.authenticate_user(user_token, run_id)
+        if model_data is None:
+            return [None] * len(points)
+
+        detector = registry.detector_for(model_data)
+        if len(points) == 1:
+            results = detector.detect_points(points, model_data)
+        else:
+            results = await run_compute(detector.detect_points, points, model_data)
+        if model_data.get("drift_monitor") is not None:
+            scored = [point for point, result in zip(points, results) if isinstance(result, dict)]
+            drift = await self.drift_service.observe(user_token, run_id, model_data["drift_monitor"], scored) if scored else None
+            if drift is not None:
+                for result in results:
+                    if isinstance(result, dict):
+                        result["drift_detected"] = drift
+        return results
+
+    async def detect_batch(self, user_token, run_id, values, as_arrays=False, explain_top_k=0):
+        """Loads the model once and scores every row of the batch against it."""
+        model_data = await self.authenticate_user(user_token, run_id)
         if model_data is None:
             return None
+        return await self.detect_pinned(user_token, run_id, model_data, values, as_arrays, explain_top_k)
+
+    async def pin_model(self, user_token, run_id):
+        """Loads the model a detection stream scores against for its whole lifetime, or None."""
+        return await self.authenticate_user(user_token, run_id)
+
+    async def detect_pinned(self, user_token, run_id, model_data, values, as_arrays=False, explain_top_k=0):
+        """Scores a batch against an already loaded model, such as the one pinned by a detection stream."""
+        # A pinned model is never looked up again, so its use is recorded here.
+        self._last_used[run_id] = time.time()
+        detector = registry.detector_for(model_data)
+        if len(values) == 1:
+            with stage("compute"):
+                result = detector.detect_batch(values, model_data, as_arrays, explain_top_k)
+        else:
+            result = await run_compute(detector.detect_batch, values, model_data, as_arrays, explain_top_k)
+        if model_data.get("drift_monitor") is not None and isinstance(result, dict):
+            drift = await self.drift_service.observe(user_token, run_id, model_data["drift_monitor"], values)
+            if drift is not None:
+                result["summary"]["drift_detected"] = drift
+        return result
+
+    async def detect_many(self, user_token, values, run_ids=None, prefix=None):
+        """
+        Scores the same rows against many models: the listed run_ids, or every run_id starting with prefix.
+
+        Models missing from the cache are fetched in one store query and scored together.
+        """
+        if prefix is not None:
+            run_ids = await self.find_run_ids(user_token, prefix, FANOUT_MAX_MODELS)
+        run_ids = list(dict.fromkeys(run_ids))
+        if len(run_ids) > FANOUT_MAX_MODELS:
+            return f"At most {FANOUT_MAX_MODELS} models can be scored in one call"
+
+        models = await self.load_models(user_token, run_ids)
+        found = [run_id for run_id in run_ids if run_id in models]
+        scores = await run_compute(registry.detect_many, values, [models[run_id] for run_id in found])
+        if isinstance(scores, str):
+            return scores
+
+        results = {run_id: score for run_id, score in zip(found, scores) if not isinstance(score, str)}
+        return {
+            "results": results,
+            "anomalous_run_ids": [run_id for run_id, score in results.items() if any(score["anomaly_detected"])],
+            "dimension_mismatch": [run_id for run_id, score in zip(found, scores) if isinstance(score, str)],
+            "not_found": [run_id for run_id in run_ids if run_id not in models],
+        }
+
+    async def list_models(self, user_token, limit, after=None):
+        """One page of the user's model catalog, naming the detector that serves each model."""
+        models = await super().list_models(user_token, limit, after)
+        for entry in models:
+            entry["algorithm"] = entry["algorithm"] or registry.DEFAULT_ALGORITHM
+        return models
+
+
+async def _single_chunk(training_data):
+    yield training_data
+
 
-        return self.detector.detect(values, model_data)
\ No newline at end of file
+def _fold_chunk(moments, sketch, chunk):
+    chunk = np.asarray(chunk, dtype=float)
+    moments.update(chunk)
+    sketch.update(chunk)
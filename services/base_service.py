@@ -1,24 +1,191 @@
-from db import save_model, load_model, delete_model
+import asyncio
+import time
+import uuid
+import weakref
+from collections import defaultdict
+from db import get_store
+from cache import model_cache
+from config import MODEL_CACHE_REVALIDATE_SECONDS
+from telemetry import stage
 
 class BaseService:
+    # Shared by every service, so two services touching the same state serialize on one lock.
+    _state_locks = weakref.WeakValueDictionary()
+    # {run_id: unix time} of the models loaded since the last flush to the store, shared by every service.
+    _last_used = {}
+
     def __init__(self):
-        pass  
+        self.store = get_store()
+        self.cache = model_cache
+
+    async def save_model(self, user_token, run_id, model_data):
+        """Handles storing the model in the configured store."""
+        with stage("db"):
+            await self.store.save_model(user_token, run_id, model_data)
+        self.cache.invalidate(run_id)
+
+    async def load_model(self, user_token, run_id):
+        """Retrieves the model from the cache or the store, returns None if not found."""
+        await self._drop_stale(user_token, [run_id])
+        model = self.cache.get(user_token, run_id)
+        if model is not None:
+            self._last_used[run_id] = time.time()
+            return model
+
+        with stage("db"):
+            loaded = await self.store.load_models_versioned(user_token, [run_id])
+        if run_id not in loaded:
+            return None
+        model_data, version = loaded[run_id]
+        model = self.prepare_model(model_data)
+        self.cache.put(user_token, run_id, model, version)
+        self._last_used[run_id] = time.time()
+        return model
+
+    async def load_models(self, user_token, run_ids):
+        """Returns {run_id: model} for the runs the user can access, fetching every cache miss in one store call."""
+        await self._drop_stale(user_token, run_ids)
+        models = {}
+        for run_id in run_ids:
+            model = self.cache.get(user_token, run_id)
+            if model is not None:
+                models[run_id] = model
+
+        missing = [run_id for run_id in run_ids if run_id not in models]
+        if missing:
+            with stage("db"):
+                loaded = await self.store.load_models_versioned(user_token, missing)
+            for run_id, (model_data, version) in loaded.items():
+                models[run_id] = self.prepare_model(model_data)
+                self.cache.put(user_token, run_id, models[run_id], version)
+        now = time.time()
+        for run_id in models:
+            self._last_used[run_id] = now
+        return models
+
+    async def _drop_stale(self, user_token, run_ids):
+        """Drops the cached models another process saved since they were loaded, checking each at most once per interval."""
+        due = self.cache.due(user_token, run_ids, MODEL_CACHE_REVALIDATE_SECONDS)
+        if not due:
+            return
+        with stage("db"):
+            current = await self.store.model_versions(user_token, list(due))
+        for run_id, version in due.items():
+            if current.get(run_id) != version:
+                self.cache.invalidate(run_id)
+        self.cache.confirm(user_token, [run_id for run_id, version in due.items() if current.get(run_id) == version])
+
+    async def flush_last_used(self):
+        """Writes the last_used times recorded since the previous flush to the store."""
+        used, BaseService._last_used = BaseService._last_used, {}
+        if used:
+            with stage("db"):
+                await self.store.touch_models(used)
+
+    async def warm_up(self, limit):
+        """Loads the limit most recently used models into the cache, returns how many were loaded."""
+        with stage("db"):
+            hot = await self.store.hot_models(limit)
+        run_ids = defaultdict(list)
+        for run_id, access in hot:
+            for user_token in access:
+                run_ids[user_token].append(run_id)
+        loaded = set()
+        for user_token, user_run_ids in run_ids.items():
+            # Straight from the store rather than load_models: warming a model up is not a use.
+            with stage("db"):
+                models = await self.store.load_models_versioned(user_token, user_run_ids)
+            for run_id, (model_data, version) in models.items():
+                self.cache.put(user_token, run_id, self.prepare_model(model_data), version)
+            loaded.update(models)
+        return len(loaded)
+
+    async def find_run_ids(self, user_token, prefix, limit):
+        """Lists the run_ids starting with prefix that the user can access."""
+        with stage("db"):
+            return await self.store.find_run_ids(user_token, prefix, limit)
+
+    async def list_models(self, user_token, limit, after=None):
+        """Returns one page of the user's model catalog, sorted by run_id, starting after the given run_id."""
+        with stage("db"):
+            return await self.store.list_models(user_token, limit, after)
+
+    async def delete_models(self, user_token, run_ids):
+        """Deletes several models at once, returns how many were deleted."""
+        with stage("db"):
+            deleted = await self.store.delete_models(user_token, run_ids)
+        for run_id in run_ids:
+            self.cache.invalidate(run_id)
+        return deleted
+
+    async def delete_unused_models(self, user_token, unused_seconds, limit):
+        """Deletes up to limit models neither saved nor used for unused_seconds (every user's if user_token is None)."""
+        # Uses not yet flushed would otherwise make a model look idle.
+        await self.flush_last_used()
+        with stage("db"):
+            deleted = await self.store.delete_unused_models(user_token, time.time() - unused_seconds, limit)
+        for run_id in deleted:
+            self.cache.invalidate(run_id)
+        return deleted
+
+    async def load_model_version(self, user_token, run_id):
+        """Reads the full model and its version straight from the store, bypassing the cache."""
+        with stage("db"):
+            return await self.store.load_model_version(user_token, run_id)
+
+    async def load_model_fields(self, user_token, run_id, fields):
+        """Reads only the listed fields of a model from the store, e.g. its drift baseline."""
+        with stage("db"):
+            return await self.store.load_model_fields(user_token, run_id, fields)
+
+    async def update_model_if_version(self, user_token, run_id, model_data, expected_version):
+        """Saves the model only if it is still at expected_version, returns whether it was written."""
+        with stage("db"):
+            updated = await self.store.update_model_if_version(user_token, run_id, model_data, expected_version)
+        if updated:
+            self.cache.invalidate(run_id)
+        return updated
+
+    async def delete_model(self, user_token, run_id):
+        """Deletes model data from the store."""
+        with stage("db"):
+            deleted = await self.store.delete_model(user_token, run_id)
+        self.cache.invalidate(run_id)
+        return deleted
+
+    def generate_run_id(self):
+        """Generates a short random run identifier."""
+        return str(uuid.uuid4())[:8]
+
+    async def save_state(self, kind, user_token, key, state):
+        """Stores auxiliary state such as an open fit session."""
+        with stage("db"):
+            await self.store.save_state(kind, user_token, key, state)
+
+    async def load_state(self, kind, user_token, key):
+        """Retrieves auxiliary state, returns None if not found."""
+        with stage("db"):
+            return await self.store.load_state(kind, user_token, key)
 
-    def save_model(self, user_token, run_id, model_data):
-        """Handles storing the model in the database."""
-        save_model(user_token, run_id, model_data)
+    async def delete_state(self, kind, user_token, key):
+        """Deletes auxiliary state."""
+        with stage("db"):
+            return await self.store.delete_state(kind, user_token, key)
 
-    def load_model(self, user_token, run_id):
-        """Retrieves the model from the database, returns None if not found."""
-        return load_model(user_token, run_id)
+    def state_lock(self, kind, user_token, key):
+        """Serializes read-modify-write cycles on one state within this process."""
+        lock = self._state_locks.get((kind, user_token, key))
+        if lock is None:
+            lock = self._state_locks[(kind, user_token, key)] = asyncio.Lock()
+        return lock
 
-    def delete_model(self, user_token, run_id):
-        """Deletes model data from the database."""
-        return delete_model(user_token, run_id)
+    def prepare_model(self, model_data):
+        """Converts stored model data into the form kept in the cache."""
+        return model_data
 
-    def authenticate_user(self, user_token, run_id):
+    async def authenticate_user(self, user_token, run_id):
         """Checks if the user has access to the model."""
-        model = self.load_model(user_token, run_id)
+        model = await self.load_model(user_token, run_id)
         if model is None:
             return None  
-        return model
\ No newline at end of file
+        return model
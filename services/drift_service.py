@@ -1,11 +1,130 @@
-from metrics.explainability.explainability import DriftMetric
+import uuid
+
+from config import (DRIFT_P_VALUE, DRIFT_JS_THRESHOLD, DRIFT_MONITOR_WINDOW, DRIFT_MONITOR_MIN_POINTS,
+                    DRIFT_MONITOR_EVALUATE_EVERY, DRIFT_MONITOR_CHECKPOINT_POINTS, MODEL_UPDATE_RETRIES)
+from metrics.drift.drift import DriftMetric
+from metrics.drift.monitor import DriftMonitor
 from services.base_service import BaseService
+from executor import run_compute
+
+DRIFT_MONITOR = "drift_monitor"
+
+# Live monitors of this process as (config id, DriftMonitor), keyed by (user_token, run_id). The window is checkpointed to the
+# state store every DRIFT_MONITOR_CHECKPOINT_POINTS points and on shutdown, and reloaded lazily.
+_monitors = {}
+
 
 class DriftService(BaseService):
     def __init__(self):
         super().__init__()
         self.metric = DriftMetric()
 
-    def compute(self, feature_importances):
-        """Computes explainability metrics."""
-        return "in production"
\ No newline at end of file
+    async def compute(self, user_token, run_id, values):
+        """Compares a batch against the drift baseline stored when the model was fitted."""
+        fields = await self.load_model_fields(user_token, run_id, ("drift_baseline",))
+        if fields is None:
+            return None
+        baseline = fields.get("drift_baseline")
+        if baseline is None:
+            return "Model has no drift baseline, refit it to enable drift checks"
+        return await run_compute(self.metric.compare, baseline, values)
+
+    async def register_monitor(self, user_token, run_id, window=None, p_value=None, js_threshold=None, min_points=None):
+        """
+        Starts a sliding-window monitor on a model; every point sent to detect is then fed to it.
+
+        The settings are stored on the model, so every worker picks them up with the model itself.
+        Registering again replaces the monitor and starts from an empty window.
+        """
+        config = {
+            "id": uuid.uuid4().hex,
+            "window": window or DRIFT_MONITOR_WINDOW,
+            "p_value": DRIFT_P_VALUE if p_value is None else p_value,
+            "js_threshold": DRIFT_JS_THRESHOLD if js_threshold is None else js_threshold,
+            "min_points": DRIFT_MONITOR_MIN_POINTS if min_points is None else min_points,
+        }
+        if config["min_points"] > config["window"]:
+            return "min_points cannot exceed the window length"
+        result = await self._set_monitor_config(user_token, run_id, config)
+        if isinstance(result, dict):
+            await self.delete_state(DRIFT_MONITOR, user_token, run_id)
+            _monitors.pop((user_token, run_id), None)
+        return result
+
+    async def unregister_monitor(self, user_token, run_id):
+        """Stops feeding detection requests to the run's monitor and drops its window."""
+        result = await self._set_monitor_config(user_token, run_id, None)
+        if isinstance(result, dict):
+            await self.delete_state(DRIFT_MONITOR, user_token, run_id)
+            _monitors.pop((user_token, run_id), None)
+        return result
+
+    async def _set_monitor_config(self, user_token, run_id, config):
+        for _ in range(MODEL_UPDATE_RETRIES):
+            model_data, version = await self.load_model_version(user_token, run_id)
+            if model_data is None:
+                return None
+            if model_data.get("drift_baseline") is None:
+                return "Model has no drift baseline, refit it to enable drift checks"
+            model_data = dict(model_data)
+            if config is None:
+                model_data.pop(DRIFT_MONITOR, None)
+            else:
+                model_data[DRIFT_MONITOR] = config
+            if await self.update_model_if_version(user_token, run_id, model_data, version):
+                return {"run_id": run_id, "monitor": config}
+        return "Concurrent update conflict"
+
+    async def observe(self, user_token, run_id, config, values):
+        """Slides the run's monitor over new points, returns whether drift is flagged."""
+        monitor = await self._monitor(user_token, run_id, config)
+        if monitor is None:
+            return None
+        # A single point is O(size × d) work, cheaper than the hop to the compute pool.
+        flagged = monitor.observe(values) if len(values) == 1 else await run_compute(monitor.observe, values)
+        if monitor.observed - monitor.checkpointed >= DRIFT_MONITOR_CHECKPOINT_POINTS:
+            await self._checkpoint(user_token, run_id, config["id"], monitor)
+        return flagged
+
+    async def status(self, user_token, run_id):
+        """Window statistics of the run's monitor, a message if none is registered."""
+        model_data = await self.authenticate_user(user_token, run_id)
+        if model_data is None:
+            return None
+        config = model_data.get(DRIFT_MONITOR)
+        if config is None:
+            return "No drift monitor registered for this run"
+        monitor = await self._monitor(user_token, run_id, config)
+        if monitor is None:
+            return "Model has no drift baseline, refit it to enable drift checks"
+        return {"run_id": run_id, "monitor": config, **monitor.status()}
+
+    async def flush_monitors(self):
+        """Checkpoints every monitor that saw points since its last checkpoint, e.g. on shutdown."""
+        for (user_token, run_id), (config_id, monitor) in list(_monitors.items()):
+            if monitor.observed > monitor.checkpointed:
+                await self._checkpoint(user_token, run_id, config_id, monitor)
+
+    async def _monitor(self, user_token, run_id, config):
+        config_id, monitor = _monitors.get((user_token, run_id), (None, None))
+        if config_id == config["id"]:
+            return monitor
+
+        async with self.state_lock(DRIFT_MONITOR, user_token, run_id):
+            config_id, monitor = _monitors.get((user_token, run_id), (None, None))
+            if config_id == config["id"]:
+                return monitor
+            fields = await self.load_model_fields(user_token, run_id, ("drift_baseline",))
+            if fields is None or fields.get("drift_baseline") is None:
+                return None
+            monitor = DriftMonitor(fields["drift_baseline"], config["window"], config["p_value"],
+                                   config["js_threshold"], config["min_points"], DRIFT_MONITOR_EVALUATE_EVERY)
+            state = await self.load_state(DRIFT_MONITOR, user_token, run_id)
+            if state is not None and state.get("id") == config["id"]:
+                monitor.restore(state)
+            _monitors[(user_token, run_id)] = (config["id"], monitor)
+            return monitor
+
+    async def _checkpoint(self, user_token, run_id, config_id, monitor):
+        monitor.checkpointed = monitor.observed
+        await self.save_state(DRIFT_MONITOR, user_token, run_id, {"id": config_id, **monitor.to_state()})
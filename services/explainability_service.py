@@ -6,6 +6,6 @@ class ExplainabilityService(BaseService):
         super().__init__()
         self.metric = ExplainabilityMetric()
 
-    def compute(self, feature_importances):
-        """Computes explainability metrics."""
-        return "in production"
\ No newline at end of file
+    def compute(self, feature_importances, top_k=None):
+        """Ranks features by importance. Anomaly attributions come with detection, see explain_top_k."""
+        return self.metric.rank(feature_importances, top_k)
@@ -1,11 +1,54 @@
+import time
+
+from config import METRIC_BUCKET_SECONDS, METRIC_RETENTION_SECONDS
 from metrics.fairness.fairness import FairnessMetric
+from metrics.fairness.accumulator import GroupConfusionAccumulator
 from services.base_service import BaseService
+from executor import run_compute
+
+FAIRNESS_COUNTS = "fairness_counts"
 
 class FairnessService(BaseService):
     def __init__(self):
         super().__init__()
         self.metric = FairnessMetric()
 
-    def compute(self, predictions, actuals, sensitive_attribute):
-        """Computes fairness metrics."""
-        return "in production"
\ No newline at end of file
+    async def compute(self, predictions, actuals, sensitive_attributes, reference_groups=None):
+        """Computes every fairness metric for each sensitive attribute, returns an error string on bad input."""
+        if not sensitive_attributes:
+            return "At least one sensitive attribute is required"
+        try:
+            return await run_compute(self.metric.compute, predictions, actuals, sensitive_attributes, reference_groups)
+        except ValueError as error:
+            return str(error)
+
+    async def push(self, user_token, run_id, predictions, actuals, sensitive_attributes, timestamps=None):
+        """Adds a batch of predictions to the run's time-bucketed per-group confusion matrices."""
+        if not sensitive_attributes:
+            return "At least one sensitive attribute is required"
+        async with self.state_lock(FAIRNESS_COUNTS, user_token, run_id):
+            state = await self.load_state(FAIRNESS_COUNTS, user_token, run_id)
+            counts = GroupConfusionAccumulator.from_state(state) if state else GroupConfusionAccumulator(METRIC_BUCKET_SECONDS)
+            now = time.time()
+            try:
+                await run_compute(counts.update, predictions, actuals, sensitive_attributes, now if timestamps is None else timestamps)
+            except ValueError as error:
+                return str(error)
+            counts.prune(now - METRIC_RETENTION_SECONDS)
+            await self.save_state(FAIRNESS_COUNTS, user_token, run_id, counts.to_state())
+        return {"run_id": run_id, "rows": counts.rows}
+
+    async def report(self, user_token, run_id, window_seconds=None, tumbling_seconds=None, reference_groups=None):
+        """Fairness over everything retained, the last window_seconds, or per tumbling window."""
+        state = await self.load_state(FAIRNESS_COUNTS, user_token, run_id)
+        if state is None:
+            return None
+        counts = GroupConfusionAccumulator.from_state(state)
+        if tumbling_seconds:
+            try:
+                windows = counts.tumbling_reports(tumbling_seconds, reference_groups)
+            except ValueError as error:
+                return str(error)
+            return {"run_id": run_id, "windows": windows}
+        start = time.time() - window_seconds if window_seconds else None
+        return {"run_id": run_id, "attributes": counts.report(start=start, reference_groups=reference_groups)}
@@ -0,0 +1,126 @@
+import time
+import uuid
+
+from config import MODEL_UPDATE_RETRIES
+from executor import run_compute
+from metrics.sequential import SequentialMonitor, in_control
+from services.base_service import BaseService
+
+SEQUENTIAL = "sequential"
+# Model fields the in-control centre and scale come from.
+BASELINE_FIELDS = ("means", "stds", "drift_baseline")
+
+# Live monitors of this process as (config id, SequentialMonitor), keyed by (user_token, run_id). The app
+# checkpoints the ones that saw points to the state store every SEQUENTIAL_CHECKPOINT_SECONDS and on
+# shutdown, so the write rate is bounded by time whatever the point rate; they are reloaded lazily.
+# Like drift monitor windows, the charts are per worker: with several workers each one only sees the
+# points routed to it, and the checkpoint holds whichever worker saved last. The charts follow the
+# order of the points, so send a run's stream to a single worker process.
+_monitors = {}
+
+
+class SequentialService(BaseService):
+    async def register(self, user_token, run_id, ewma=None, cusum=None, seasonal=None):
+        """
+        Attaches sequential charts to a fitted model; points sent to observe are then fed to all of them.
+
+        The settings are stored on the model, so every worker picks them up with the model itself.
+        Registering again replaces the charts and starts them from a clean state.
+        """
+        config = {"id": uuid.uuid4().hex, "ewma": ewma, "cusum": cusum, "seasonal": seasonal}
+        result = await self._set_config(user_token, run_id, config)
+        if isinstance(result, dict):
+            await self.delete_state(SEQUENTIAL, user_token, run_id)
+            _monitors.pop((user_token, run_id), None)
+        return result
+
+    async def unregister(self, user_token, run_id):
+        """Removes the run's charts and their state."""
+        result = await self._set_config(user_token, run_id, None)
+        if isinstance(result, dict):
+            await self.delete_state(SEQUENTIAL, user_token, run_id)
+            _monitors.pop((user_token, run_id), None)
+        return result
+
+    async def _set_config(self, user_token, run_id, config):
+        for _ in range(MODEL_UPDATE_RETRIES):
+            model_data, version = await self.load_model_version(user_token, run_id)
+            if model_data is None:
+                return None
+            if model_data.get("stds") is None and model_data.get("drift_baseline") is None:
+                return "Model has no baseline, refit it to enable sequential detectors"
+            model_data = dict(model_data)
+            if config is None:
+                model_data.pop(SEQUENTIAL, None)
+            else:
+                model_data[SEQUENTIAL] = config
+            if await self.update_model_if_version(user_token, run_id, model_data, version):
+                return {"run_id": run_id, "sequential": config}
+        return "Concurrent update conflict"
+
+    async def observe(self, user_token, run_id, values, timestamps=None):
+        """Feeds a batch of points, in time order, to the run's charts and returns their per-point scores."""
+        model_data = await self.authenticate_user(user_token, run_id)
+        if model_data is None:
+            return None
+        config = model_data.get(SEQUENTIAL)
+        if config is None:
+            return "No sequential detectors registered for this run"
+        monitor = await self._monitor(user_token, run_id, config)
+        if monitor is None:
+            return "Model has no baseline, refit it to enable sequential detectors"
+
+        timestamps = time.time() if timestamps is None else timestamps
+        # A single point is O(d) work, cheaper than the hop to the compute pool.
+        try:
+            if len(values) == 1:
+                result = monitor.observe(values, timestamps)
+            else:
+                result = await run_compute(monitor.observe, values, timestamps)
+        except ValueError as error:
+            return str(error)
+        return result
+
+    async def status(self, user_token, run_id):
+        """Current statistics of the run's charts, a message if none are registered."""
+        model_data = await self.authenticate_user(user_token, run_id)
+        if model_data is None:
+            return None
+        config = model_data.get(SEQUENTIAL)
+        if config is None:
+            return "No sequential detectors registered for this run"
+        monitor = await self._monitor(user_token, run_id, config)
+        if monitor is None:
+            return "Model has no baseline, refit it to enable sequential detectors"
+        return {"run_id": run_id, "sequential": config, **monitor.status()}
+
+    async def flush_monitors(self):
+        """Checkpoints every monitor that saw points since its last checkpoint, periodically and on shutdown."""
+        for (user_token, run_id), (config_id, monitor) in list(_monitors.items()):
+            if monitor.observed > monitor.checkpointed:
+                await self._checkpoint(user_token, run_id, config_id, monitor)
+
+    async def _monitor(self, user_token, run_id, config):
+        config_id, monitor = _monitors.get((user_token, run_id), (None, None))
+        if config_id == config["id"]:
+            return monitor
+
+        async with self.state_lock(SEQUENTIAL, user_token, run_id):
+            config_id, monitor = _monitors.get((user_token, run_id), (None, None))
+            if config_id == config["id"]:
+                return monitor
+            fields = await self.load_model_fields(user_token, run_id, BASELINE_FIELDS)
+            if fields is None or (fields.get("stds") is None and fields.get("drift_baseline") is None):
+                return None
+            centre, scale = in_control(fields)
+            monitor = SequentialMonitor(centre, scale, config.get("ewma"), config.get("cusum"), config.get("seasonal"))
+            state = await self.load_state(SEQUENTIAL, user_token, run_id)
+            if state is not None and state.get("id") == config["id"]:
+                monitor.restore(state)
+            _monitors[(user_token, run_id)] = (config["id"], monitor)
+            return monitor
+
+    async def _checkpoint(self, user_token, run_id, config_id, monitor):
+        state = monitor.to_state()
+        monitor.checkpointed = state["observed"]
+        await self.save_state(SEQUENTIAL, user_token, run_id, {"id": config_id, **state})
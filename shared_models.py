@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from config import SHARED_MODELS, SHARED_MODEL_PATH, SHARED_MODEL_TTL
+
+# Prepared fields every detection reads; they are published to shared memory as one packed array.
+HOT_FIELDS = ("means", "stds", "precision_cholesky")
+
+
+class SharedModelSegments:
+    """
+    Publishes hot model parameters once per node, so worker processes share one copy.
+
+        <path>/<digest>.npy     means, stds and precision factor packed as one float64 array
+
+    The path lives on tmpfs (/dev/shm), so a segment is a shared-memory mapping: the first worker
+    that loads a model writes it to a temporary file and renames it into place, and every worker
+    then maps it with mmap_mode="r", the same read-only mapping the file store uses. The name is
+    a digest of the parameters, so a refit publishes a new segment and never reads a stale one.
+    Segments unused for SHARED_MODEL_TTL are unlinked; workers that still map them keep their pages.
+    """
+
+    def __init__(self, path=SHARED_MODEL_PATH, ttl=SHARED_MODEL_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._last_sweep = 0.0
+
+    def share(self, prepared):
+        """Returns the prepared model with its hot arrays replaced by read-only views of a shared segment."""
+        if any(name not in prepared for name in HOT_FIELDS):
+            # Only the Gaussian detector's parameters are published; other models stay process-local.
+            return prepared
+        arrays = [np.ascontiguousarray(prepared[name], dtype=float) for name in HOT_FIELDS]
+        packed = np.concatenate([array.ravel() for array in arrays])
+        digest = hashlib.blake2b(packed.tobytes(), digest_size=16)
+        digest.update(repr([array.shape for array in arrays]).encode())
+        segment = os.path.join(self.path, f"{digest.hexdigest()}.npy")
+
+        try:
+            shared = self._attach(segment, len(packed))
+            if shared is None:
+                self._publish(segment, packed)
+                shared = self._attach(segment, len(packed))
+        except OSError:
+            shared = None
+        if shared is None:
+            # No room on the shared path: keep the process-local copy.
+            return prepared
+        self._sweep()
+
+        shared_model = dict(prepared)
+        offset = 0
+        for name, array in zip(HOT_FIELDS, arrays):
+            shared_model[name] = shared[offset:offset + array.size].reshape(array.shape)
+            offset += array.size
+        return shared_model
+
+    def stats(self):
+        """Number and total size of the segments currently published on this node."""
+        sizes = []
+        if os.path.isdir(self.path):
+            for entry in os.scandir(self.path):
+                try:
+                    if entry.name.endswith(".npy"):
+                        sizes.append(entry.stat().st_size)
+                except FileNotFoundError:
+                    pass
+        return {"segments": len(sizes), "bytes": sum(sizes)}
+
+    def _attach(self, segment, size):
+        try:
+            shared = np.load(segment, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        if shared.shape != (size,) or shared.dtype != np.float64:
+            return None
+        os.utime(segment)
+        return shared
+
+    def _publish(self, segment, packed):
+        os.makedirs(self.path, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                np.save(f, packed)
+            os.replace(temporary, segment)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _sweep(self):
+        """Unlinks segments no worker attached to for ttl seconds, at most once per ttl."""
+        now = time.time()
+        if now - self._last_sweep < self.ttl:
+            return
+        self._last_sweep = now
+        for entry in os.scandir(self.path):
+            try:
+                if entry.stat().st_mtime < now - self.ttl:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+shared_models = SharedModelSegments() if SHARED_MODELS else None
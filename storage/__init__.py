@@ -0,0 +1,15 @@
+from .base import ModelStore
+from .memory import MemoryModelStore
+from .file import FileModelStore
+
+
+def create_store(backend):
+    """Builds the storage backend named in config.STORAGE_BACKEND."""
+    if backend == "mongo":
+        from .mongo import MongoModelStore
+        return MongoModelStore()
+    if backend == "memory":
+        return MemoryModelStore()
+    if backend == "file":
+        return FileModelStore()
+    raise ValueError(f"Unknown storage backend: {backend}")
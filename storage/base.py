@@ -0,0 +1,131 @@
+class ModelStore:
+    """
+    Interface every storage backend implements.
+
+    Models are keyed by run_id and shared with the user_tokens in their access list. Each save
+    bumps a version used for compare-and-swap updates. States are small auxiliary documents
+    (fit sessions, accumulators) keyed by (kind, user_token, key).
+
+    Every model also carries catalog fields: created_at and updated_at (unix times of its first
+    and latest save) and last_used (latest detection, see touch_models).
+    """
+
+    # Whether the backend deletes expired models itself; the others are swept by the app.
+    expires_models = False
+
+    async def connect(self):
+        """Opens connections or files; called once at startup."""
+
+    async def close(self):
+        """Releases connections or files; called once at shutdown."""
+
+    async def ping(self) -> bool:
+        """Whether the backend answers; backs the readiness probe."""
+        return True
+
+    async def create_indexes(self):
+        """Creates the indexes lookups and listings rely on; idempotent, called once at startup."""
+
+    async def migrate_models(self) -> int:
+        """Rewrites models kept in an older storage format, returns how many; only MongoDB has such models."""
+        return 0
+
+    def pool_stats(self) -> dict:
+        """Connection pool gauges for the metrics endpoint; empty for backends without a pool."""
+        return {}
+
+    async def save_model(self, user_token: int, run_id: str, model_data: dict):
+        raise NotImplementedError
+
+    async def load_model(self, user_token: int, run_id: str) -> dict:
+        """Returns the model without its update-only statistics, or None if the user has no access."""
+        raise NotImplementedError
+
+    async def load_models(self, user_token: int, run_ids) -> dict:
+        """Returns {run_id: model} for the listed runs the user can access, each as load_model returns it."""
+        models = {}
+        for run_id in run_ids:
+            model_data = await self.load_model(user_token, run_id)
+            if model_data is not None:
+                models[run_id] = model_data
+        return models
+
+    async def load_models_versioned(self, user_token: int, run_ids) -> dict:
+        """
+        Returns {run_id: (model_data, version)} for the listed runs the user can access, each model as
+        load_model returns it. The backends read both in one go; this fallback reads the versions
+        first, so a save in between leaves an older version next to the newer model, which is
+        caught as stale on the next check.
+        """
+        versions = await self.model_versions(user_token, run_ids)
+        models = await self.load_models(user_token, run_ids)
+        return {run_id: (model_data, versions.get(run_id)) for run_id, model_data in models.items()}
+
+    async def find_run_ids(self, user_token: int, prefix: str, limit: int) -> list:
+        """Returns up to limit run_ids starting with prefix that the user can access, sorted."""
+        raise NotImplementedError
+
+    async def touch_models(self, used: dict):
+        """Records {run_id: unix time} as the time each model was last used for detection."""
+
+    async def hot_models(self, limit: int) -> list:
+        """Returns up to limit (run_id, access list) pairs, most recently used first."""
+        return []
+
+    async def list_models(self, user_token: int, limit: int, after: str = None) -> list:
+        """
+        Returns catalog entries (run_id, algorithm, version and timestamps, no parameters) of up to
+        limit models the user can access, sorted by run_id and starting after the given run_id.
+        """
+        raise NotImplementedError
+
+    async def delete_models(self, user_token: int, run_ids) -> int:
+        """Deletes the listed models the user can access, returns how many were deleted."""
+        deleted = 0
+        for run_id in run_ids:
+            deleted += await self.delete_model(user_token, run_id)
+        return deleted
+
+    async def delete_unused_models(self, user_token, before: float, limit: int) -> list:
+        """
+        Deletes up to limit models neither saved nor used since the unix time `before`, returns their run_ids.
+
+        user_token None considers every model, which is how models expire.
+        """
+        raise NotImplementedError
+
+    async def load_model_version(self, user_token: int, run_id: str):
+        """Returns (model_data, version) with every field, or (None, None)."""
+        raise NotImplementedError
+
+    async def model_versions(self, user_token: int, run_ids) -> dict:
+        """Returns {run_id: version} for the listed runs the user can access, without their parameters."""
+        versions = {}
+        for run_id in run_ids:
+            _, version = await self.load_model_version(user_token, run_id)
+            if version is not None:
+                versions[run_id] = version
+        return versions
+
+    async def load_model_fields(self, user_token: int, run_id: str, fields) -> dict:
+        """Returns only the listed top-level fields of the model, or None if the user has no access."""
+        model_data, _ = await self.load_model_version(user_token, run_id)
+        if model_data is None:
+            return None
+        return {name: model_data[name] for name in fields if name in model_data}
+
+    async def update_model_if_version(self, user_token: int, run_id: str, model_data: dict, expected_version: int) -> bool:
+        """Writes the model only if it is still at expected_version."""
+        raise NotImplementedError
+
+    async def delete_model(self, user_token: int, run_id: str) -> bool:
+        raise NotImplementedError
+
+    async def save_state(self, kind: str, user_token: int, key: str, state: dict):
+        raise NotImplementedError
+
+    async def load_state(self, kind: str, user_token: int, key: str) -> dict:
+        raise NotImplementedError
+
+    async def delete_state(self, kind: str, user_token: int, key: str) -> bool:
+        raise NotImplementedError
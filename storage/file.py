@@ -0,0 +1,279 @@
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import MODEL_DTYPE, STORAGE_PATH
+from serialization import as_storage_array, encode_model_data, decode_model_data, UPDATE_ONLY_FIELDS
+from storage.base import ModelStore
+
+
+class FileModelStore(ModelStore):
+    """
+    Stores models on the local disk for single-node deployments.
+
+        <root>/models/<hex run_id>/index.json      run_id, access list, version, document layout
+        <root>/models/<hex run_id>/v<version>/     one .npy file per array
+        <root>/models/<hex run_id>/last_used       empty file, its mtime is the last detection time
+
+    Arrays are opened with mmap_mode="r", so loading a model only maps its pages and every
+    process on the node shares them through the page cache. A save writes a new version
+    directory and then atomically replaces index.json; writers serialise on a per-run flock.
+    Listings and garbage collection read every index.json, which suits the single-node scale
+    this backend is meant for.
+    """
+
+    def __init__(self, root=STORAGE_PATH):
+        self.root = root
+
+    async def connect(self):
+        os.makedirs(os.path.join(self.root, "models"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "states"), exist_ok=True)
+
+    async def ping(self):
+        return os.path.isdir(os.path.join(self.root, "models"))
+
+    async def save_model(self, user_token, run_id, model_data):
+        await asyncio.to_thread(self._save_model, user_token, run_id, model_data)
+
+    async def load_model(self, user_token, run_id):
+        model_data, _ = await asyncio.to_thread(self._load, self._model_dir(run_id), user_token, skip=UPDATE_ONLY_FIELDS)
+        return model_data
+
+    async def load_models_versioned(self, user_token, run_ids):
+        return await asyncio.to_thread(self._load_models_versioned, user_token, run_ids)
+
+    async def find_run_ids(self, user_token, prefix, limit):
+        return await asyncio.to_thread(self._find_run_ids, user_token, prefix, limit)
+
+    async def touch_models(self, used):
+        await asyncio.to_thread(self._touch_models, used)
+
+    async def hot_models(self, limit):
+        return await asyncio.to_thread(self._hot_models, limit)
+
+    async def list_models(self, user_token, limit, after=None):
+        return await asyncio.to_thread(self._list_models, user_token, limit, after)
+
+    async def delete_unused_models(self, user_token, before, limit):
+        return await asyncio.to_thread(self._delete_unused_models, user_token, before, limit)
+
+    async def load_model_version(self, user_token, run_id):
+        return await asyncio.to_thread(self._load, self._model_dir(run_id), user_token)
+
+    async def model_versions(self, user_token, run_ids):
+        return await asyncio.to_thread(self._model_versions, user_token, run_ids)
+
+    async def load_model_fields(self, user_token, run_id, fields):
+        model_data, _ = await asyncio.to_thread(self._load, self._model_dir(run_id), user_token, only=fields)
+        return model_data
+
+    async def update_model_if_version(self, user_token, run_id, model_data, expected_version):
+        return await asyncio.to_thread(self._update_model_if_version, user_token, run_id, model_data, expected_version)
+
+    async def delete_model(self, user_token, run_id):
+        return await asyncio.to_thread(self._delete, self._model_dir(run_id), user_token)
+
+    async def save_state(self, kind, user_token, key, state):
+        directory = self._state_dir(kind, user_token, key)
+        await asyncio.to_thread(self._write_locked, directory, {"access": [user_token]}, state, "float64")
+
+    async def load_state(self, kind, user_token, key):
+        state, _ = await asyncio.to_thread(self._load, self._state_dir(kind, user_token, key), user_token)
+        return state
+
+    async def delete_state(self, kind, user_token, key):
+        return await asyncio.to_thread(self._delete, self._state_dir(kind, user_token, key), user_token)
+
+    def _load_models_versioned(self, user_token, run_ids):
+        loaded = {run_id: self._load(self._model_dir(run_id), user_token, skip=UPDATE_ONLY_FIELDS) for run_id in run_ids}
+        return {run_id: (model_data, version) for run_id, (model_data, version) in loaded.items() if model_data is not None}
+
+    def _model_versions(self, user_token, run_ids):
+        indexes = {run_id: self._read_index(self._model_dir(run_id), user_token) for run_id in run_ids}
+        return {run_id: index["version"] for run_id, index in indexes.items() if index is not None}
+
+    def _save_model(self, user_token, run_id, model_data):
+        directory = self._model_dir(run_id)
+        with self._locked(directory):
+            now = time.time()
+            index = self._read_index(directory) or {"run_id": run_id, "access": [], "version": 0, "created_at": now}
+            header = {"run_id": run_id, "access": sorted(set(index["access"]) | {user_token}),
+                      "created_at": index.get("created_at", now), "updated_at": now}
+            self._write(directory, header, index["version"] + 1, model_data)
+
+    def _update_model_if_version(self, user_token, run_id, model_data, expected_version):
+        directory = self._model_dir(run_id)
+        with self._locked(directory):
+            index = self._read_index(directory, user_token)
+            if index is None or index["version"] != expected_version:
+                return False
+            header = {"run_id": run_id, "access": index["access"],
+                      "created_at": index.get("created_at"), "updated_at": time.time()}
+            self._write(directory, header, expected_version + 1, model_data)
+            return True
+
+    def _write_locked(self, directory, header, document, dtype):
+        with self._locked(directory):
+            index = self._read_index(directory) or {"version": 0}
+            self._write(directory, header, index["version"] + 1, document, dtype)
+
+    def _write(self, directory, header, version, document, dtype=MODEL_DTYPE):
+        version_dir = os.path.join(directory, f"v{version}")
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.makedirs(version_dir)
+        files = []
+
+        def encode(array, array_dtype):
+            name = f"{len(files)}.npy"
+            stored = as_storage_array(array, array_dtype)
+            np.save(os.path.join(version_dir, name), stored)
+            files.append(name)
+            return {"dtype": stored.dtype.str, "shape": list(stored.shape), "file": name}
+
+        encoded = encode_model_data(document, dtype, encode)
+        index_path = os.path.join(directory, "index.json")
+        with open(index_path + ".tmp", "w") as f:
+            json.dump({**header, "version": version, "model_data": encoded}, f)
+        os.replace(index_path + ".tmp", index_path)
+
+        # Keep the previous version for readers that picked up the old index just before the swap.
+        for entry in os.listdir(directory):
+            if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) < version - 1:
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+    def _find_run_ids(self, user_token, prefix, limit):
+        root = os.path.join(self.root, "models")
+        candidates = sorted(run_id for run_id in (bytes.fromhex(entry).decode() for entry in os.listdir(root))
+                            if run_id.startswith(prefix))
+        run_ids = []
+        for run_id in candidates:
+            if len(run_ids) == limit:
+                break
+            if self._read_index(self._model_dir(run_id), user_token) is not None:
+                run_ids.append(run_id)
+        return run_ids
+
+    def _catalog(self, user_token):
+        """Yields (run_id, catalog entry) for every model the user (or anyone, if None) can access."""
+        for entry in os.scandir(os.path.join(self.root, "models")):
+            index = self._read_index(entry.path, user_token)
+            if index is None:
+                continue
+            try:
+                last_used = os.stat(os.path.join(entry.path, "last_used")).st_mtime
+            except FileNotFoundError:
+                last_used = None
+            yield index["run_id"], {
+                "run_id": index["run_id"],
+                "algorithm": index["model_data"].get("algorithm"),
+                "version": index["version"],
+                "created_at": index.get("created_at"),
+                "updated_at": index.get("updated_at"),
+                "last_used": last_used,
+            }
+
+    def _list_models(self, user_token, limit, after):
+        entries = sorted((run_id, entry) for run_id, entry in self._catalog(user_token) if after is None or run_id > after)
+        return [entry for _, entry in entries[:limit]]
+
+    def _delete_unused_models(self, user_token, before, limit):
+        unused = sorted(run_id for run_id, entry in self._catalog(user_token)
+                        if max(entry["updated_at"] or 0, entry["last_used"] or 0) < before)
+        deleted = []
+        for run_id in unused[:limit]:
+            # Another worker may have used or deleted the model since the scan.
+            if self._delete(self._model_dir(run_id), user_token, before):
+                deleted.append(run_id)
+        return deleted
+
+    def _touch_models(self, used):
+        for run_id, timestamp in used.items():
+            directory = self._model_dir(run_id)
+            if not os.path.isdir(directory):
+                continue
+            marker = os.path.join(directory, "last_used")
+            with open(marker, "a"):
+                pass
+            os.utime(marker, (timestamp, timestamp))
+
+    def _hot_models(self, limit):
+        root = os.path.join(self.root, "models")
+        used = []
+        for entry in os.scandir(root):
+            try:
+                used.append((os.stat(os.path.join(entry.path, "last_used")).st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+        hot = []
+        for _, directory in sorted(used, reverse=True):
+            if len(hot) == limit:
+                break
+            index = self._read_index(directory)
+            if index is not None:
+                hot.append((index["run_id"], index["access"]))
+        return hot
+
+    def _delete(self, directory, user_token, unused_before=None):
+        with self._locked(directory):
+            index = self._read_index(directory, user_token)
+            if index is None or (unused_before is not None and self._last_active(directory, index) >= unused_before):
+                return False
+            os.remove(os.path.join(directory, "index.json"))
+        shutil.rmtree(directory, ignore_errors=True)
+        return True
+
+    def _last_active(self, directory, index):
+        try:
+            last_used = os.stat(os.path.join(directory, "last_used")).st_mtime
+        except FileNotFoundError:
+            last_used = 0
+        return max(index.get("updated_at") or 0, last_used)
+
+    def _load(self, directory, user_token, skip=(), only=None):
+        """Returns (document, version) or (None, None); retries once if a writer swapped versions meanwhile."""
+        for _ in range(2):
+            index = self._read_index(directory, user_token)
+            if index is None:
+                return None, None
+            version_dir = os.path.join(directory, f"v{index['version']}")
+            layout = {name: value for name, value in index["model_data"].items()
+                      if name not in skip and (only is None or name in only or name == "format_version")}
+            try:
+                document = decode_model_data(layout, decode=lambda encoded: np.load(os.path.join(version_dir, encoded["file"]), mmap_mode="r"))
+            except FileNotFoundError:
+                continue
+            return document, index["version"]
+        return None, None
+
+    def _read_index(self, directory, user_token=None):
+        try:
+            with open(os.path.join(directory, "index.json")) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        if user_token is not None and user_token not in index["access"]:
+            return None
+        return index
+
+    @contextmanager
+    def _locked(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _model_dir(self, run_id):
+        # Hex-encoding keeps arbitrary run_ids (slashes, "..") inside the store directory.
+        return os.path.join(self.root, "models", run_id.encode().hex())
+
+    def _state_dir(self, kind, user_token, key):
+        return os.path.join(self.root, "states", kind, str(user_token), key.encode().hex())
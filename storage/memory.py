@@ -0,0 +1,136 @@
+import threading
+import time
+
+from serialization import UPDATE_ONLY_FIELDS
+from storage.base import ModelStore
+
+
+class MemoryModelStore(ModelStore):
+    """Keeps models in process memory. Nothing survives a restart; meant for tests, benchmarks and demos."""
+
+    def __init__(self):
+        self.models = {}
+        self.states = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.models.clear()
+            self.states.clear()
+
+    async def save_model(self, user_token, run_id, model_data):
+        with self._lock:
+            now = time.time()
+            entry = self.models.get(run_id, {"access": set(), "version": 0, "created_at": now})
+            self.models[run_id] = {
+                **entry,
+                "model_data": dict(model_data),
+                "access": entry["access"] | {user_token},
+                "version": entry["version"] + 1,
+                "updated_at": now,
+            }
+
+    async def load_model(self, user_token, run_id):
+        entry = self._entry(user_token, run_id)
+        if entry is None:
+            return None
+        return {name: value for name, value in entry["model_data"].items() if name not in UPDATE_ONLY_FIELDS}
+
+    async def load_models_versioned(self, user_token, run_ids):
+        entries = {run_id: self._entry(user_token, run_id) for run_id in run_ids}
+        return {run_id: ({name: value for name, value in entry["model_data"].items() if name not in UPDATE_ONLY_FIELDS},
+                         entry["version"])
+                for run_id, entry in entries.items() if entry is not None}
+
+    async def find_run_ids(self, user_token, prefix, limit):
+        run_ids = [run_id for run_id, entry in list(self.models.items())
+                   if run_id.startswith(prefix) and user_token in entry["access"]]
+        return sorted(run_ids)[:limit]
+
+    async def touch_models(self, used):
+        with self._lock:
+            for run_id, timestamp in used.items():
+                if run_id in self.models:
+                    self.models[run_id]["last_used"] = max(timestamp, self.models[run_id].get("last_used", 0))
+
+    async def hot_models(self, limit):
+        used = [(entry["last_used"], run_id, sorted(entry["access"]))
+                for run_id, entry in list(self.models.items()) if "last_used" in entry]
+        return [(run_id, access) for _, run_id, access in sorted(used, reverse=True)[:limit]]
+
+    async def list_models(self, user_token, limit, after=None):
+        entries = sorted((run_id, entry) for run_id, entry in list(self.models.items())
+                         if user_token in entry["access"] and (after is None or run_id > after))
+        return [_catalog_entry(run_id, entry) for run_id, entry in entries[:limit]]
+
+    async def delete_models(self, user_token, run_ids):
+        with self._lock:
+            deleted = [run_id for run_id in set(run_ids) if self._entry(user_token, run_id) is not None]
+            for run_id in deleted:
+                del self.models[run_id]
+            return len(deleted)
+
+    async def delete_unused_models(self, user_token, before, limit):
+        with self._lock:
+            unused = sorted(run_id for run_id, entry in self.models.items()
+                            if (user_token is None or user_token in entry["access"])
+                            and max(entry["updated_at"], entry.get("last_used", 0)) < before)[:limit]
+            for run_id in unused:
+                del self.models[run_id]
+            return unused
+
+    async def load_model_version(self, user_token, run_id):
+        entry = self._entry(user_token, run_id)
+        if entry is None:
+            return None, None
+        return dict(entry["model_data"]), entry["version"]
+
+    async def model_versions(self, user_token, run_ids):
+        entries = {run_id: self._entry(user_token, run_id) for run_id in run_ids}
+        return {run_id: entry["version"] for run_id, entry in entries.items() if entry is not None}
+
+    async def update_model_if_version(self, user_token, run_id, model_data, expected_version):
+        with self._lock:
+            entry = self.models.get(run_id)
+            if entry is None or user_token not in entry["access"] or entry["version"] != expected_version:
+                return False
+            self.models[run_id] = {**entry, "model_data": dict(model_data), "version": expected_version + 1,
+                                   "updated_at": time.time()}
+            return True
+
+    async def delete_model(self, user_token, run_id):
+        with self._lock:
+            entry = self.models.get(run_id)
+            if entry is None or user_token not in entry["access"]:
+                return False
+            del self.models[run_id]
+            return True
+
+    async def save_state(self, kind, user_token, key, state):
+        with self._lock:
+            self.states[(kind, user_token, key)] = dict(state)
+
+    async def load_state(self, kind, user_token, key):
+        state = self.states.get((kind, user_token, key))
+        return None if state is None else dict(state)
+
+    async def delete_state(self, kind, user_token, key):
+        with self._lock:
+            return self.states.pop((kind, user_token, key), None) is not None
+
+    def _entry(self, user_token, run_id):
+        entry = self.models.get(run_id)
+        if entry is None or user_token not in entry["access"]:
+            return None
+        return entry
+
+
+def _catalog_entry(run_id, entry):
+    return {
+        "run_id": run_id,
+        "algorithm": entry["model_data"].get("algorithm"),
+        "version": entry["version"],
+        "created_at": entry["created_at"],
+        "updated_at": entry["updated_at"],
+        "last_used": entry.get("last_used"),
+    }
@@ -0,0 +1,308 @@
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, IndexModel, ReadPreference, UpdateOne
+from pymongo.errors import PyMongoError
+from pymongo.monitoring import ConnectionPoolListener
+
+from config import (MONGO_URI, DB_NAME, COLLECTION_NAME, STATE_COLLECTION_NAME, MONGO_MAX_POOL_SIZE,
+                    MONGO_MIN_POOL_SIZE, MONGO_TIMEOUT_MS, MONGO_READ_PREFERENCE, MODEL_TTL_SECONDS)
+from serialization import encode_model_data, decode_model_data, UPDATE_ONLY_FIELDS
+from storage.base import ModelStore
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Tracks open and checked-out connections plus checkout waits, for the metrics endpoint."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self._lock = threading.Lock()
+
+    def _add(self, field, amount):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def connection_check_out_started(self, event):
+        self._add("waiting", 1)
+
+    def connection_checked_out(self, event):
+        self._add("waiting", -1)
+        self._add("checked_out", 1)
+
+    def connection_check_out_failed(self, event):
+        self._add("waiting", -1)
+        self._add("checkout_failures", 1)
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {"open": self.open, "checked_out": self.checked_out,
+                    "waiting": self.waiting, "checkout_failures": self.checkout_failures}
+
+
+CATALOG_PROJECTION = {"_id": 0, "run_id": 1, "version": 1, "created_at": 1, "updated_at": 1, "last_used": 1,
+                      "model_data.algorithm": 1}
+
+
+def _expiry(timestamp, ttl):
+    # TTL indexes only expire BSON dates, so expires_at is a datetime while the other times are unix floats.
+    return datetime.fromtimestamp(timestamp + ttl, timezone.utc)
+
+
+class MongoModelStore(ModelStore):
+    """
+    Stores each model as one document in MongoDB, with parameters packed as BSON binary.
+
+    create_indexes builds, on the models collection:
+        run_id              unique; every lookup by run_id (plus access) is one index seek
+        access, run_id      per-user listings and run_id prefix searches, in run_id order
+        last_used           warm-up picks of the most recently used models
+        expires_at          TTL index: with a ttl, the server deletes models unused past it
+    and a unique (kind, user_token, key) index on the states collection.
+    """
+
+    expires_models = True
+
+    def __init__(self, uri=MONGO_URI, db_name=DB_NAME, ttl=MODEL_TTL_SECONDS):
+        self.uri = uri
+        self.db_name = db_name
+        self.ttl = ttl
+        self.pool_listener = PoolStatsListener()
+        self.client = None
+
+    async def connect(self):
+        """Creates the client in the app lifespan rather than at import; the pool connects on first use."""
+        if self.client is not None:
+            return
+        self.client = AsyncMongoClient(
+            self.uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_TIMEOUT_MS,
+            timeoutMS=MONGO_TIMEOUT_MS,
+            readPreference=MONGO_READ_PREFERENCE,
+            event_listeners=[self.pool_listener],
+        )
+        self.db = self.client[self.db_name]
+        self.models_collection = self.db[COLLECTION_NAME]
+        self.states_collection = self.db[STATE_COLLECTION_NAME]
+        # Compare-and-swap reads must see the latest version, whatever the configured read preference.
+        self.primary_models_collection = self.models_collection.with_options(read_preference=ReadPreference.PRIMARY)
+        self.primary_states_collection = self.states_collection.with_options(read_preference=ReadPreference.PRIMARY)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+    async def ping(self):
+        if self.client is None:
+            return False
+        try:
+            await self.client.admin.command("ping")
+            return True
+        except PyMongoError:
+            return False
+
+    async def create_indexes(self):
+        await self.models_collection.create_indexes([
+            IndexModel([("run_id", ASCENDING)], unique=True),
+            IndexModel([("access", ASCENDING), ("run_id", ASCENDING)]),
+            IndexModel([("last_used", DESCENDING)], sparse=True),
+            # Documents without expires_at (no ttl configured when last saved) never expire.
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ])
+        await self.states_collection.create_indexes([
+            IndexModel([("kind", ASCENDING), ("user_token", ASCENDING), ("key", ASCENDING)], unique=True),
+        ])
+
+    def pool_stats(self):
+        return self.pool_listener.stats()
+
+    def _saved(self, fields):
+        """Adds the save time, and the expiry it implies, to a $set document."""
+        now = time.time()
+        update = {"$set": {**fields, "updated_at": now}}
+        if self.ttl > 0:
+            update["$set"]["expires_at"] = _expiry(now, self.ttl)
+        else:
+            update["$unset"] = {"expires_at": ""}
+        return update
+
+    async def save_model(self, user_token, run_id, model_data):
+        update = self._saved({"model_data": encode_model_data(model_data)})
+        update.update({"$addToSet": {"access": user_token}, "$inc": {"version": 1},
+                       "$setOnInsert": {"created_at": update["$set"]["updated_at"]}})
+        await self.models_collection.update_one({"run_id": run_id}, update, upsert=True)
+
+    async def load_model(self, user_token, run_id):
+        projection = {f"model_data.{name}": 0 for name in UPDATE_ONLY_FIELDS}
+        projection.update({"_id": 0, "run_id": 0, "access": 0, "version": 0})
+        model = await self.models_collection.find_one({"run_id": run_id, "access": user_token}, projection)
+        if not model:
+            return None
+        return decode_model_data(model["model_data"])
+
+    async def load_models(self, user_token, run_ids):
+        projection = {f"model_data.{name}": 0 for name in UPDATE_ONLY_FIELDS}
+        projection.update({"_id": 0, "access": 0, "version": 0})
+        documents = self.models_collection.find({"run_id": {"$in": list(run_ids)}, "access": user_token}, projection)
+        return {document["run_id"]: decode_model_data(document["model_data"]) async for document in documents}
+
+    async def load_models_versioned(self, user_token, run_ids):
+        projection = {f"model_data.{name}": 0 for name in UPDATE_ONLY_FIELDS}
+        projection.update({"_id": 0, "access": 0})
+        documents = self.models_collection.find({"run_id": {"$in": list(run_ids)}, "access": user_token}, projection)
+        return {document["run_id"]: (decode_model_data(document["model_data"]), document.get("version", 0))
+                async for document in documents}
+
+    async def find_run_ids(self, user_token, prefix, limit):
+        # An anchored, case-sensitive regex is answered from the run_id index as a range scan.
+        documents = self.models_collection.find(
+            {"run_id": {"$regex": f"^{re.escape(prefix)}"}, "access": user_token}, {"_id": 0, "run_id": 1}
+        ).sort("run_id").limit(limit)
+        return [document["run_id"] async for document in documents]
+
+    async def touch_models(self, used):
+        if used:
+            def used_at(timestamp):
+                if self.ttl > 0:
+                    return {"last_used": timestamp, "expires_at": _expiry(timestamp, self.ttl)}
+                return {"last_used": timestamp}
+            await self.models_collection.bulk_write(
+                [UpdateOne({"run_id": run_id}, {"$max": used_at(timestamp)}) for run_id, timestamp in used.items()],
+                ordered=False)
+
+    async def hot_models(self, limit):
+        documents = self.models_collection.find(
+            {"last_used": {"$exists": True}}, {"_id": 0, "run_id": 1, "access": 1}).sort("last_used", -1).limit(limit)
+        return [(document["run_id"], document["access"]) async for document in documents]
+
+    async def list_models(self, user_token, limit, after=None):
+        query = {"access": user_token}
+        if after is not None:
+            query["run_id"] = {"$gt": after}
+        # Answered from the (access, run_id) index: a seek to `after`, then limit entries in order.
+        documents = self.models_collection.find(query, CATALOG_PROJECTION).sort("run_id").limit(limit)
+        return [_catalog_entry(document) async for document in documents]
+
+    async def delete_models(self, user_token, run_ids):
+        result = await self.models_collection.delete_many({"run_id": {"$in": list(run_ids)}, "access": user_token})
+        return result.deleted_count
+
+    async def delete_unused_models(self, user_token, before, limit):
+        # Documents written before the catalog fields existed count as unused since forever.
+        query = {"$and": [
+            {"$or": [{"updated_at": {"$lt": before}}, {"updated_at": {"$exists": False}}]},
+            {"$or": [{"last_used": {"$lt": before}}, {"last_used": {"$exists": False}}]},
+        ]}
+        if user_token is not None:
+            query["access"] = user_token
+        documents = self.models_collection.find(query, {"_id": 0, "run_id": 1}).sort("run_id").limit(limit)
+        run_ids = [document["run_id"] async for document in documents]
+        if not run_ids:
+            return []
+        # The same filter again, so a model used or saved since the scan is kept.
+        await self.models_collection.delete_many({**query, "run_id": {"$in": run_ids}})
+        remaining = self.models_collection.find({"run_id": {"$in": run_ids}}, {"_id": 0, "run_id": 1})
+        kept = {document["run_id"] async for document in remaining}
+        return [run_id for run_id in run_ids if run_id not in kept]
+
+    async def load_model_version(self, user_token, run_id):
+        model = await self.primary_models_collection.find_one({"run_id": run_id, "access": user_token}, {"model_data": 1, "version": 1})
+        if not model:
+            return None, None
+        return decode_model_data(model["model_data"]), model.get("version", 0)
+
+    async def model_versions(self, user_token, run_ids):
+        documents = self.models_collection.find({"run_id": {"$in": list(run_ids)}, "access": user_token},
+                                                {"_id": 0, "run_id": 1, "version": 1})
+        return {document["run_id"]: document.get("version", 0) async for document in documents}
+
+    async def load_model_fields(self, user_token, run_id, fields):
+        projection = {f"model_data.{name}": 1 for name in fields}
+        projection.update({"_id": 0, "model_data.format_version": 1})
+        model = await self.models_collection.find_one({"run_id": run_id, "access": user_token}, projection)
+        if not model:
+            return None
+        return decode_model_data(model.get("model_data", {}))
+
+    async def update_model_if_version(self, user_token, run_id, model_data, expected_version):
+        version_filter = {"$in": [0, None]} if expected_version == 0 else expected_version
+        result = await self.models_collection.update_one(
+            {"run_id": run_id, "access": user_token, "version": version_filter},
+            self._saved({"model_data": encode_model_data(model_data), "version": expected_version + 1})
+        )
+        return result.modified_count > 0
+
+    async def delete_model(self, user_token, run_id):
+        result = await self.models_collection.delete_one({"run_id": run_id, "access": user_token})
+        return result.deleted_count > 0
+
+    async def save_state(self, kind, user_token, key, state):
+        await self.states_collection.update_one(
+            {"kind": kind, "key": key, "user_token": user_token},
+            {"$set": {"state": encode_model_data(state, dtype="float64")}},
+            upsert=True
+        )
+
+    async def load_state(self, kind, user_token, key):
+        document = await self.primary_states_collection.find_one({"kind": kind, "key": key, "user_token": user_token}, {"state": 1})
+        if not document:
+            return None
+        return decode_model_data(document["state"])
+
+    async def delete_state(self, kind, user_token, key):
+        result = await self.states_collection.delete_one({"kind": kind, "key": key, "user_token": user_token})
+        return result.deleted_count > 0
+
+    async def migrate_models(self, batch_size=500, keep_training_data=False):
+        """Rewrites list-based model documents in the compact binary format, returns how many were migrated."""
+        migrated = 0
+        legacy = self.models_collection.find({"model_data.format_version": {"$exists": False}}, {"model_data": 1}, batch_size=batch_size)
+        async for document in legacy:
+            model_data = decode_model_data(document["model_data"])
+            if not keep_training_data:
+                model_data.pop("data_points", None)
+            await self.models_collection.update_one({"_id": document["_id"]}, {"$set": {"model_data": encode_model_data(model_data)}})
+            migrated += 1
+        return migrated
+
+
+def _catalog_entry(document):
+    return {
+        "run_id": document["run_id"],
+        "algorithm": document.get("model_data", {}).get("algorithm"),
+        "version": document.get("version", 0),
+        "created_at": document.get("created_at"),
+        "updated_at": document.get("updated_at"),
+        "last_used": document.get("last_used"),
+    }
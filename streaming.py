@@ -0,0 +1,90 @@
+"""
+        Long-lived detection streams: one authentication and one model lookup per connection.
+
+            WebSocket  /metrics/anomaly/detect/ws?user_token=&run_id=
+                text frame      a JSON array of floats (one point) or of arrays (several points)
+                                → the detect/batch JSON result
+                binary frame    a .npy file of one or more points
+                                → a structured .npy array with one field per score column
+            NDJSON     POST /metrics/anomaly/detect/stream?user_token=&run_id=
+                request body    one JSON array of floats per line, sent for as long as needed
+                response body   one detect/batch JSON result per line, for the rows received so far
+
+        The model is loaded when the stream opens and stays pinned to it, so a refit is picked up
+        by the next connection. Each frame or chunk of lines is scored as one vectorized batch,
+        and the next one is only read once its result is sent: a client that stops reading
+        results is stopped from sending by TCP flow control instead of filling server buffers.
+        A frame or chunk arriving while the compute queue is full is answered with an error record
+        carrying retry_after (seconds) instead of a result, and the stream stays open.
+"""
+import json
+import math
+
+import numpy as np
+from fastapi.responses import StreamingResponse
+
+from executor import compute_executor
+from formats import as_matrix, npy_table, read_npy
+from telemetry import Counter, GaugeCallback, registry
+
+# Close code for a refused WebSocket (bad key or no access to the model).
+POLICY_VIOLATION = 1008
+
+points_total = registry.register(Counter(
+    "anomaly_stream_points_total", "Points scored on detection streams, by transport.", ("transport",)))
+open_streams = {"websocket": 0, "ndjson": 0}
+registry.register(GaugeCallback(
+    "anomaly_open_streams", "Detection streams currently open, by transport.", ("transport",),
+    lambda: {(transport,): count for transport, count in open_streams.items()}))
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streams a response while the endpoint still reads the request body.
+
+    StreamingResponse listens on receive() for a disconnect while streaming, which would swallow
+    the body messages; here only the body reader calls receive(), and a disconnect reaches it
+    as ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def decode_frame(message):
+    """Returns the (n, d) points of a WebSocket message and whether it was a binary frame."""
+    if message.get("bytes") is not None:
+        decoded = read_npy(message["bytes"])
+        if decoded.ndim == 1 and not decoded.dtype.names:
+            decoded = decoded[np.newaxis]
+        return as_matrix(decoded), True
+    points = np.asarray(json.loads(message["text"]), dtype=float)
+    if points.ndim == 1:
+        points = points[np.newaxis]
+    if points.ndim != 2:
+        raise ValueError("Dimension mismatch")
+    return points, False
+
+
+async def send_result(websocket, result, binary):
+    """Answers one scored frame; binary replies carry the score columns without the summary."""
+    if binary:
+        await websocket.send_bytes(npy_table(result["results"]))
+    else:
+        await websocket.send_text(json.dumps(result))
+
+
+async def send_error(websocket, detail):
+    """Reports a frame that could not be scored; the stream stays open."""
+    await websocket.send_text(json.dumps({"error": detail}))
+
+
+def overloaded_error():
+    """The error record of a frame or chunk turned away by a full compute queue, with the seconds to back off."""
+    return {"error": "Server overloaded, retry later", "retry_after": max(1, math.ceil(compute_executor.wait))}
+
+
+def ndjson_line(result):
+    return json.dumps(result).encode() + b"\n"
@@ -0,0 +1,233 @@
+"""
+        Prometheus-style metrics with per-stage request timing.
+
+        Metrics are plain in-process counters and fixed-bucket histograms rendered in the
+        Prometheus text exposition format by GET /metrics; no client library is needed.
+
+        Every request gets a stage timer (a contextvar) from MetricsMiddleware. Code on the
+        request path wraps its work in `with stage("db"):` / `stage("compute")`, and when the
+        response is sent the accumulated time per stage is observed into
+        anomaly_request_stage_seconds{route, stage}. The "serialize" stage is the time FastAPI
+        spends outside the endpoint: request validation plus response encoding.
+
+        An observation costs two perf_counter calls, a bisect and a short lock, so the
+        instrumentation is cheap enough to leave on in production.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            snapshot = {labels: ([*counts], total, count) for labels, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                bucket_labels = _labels((*self.labelnames, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauges read at scrape time from a callback returning {labels tuple: value}."""
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in self.callback().items()]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "anomaly_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+request_seconds = registry.register(Histogram(
+    "anomaly_request_seconds", "End-to-end request latency.", ("route",)))
+stage_seconds = registry.register(Histogram(
+    "anomaly_request_stage_seconds", "Time spent per request stage (auth, db, compute, compute_queue, coalesce, serialize).", ("route", "stage")))
+request_bytes = registry.register(Histogram(
+    "anomaly_request_bytes", "Request body size.", ("route",), SIZE_BUCKETS))
+response_bytes = registry.register(Histogram(
+    "anomaly_response_bytes", "Response body size.", ("route",), SIZE_BUCKETS))
+
+_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def add_stage_time(name, seconds):
+    """Adds time to a stage of the current request; a no-op outside a request."""
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(name, time.perf_counter() - start)
+
+
+class TimedRoute(APIRoute):
+    """Measures how long FastAPI spends around the endpoint, recorded as the "serialize" stage."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            stages = _stages.get()
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                if stages is not None:
+                    elapsed = time.perf_counter() - start
+                    inside = stages.get("endpoint", 0.0) + stages.get("auth", 0.0)
+                    stages["serialize"] = stages.get("serialize", 0.0) + elapsed - inside
+
+        return timed_handler
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+def _timed_endpoint(endpoint):
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            with stage("endpoint"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            with stage("endpoint"):
+                return endpoint(*args, **kwargs)
+    return timed
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency, payload sizes and per-stage timings."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stages = {}
+        token = _stages.set(stages)
+        start = time.perf_counter()
+        status = [500]
+        sent = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sent[0] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _stages.reset(token)
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            requests_total.inc(route, scope["method"], status[0])
+            request_seconds.observe(elapsed, route)
+            response_bytes.observe(sent[0], route)
+            for name, value in scope.get("headers", ()):
+                if name == b"content-length":
+                    request_bytes.observe(int(value), route)
+                    break
+            stages.pop("endpoint", None)
+            for name, seconds in stages.items():
+                stage_seconds.observe(seconds, route, name)
@@ -0,0 +1,39 @@
+import os
+
+# Exercise services and routes against the in-memory backend instead of MongoDB.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import db
+from app import app
+from cache import model_cache
+
+
+@pytest.fixture
+def store():
+    db.store.clear()
+    model_cache.clear()
+    yield db.store
+    db.store.clear()
+    model_cache.clear()
+
+
+@pytest.fixture
+def loads(store, monkeypatch):
+    """Records every run_id the services fetch from the store."""
+    calls = []
+    load_models_versioned = store.load_models_versioned
+
+    async def counting_load_models_versioned(user_token, run_ids):
+        calls.extend(run_ids)
+        return await load_models_versioned(user_token, run_ids)
+
+    monkeypatch.setattr(store, "load_models_versioned", counting_load_models_versioned)
+    return calls
+
+
+@pytest.fixture
+def client(store):
+    return TestClient(app)
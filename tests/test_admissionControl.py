@@ -0,0 +1,110 @@
+import json
+import time
+
+import numpy as np
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import admission
+from admission import RateLimiter, TokenBucket
+from executor import compute_executor, fit_executor
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(23)
+
+
+def fit(client, user_token, rows=50):
+    return client.post("/metrics/anomaly/fit", headers=HEADERS,
+                       json={"user_token": user_token, "run_id": "adm", "training_data": RNG.normal(size=(rows, 2)).tolist()})
+
+
+def detect_batch(client, rows):
+    return client.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                       json={"user_token": 1, "run_id": "adm", "values": RNG.normal(size=(rows, 2)).tolist()})
+
+
+def test_token_buckets_refill_and_forget_old_tenants(monkeypatch):
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.1, abs=0.01)
+    monkeypatch.setattr(time, "monotonic", lambda: bucket.updated + 0.1)
+    assert bucket.take() == 0
+
+    limiter = RateLimiter(rate=1, burst=1, max_tenants=2)
+    assert limiter.acquire("a") == 0 and limiter.acquire("b") == 0 and limiter.acquire("c") == 0
+    assert list(limiter._buckets) == ["b", "c"]
+    assert limiter.acquire("c") > 0
+    assert RateLimiter(rate=0, burst=0).acquire("a") == 0
+
+
+def test_fits_are_rate_limited_per_tenant_apart_from_detections(client, monkeypatch):
+    monkeypatch.setattr(admission.lanes["fit"], "limiter", RateLimiter(rate=0.01, burst=2))
+    assert fit(client, 1).status_code == 200 and fit(client, 1).status_code == 200
+    limited = fit(client, 1)
+    assert limited.status_code == 429 and int(limited.headers["Retry-After"]) >= 1
+    # Other tenants and the detect lane keep their own budgets.
+    assert fit(client, 2).status_code == 200
+    assert detect_batch(client, 5).status_code == 200
+    # A user_token in the query string names the same tenant as one in the body.
+    streamed = client.post("/metrics/anomaly/fit/session", headers=HEADERS, params={"user_token": 1}, json={"user_token": 1})
+    assert streamed.status_code == 429
+
+
+def test_payload_and_row_limits(client, monkeypatch):
+    fit(client, 1)
+    monkeypatch.setattr(admission.lanes["detect"], "max_rows", 10)
+    too_many = detect_batch(client, 11)
+    assert too_many.status_code == 413 and too_many.json()["detail"] == "Too many rows, at most 10 per request"
+    assert detect_batch(client, 10).status_code == 200
+
+    monkeypatch.setattr(admission.lanes["fit"], "max_body_bytes", 1000)
+    assert fit(client, 1, rows=100).status_code == 413
+    assert fit(client, 1, rows=5).status_code == 200
+
+
+def test_load_is_shed_per_lane_with_retry_after(client, monkeypatch):
+    fit(client, 1)
+    monkeypatch.setattr(fit_executor, "in_flight", fit_executor.max_workers + fit_executor.max_queued)
+    shed = fit(client, 1)
+    assert shed.status_code == 503 and shed.headers["Retry-After"] == "1"
+    assert detect_batch(client, 5).status_code == 200
+
+    # Queued detections waiting past the target are shed too, with the current wait as the hint.
+    monkeypatch.setattr(compute_executor, "in_flight", compute_executor.max_workers + 1)
+    monkeypatch.setattr(compute_executor, "wait_target", 0.5)
+    monkeypatch.setattr(compute_executor, "wait", 2.5)
+    shed = detect_batch(client, 5)
+    assert shed.status_code == 503 and shed.headers["Retry-After"] == "3"
+    assert client.get("/healthz").status_code == 200
+
+    exported = client.get("/metrics").text
+    assert 'anomaly_admission_rejected_total{lane="detect",reason="queue_wait"}' in exported
+    assert 'anomaly_admission_queue{lane="fit",stat="queued"}' in exported
+
+
+def test_websocket_handshakes_and_frames_are_admitted_per_tenant(client, monkeypatch):
+    fit(client, 1)
+    monkeypatch.setattr(admission.lanes["detect"], "limiter", RateLimiter(rate=0.01, burst=3))
+    monkeypatch.setattr(admission.lanes["detect"], "max_rows", 10)
+    url = "/metrics/anomaly/detect/ws?user_token=1&run_id=adm"
+    with client.websocket_connect(url, headers=HEADERS) as ws:
+        ws.send_text(json.dumps(RNG.normal(size=(11, 2)).tolist()))
+        assert ws.receive_json() == {"error": "Too many rows, at most 10 per request"}
+        # The handshake took the first token and each frame takes one more.
+        ws.send_text(json.dumps(RNG.normal(size=(5, 2)).tolist()))
+        assert ws.receive_json()["summary"]["count"] == 5
+        ws.send_text(json.dumps(RNG.normal(size=(5, 2)).tolist()))
+        assert ws.receive_json()["summary"]["count"] == 5
+        ws.send_text(json.dumps(RNG.normal(size=(5, 2)).tolist()))
+        limited = ws.receive_json()
+        assert limited["error"] == "Rate limit exceeded" and limited["retry_after"] >= 1
+
+    for limiter, in_flight in ((RateLimiter(rate=0.01, burst=0), 0),
+                               (RateLimiter(rate=0, burst=0), compute_executor.max_workers + compute_executor.max_queued)):
+        monkeypatch.setattr(admission.lanes["detect"], "limiter", limiter)
+        monkeypatch.setattr(compute_executor, "in_flight", in_flight)
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with client.websocket_connect(url, headers=HEADERS) as ws:
+                ws.receive_text()
+        assert refused.value.code == admission.TRY_AGAIN_LATER
+    assert 'anomaly_admission_rejected_total{lane="detect",reason="queue_full"}' in client.get("/metrics").text
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from executor import ComputeExecutor, ComputeOverloaded, fit_executor
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+
+
+def test_executor_runs_work_off_the_event_loop():
+    executor = ComputeExecutor(max_workers=2, max_queued=0)
+
+    async def main():
+        return await executor.run(threading.current_thread), threading.current_thread()
+
+    worker, loop_thread = asyncio.run(main())
+    assert worker is not loop_thread
+    assert executor.in_flight == 0
+
+
+def test_executor_rejects_work_beyond_its_queue():
+    executor = ComputeExecutor(max_workers=1, max_queued=1)
+    release = threading.Event()
+
+    async def main():
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ComputeOverloaded):
+            await executor.run(int)
+        assert executor.queued == 1
+        release.set()
+        await asyncio.gather(*blocked)
+
+    asyncio.run(main())
+
+
+def test_cancelled_callers_keep_their_slot_until_the_job_ends():
+    executor = ComputeExecutor(max_workers=1, max_queued=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        waiting = asyncio.ensure_future(executor.run(int))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        waiting.cancel()
+        await asyncio.sleep(0.05)
+        # The queued job is dropped, the running one still holds its thread.
+        assert executor.in_flight == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_overloaded_executor_sheds_with_503(client, monkeypatch):
+    monkeypatch.setattr(fit_executor, "max_workers", 0)
+    monkeypatch.setattr(fit_executor, "max_queued", 0)
+
+    response = client.post("/metrics/anomaly/fit", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "busy", "training_data": [[1, 2], [2, 3], [3, 5]]})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
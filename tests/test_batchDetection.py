@@ -0,0 +1,52 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from metrics.anomaly.anomaly import AnomalyMetric
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+TRAINING_DATA = [[10, 20, 30], [15, 25, 35], [12, 22, 32]]
+
+
+@pytest.fixture
+def model_data():
+    return AnomalyMetric().fit(TRAINING_DATA)
+
+
+def test_batch_matches_single_point_detection(model_data):
+    metric = AnomalyMetric()
+    points = [[11, 21, 31], [500, 600, 700], [12, 22, 32]]
+
+    batch = metric.detect_batch(points, model_data)
+
+    for i, point in enumerate(points):
+        single = metric.detect(point, model_data)
+        for name, value in single.items():
+            assert batch["results"][name][i] == pytest.approx(value)
+
+
+def test_batch_summary_counts_anomalies(model_data):
+    batch = AnomalyMetric().detect_batch([[11, 21, 31], [500, 600, 700]], model_data)
+
+    assert batch["summary"]["count"] == 2
+    assert batch["summary"]["anomalies"] == 1
+    assert batch["summary"]["anomaly_indices"] == [1]
+    assert batch["summary"]["anomaly_rate"] == 0.5
+
+
+def test_batch_dimension_mismatch(model_data):
+    assert AnomalyMetric().detect_batch([[1, 2]], model_data) == "Dimension mismatch"
+    assert AnomalyMetric().detect_batch([[1, 2, 3], [1, 2]], model_data) == "Dimension mismatch"
+
+
+def test_batch_endpoint_loads_model_once(model_data, store, loads, client):
+    asyncio.run(store.save_model(1234, "batch", model_data))
+
+    values = np.tile([11.0, 21.0, 31.0], (1000, 1)).tolist()
+    response = client.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                           json={"user_token": 1234, "run_id": "batch", "values": values})
+
+    assert response.status_code == 200, response.text
+    assert len(response.json()["results"]["anomaly_detected"]) == 1000
+    assert loads == ["batch"]
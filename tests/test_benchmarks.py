@@ -0,0 +1,22 @@
+from benchmarks.bench import compare, run
+
+TINY_SWEEP = {"dims": [3], "rows": [200], "batch_sizes": [1, 50], "concurrency": [2], "repeats": 2}
+
+
+def test_tiny_sweep_reports_every_layer(store):
+    report = run(TINY_SWEEP)
+
+    names = {result["name"] for result in report["results"]}
+    assert {"metric.fit", "metric.detect_batch", "service.detect", "api.detect", "api.detect_batch"} <= names
+    for result in report["results"]:
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["rows_per_sec"] > 0
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    def report(p95_ms, rows_per_sec):
+        return {"results": [{"name": "api.detect", "params": {"dim": 3}, "p95_ms": p95_ms, "rows_per_sec": rows_per_sec}]}
+
+    assert compare(report(1.1, 950), report(1.0, 1000), tolerance=0.25) == []
+    assert len(compare(report(2.0, 1000), report(1.0, 1000), tolerance=0.25)) == 1
+    assert len(compare(report(1.0, 500), report(1.0, 1000), tolerance=0.25)) == 1
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app import app
+from cache import model_cache
+from routes import anomaly_service
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+
+
+def test_importing_the_app_leaves_scipy_for_later():
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, app; print(' '.join(sorted(sys.modules)))"],
+        capture_output=True, text=True, check=True, env={"STORAGE_BACKEND": "memory"},
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.split()
+    assert "numpy" in loaded
+    assert not [name for name in loaded if name.startswith(("scipy", "sklearn", "pandas"))]
+
+
+def test_probes_report_ready_after_startup(store):
+    with TestClient(app) as client:
+        assert client.get("/healthz").json() == {"status": "alive"}
+        ready = client.get("/readyz")
+        assert ready.status_code == 200
+        assert ready.json()["status"] == "ready" and ready.json()["store"] is True
+
+
+def test_warm_up_loads_the_most_recently_used_models(client, store):
+    for run_id in ("cold", "warm"):
+        client.post("/metrics/anomaly/fit", headers=HEADERS,
+                    json={"user_token": 1, "run_id": run_id, "training_data": [[1, 2], [2, 3], [3, 5]]})
+    client.post("/metrics/anomaly/detect", headers=HEADERS, json={"user_token": 1, "run_id": "warm", "values": [2, 3]})
+    asyncio.run(anomaly_service.flush_last_used())
+    assert "last_used" in store.models["warm"] and "last_used" not in store.models["cold"]
+
+    model_cache.clear()
+    assert asyncio.run(anomaly_service.warm_up(5)) == 1
+    assert model_cache.get(1, "warm") is not None and model_cache.get(1, "cold") is None
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy.spatial.distance import mahalanobis
+from sklearn.covariance import ledoit_wolf
+
+from metrics.anomaly.anomaly import AnomalyMetric, ledoit_wolf_covariance, mahalanobis_threshold
+
+rng = np.random.default_rng(0)
+CORRELATED = rng.normal(size=(500, 2)) @ np.array([[1.0, 0.95], [0.0, 0.3]])
+
+
+def test_mahalanobis_matches_training_covariance():
+    model = AnomalyMetric().fit(CORRELATED.tolist())
+    point = [0.5, -0.5]
+
+    expected = mahalanobis(point, CORRELATED.mean(axis=0), np.linalg.inv(np.cov(CORRELATED, rowvar=False)))
+    assert AnomalyMetric().detect(point, model)["mahalanobis_distance"] == pytest.approx(expected)
+
+
+def test_point_breaking_correlation_is_flagged():
+    model = AnomalyMetric().fit(CORRELATED.tolist())
+    result = AnomalyMetric().detect([1.0, -1.0], model)
+
+    assert result["z_score_anomaly"] < 3
+    assert result["anomaly_detected"] is True
+
+
+def test_ledoit_wolf_matches_sklearn():
+    data = rng.normal(size=(20, 40))
+    expected, _ = ledoit_wolf(data)
+    centered = data - data.mean(axis=0)
+    fourth_moment = np.sum(np.square(np.sum(centered ** 2, axis=1)))
+    assert np.allclose(ledoit_wolf_covariance(len(data), centered.T @ centered, fourth_moment), expected)
+
+
+def test_ledoit_wolf_fit_handles_more_features_than_rows():
+    data = rng.normal(size=(10, 50))
+    model = AnomalyMetric().fit(data.tolist(), covariance="ledoit_wolf")
+
+    assert np.all(np.isfinite(model["precision_cholesky"]))
+    assert AnomalyMetric().detect(data[0], model)["mahalanobis_distance"] < model["mahalanobis_threshold"]
+
+
+def test_legacy_model_without_covariance_uses_diagonal():
+    legacy = {"means": [10.0, 20.0], "stds": [2.0, 4.0]}
+    assert AnomalyMetric().detect([12, 24], legacy)["mahalanobis_distance"] == pytest.approx(np.sqrt(2))
+
+
+def test_threshold_is_three_sigma_in_one_dimension():
+    assert mahalanobis_threshold(1) == pytest.approx(3)
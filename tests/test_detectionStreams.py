@@ -0,0 +1,101 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from cache import model_cache
+from executor import compute_executor
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(11)
+
+
+@pytest.fixture
+def fitted(client):
+    client.post("/metrics/anomaly/fit", headers=HEADERS,
+                json={"user_token": 1, "run_id": "stream", "training_data": RNG.normal(size=(300, 3)).tolist()})
+    return client
+
+
+def npy(array):
+    stream = io.BytesIO()
+    np.save(stream, array)
+    return stream.getvalue()
+
+
+def test_websocket_scores_text_and_binary_frames_with_one_model_load(fitted, loads):
+    points = RNG.normal(size=(5, 3))
+    expected = fitted.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "stream", "values": points.tolist()}).json()
+    model_cache.clear()
+    loads.clear()
+
+    with fitted.websocket_connect("/metrics/anomaly/detect/ws?user_token=1&run_id=stream", headers=HEADERS) as ws:
+        ws.send_text(json.dumps(points.tolist()))
+        assert ws.receive_json() == expected
+        ws.send_text(json.dumps(points[0].tolist()))
+        assert ws.receive_json()["summary"]["count"] == 1
+
+        ws.send_bytes(npy(points))
+        table = np.load(io.BytesIO(ws.receive_bytes()))
+        assert np.allclose(table["mahalanobis_distance"], expected["results"]["mahalanobis_distance"])
+        assert table["anomaly_detected"].tolist() == expected["results"]["anomaly_detected"]
+
+        ws.send_text(json.dumps([[1.0, 2.0]]))
+        assert ws.receive_json() == {"error": "Dimension mismatch"}
+        ws.send_bytes(b"not a npy file")
+        assert ws.receive_json() == {"error": "Invalid data format."}
+    # The model is loaded once at the handshake and pinned for every frame.
+    assert loads == ["stream"]
+
+
+def test_websocket_refuses_bad_keys_foreign_models_and_bad_parameters(fitted):
+    for headers, query in ((HEADERS, "user_token=2&run_id=stream"), ({"X-API-Key": "wrong"}, "user_token=1&run_id=stream"),
+                           (HEADERS, "user_token=1&run_id=stream&explain_top_k=-1")):
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with fitted.websocket_connect(f"/metrics/anomaly/detect/ws?{query}", headers=headers) as ws:
+                ws.receive_text()
+        assert refused.value.code == 1008
+
+
+def test_ndjson_stream_answers_per_chunk(fitted):
+    points = RNG.normal(size=(4, 3))
+    body = b"".join(json.dumps(row).encode() + b"\n" for row in points.tolist())
+    response = fitted.post("/metrics/anomaly/detect/stream", params={"user_token": 1, "run_id": "stream"},
+                           headers={**HEADERS, "content-type": "application/x-ndjson"}, content=body + b"[1, 2\n")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # The test client sends the body in one piece, so the valid rows and the broken one share a chunk.
+    assert lines == [{"error": "Invalid NDJSON row"}]
+
+    response = fitted.post("/metrics/anomaly/detect/stream", params={"user_token": 1, "run_id": "stream"},
+                           headers={**HEADERS, "content-type": "application/x-ndjson"}, content=body)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sum(line["summary"]["count"] for line in lines) == 4
+
+    missing = fitted.post("/metrics/anomaly/detect/stream", params={"user_token": 2, "run_id": "stream"},
+                          headers={**HEADERS, "content-type": "application/x-ndjson"}, content=body)
+    assert missing.status_code == 403
+
+
+def test_streams_report_a_full_compute_queue_per_frame_and_stay_open(fitted, monkeypatch):
+    points = RNG.normal(size=(5, 3))
+    full = compute_executor.max_workers + compute_executor.max_queued
+    with fitted.websocket_connect("/metrics/anomaly/detect/ws?user_token=1&run_id=stream", headers=HEADERS) as ws:
+        monkeypatch.setattr(compute_executor, "in_flight", full)
+        ws.send_text(json.dumps(points.tolist()))
+        assert ws.receive_json() == {"error": "Server overloaded, retry later", "retry_after": 1}
+        monkeypatch.setattr(compute_executor, "in_flight", 0)
+        ws.send_text(json.dumps(points.tolist()))
+        assert ws.receive_json()["summary"]["count"] == 5
+
+    # The stream was admitted before the queue filled up, so every chunk is turned away on its own.
+    monkeypatch.setattr(compute_executor, "overloaded", lambda: None)
+    monkeypatch.setattr(compute_executor, "in_flight", full)
+    body = b"".join(json.dumps(row).encode() + b"\n" for row in points.tolist())
+    response = fitted.post("/metrics/anomaly/detect/stream", params={"user_token": 1, "run_id": "stream"},
+                           headers={**HEADERS, "content-type": "application/x-ndjson"}, content=body)
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"error": "Server overloaded, retry later", "retry_after": 1}]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from metrics.anomaly import DETECTORS, get_detector
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(0)
+# Student-t with 3 degrees of freedom: heavy tails that a Gaussian model flags far too often.
+TRAINING = RNG.standard_t(3, size=(5000, 4))
+HELD_OUT = RNG.standard_t(3, size=(5000, 4))
+OUTLIERS = np.full((20, 4), 60.0)
+
+
+@pytest.mark.parametrize("algorithm", ["robust", "hbos", "isolation_forest"])
+def test_calibrated_detectors_keep_false_positives_near_contamination(algorithm):
+    detector = get_detector(algorithm)
+    model = detector.prepare(detector.fit(TRAINING, contamination=0.01))
+    gaussian = get_detector("gaussian")
+    gaussian_model = gaussian.prepare(gaussian.fit(TRAINING))
+
+    rate = detector.detect_batch(HELD_OUT, model)["summary"]["anomaly_rate"]
+    assert rate < 0.02
+    assert gaussian.detect_batch(HELD_OUT, gaussian_model)["summary"]["anomaly_rate"] > 2 * rate
+    assert detector.detect_batch(OUTLIERS, model)["summary"]["anomalies"] == len(OUTLIERS)
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        get_detector("svm")
+
+
+@pytest.mark.parametrize("algorithm", sorted(DETECTORS))
+def test_every_algorithm_behind_the_same_endpoints(client, store, algorithm):
+    body = {"user_token": 1, "run_id": algorithm, "training_data": TRAINING[:1000].tolist(), "algorithm": algorithm}
+    assert client.post("/metrics/anomaly/fit", headers=HEADERS, json=body).status_code == 200
+
+    single = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                         json={"user_token": 1, "run_id": algorithm, "values": OUTLIERS[0].tolist()}).json()["result"]
+    assert single["anomaly_detected"] is True
+    batch = client.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                        json={"user_token": 1, "run_id": algorithm, "values": OUTLIERS[:3].tolist()}).json()
+    assert batch["summary"]["anomalies"] == 3
+
+
+def test_models_of_different_algorithms_fan_out_together(client, store):
+    for algorithm in ("gaussian", "hbos"):
+        client.post("/metrics/anomaly/fit", headers=HEADERS,
+                    json={"user_token": 1, "run_id": f"host-{algorithm}", "training_data": TRAINING[:500].tolist(),
+                          "algorithm": algorithm})
+    result = client.post("/metrics/anomaly/detect/many", headers=HEADERS,
+                         json={"user_token": 1, "run_id_prefix": "host-", "values": OUTLIERS[:1].tolist()}).json()
+    assert sorted(result["anomalous_run_ids"]) == ["host-gaussian", "host-hbos"]
+    assert "anomaly_score" in result["results"]["host-hbos"]
+
+
+def test_non_gaussian_models_are_refit_not_updated(client, store):
+    client.post("/metrics/anomaly/fit", headers=HEADERS,
+                json={"user_token": 1, "run_id": "iforest", "training_data": TRAINING[:500].tolist(),
+                      "algorithm": "isolation_forest"})
+    response = client.post("/metrics/anomaly/update", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "iforest", "training_data": TRAINING[:10].tolist()})
+    assert response.status_code == 400
+    assert store.models["iforest"]["model_data"]["algorithm"] == "isolation_forest"
@@ -0,0 +1,90 @@
+import asyncio
+
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp
+
+from metrics.drift.drift import DriftMetric, ks_statistics
+from storage.file import FileModelStore
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+TRAINING = np.random.default_rng(0).normal(loc=[0, 10, 0], scale=[1, 2, 1], size=(4000, 3))
+TRAINING[:, 2] = np.round(TRAINING[:, 2])
+
+
+def test_vectorized_ks_matches_scipy_with_ties():
+    new_data = np.random.default_rng(1).normal(loc=[0.2, 10, 0], scale=[1, 3, 1], size=(500, 3))
+    new_data[:, 2] = np.round(new_data[:, 2])
+    expected = [ks_2samp(TRAINING[:, i], new_data[:, i]).statistic for i in range(3)]
+    assert np.allclose(ks_statistics(TRAINING, new_data), expected)
+
+    metric = DriftMetric()
+    legacy = [ks_2samp(TRAINING[:, i], new_data[:, i], method="asymp").pvalue for i in range(3)]
+    assert np.allclose(metric.check(TRAINING, new_data)["p_values"], legacy)
+
+
+def test_chunked_sketch_tracks_the_exact_quantiles():
+    metric = DriftMetric()
+    sketch = metric.sketch()
+    for chunk in np.array_split(TRAINING, 25):
+        sketch.update(chunk)
+
+    exact = metric.sketch(TRAINING)
+    assert sketch.count == len(TRAINING)
+    assert np.median(np.abs(sketch.points - exact.points)) < 0.05
+    assert np.allclose(metric.baseline(exact)["histogram"].sum(axis=0), 1.0)
+
+
+def test_drift_route_flags_only_the_shifted_feature(client):
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "run_id": "d", "training_data": TRAINING.tolist()})
+
+    batch = np.random.default_rng(2).normal(loc=[0, 10, 0], scale=[1, 2, 1], size=(800, 3))
+    batch[:, 2] = np.round(batch[:, 2])
+    batch[:, 1] += 3
+    result = client.post("/metrics/drift/compute", headers=HEADERS, json={"user_token": 1, "run_id": "d", "values": batch.tolist()}).json()
+    assert result["drifted_features"] == [1]
+    assert result["js_divergence"][1] > result["js_divergence"][0]
+
+    # Online updates keep comparing against the original training distribution.
+    client.post("/metrics/anomaly/update", headers=HEADERS, json={"user_token": 1, "run_id": "d", "training_data": batch.tolist()})
+    again = client.post("/metrics/drift/compute", headers=HEADERS, json={"user_token": 1, "run_id": "d", "values": batch.tolist()}).json()
+    assert again["ks_statistic"] == pytest.approx(result["ks_statistic"])
+
+    assert client.post("/metrics/drift/compute", headers=HEADERS, json={"user_token": 2, "run_id": "d", "values": batch.tolist()}).status_code == 403
+    assert client.post("/metrics/drift/compute", headers=HEADERS, json={"user_token": 1, "run_id": "d", "values": [[1.0]]}).status_code == 400
+
+
+def test_fit_session_stores_a_baseline(client):
+    session_id = client.post("/metrics/anomaly/fit/session", headers=HEADERS, json={"user_token": 1, "run_id": "s"}).json()["session_id"]
+    for chunk in np.array_split(TRAINING, 4):
+        client.post(f"/metrics/anomaly/fit/session/{session_id}/chunk", headers=HEADERS, json={"user_token": 1, "training_data": chunk.tolist()})
+    client.post(f"/metrics/anomaly/fit/session/{session_id}/finalize", headers=HEADERS, json={"user_token": 1})
+
+    result = client.post("/metrics/drift/compute", headers=HEADERS, json={"user_token": 1, "run_id": "s", "values": TRAINING[:500].tolist()}).json()
+    assert result["drift_detected"] is False
+
+
+def test_file_store_loads_only_the_requested_fields(tmp_path):
+    store = FileModelStore(str(tmp_path))
+    model = {"means": np.zeros(3), "drift_baseline": {"n_samples": 10.0, "quantiles": np.ones((4, 3))}}
+
+    async def main():
+        await store.connect()
+        await store.save_model(1, "f", model)
+        return await store.load_model_fields(1, "f", ("drift_baseline",)), await store.load_model_fields(2, "f", ("drift_baseline",))
+
+    fields, denied = asyncio.run(main())
+    assert set(fields) == {"drift_baseline"}
+    assert np.array_equal(fields["drift_baseline"]["quantiles"], np.ones((4, 3)))
+    assert denied is None
+
+
+def test_large_healthy_batches_are_not_flagged_for_the_sketch_error():
+    rng = np.random.default_rng(4)
+    metric = DriftMetric()
+    baseline = metric.baseline(metric.sketch(rng.normal(size=(200_000, 2))))
+    # As if the model had been fitted on millions of rows: the sketch still holds only its few hundred points.
+    baseline["n_samples"] = 5_000_000
+    result = metric.compare(baseline, rng.normal(size=(1_000_000, 2)))
+    assert result["drift_detected"] is False
+    assert metric.compare(baseline, rng.normal(loc=[0.5, 0], size=(1_000_000, 2)))["drifted_features"] == [0]
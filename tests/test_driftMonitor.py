@@ -0,0 +1,52 @@
+import numpy as np
+
+from metrics.drift.drift import DriftMetric, ks_statistics
+from metrics.drift.monitor import DriftMonitor
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+TRAINING = np.random.default_rng(0).normal(size=(4000, 2))
+
+
+def test_window_statistics_match_a_batch_comparison():
+    metric = DriftMetric()
+    baseline = metric.baseline(metric.sketch(TRAINING))
+    monitor = DriftMonitor(baseline, window=300, p_value=0.05, js_threshold=0.1, min_points=100)
+    stream = np.random.default_rng(1).normal(loc=[0, 0.5], size=(1000, 2))
+    for chunk in np.array_split(stream, 37):
+        monitor.observe(chunk)
+
+    status = monitor.status()
+    expected = metric.compare(baseline, stream[-300:])
+    assert np.allclose(status["ks_statistic"], ks_statistics(baseline["quantiles"], stream[-300:]))
+    assert np.allclose(status["js_divergence"], expected["js_divergence"])
+    assert status["drifted_features"] == expected["drifted_features"] == [1]
+
+    restored = DriftMonitor(baseline, 300, 0.05, 0.1, 100).restore(monitor.to_state())
+    assert restored.status() == status
+
+
+def test_detect_requests_feed_the_registered_monitor(client):
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "run_id": "m", "training_data": TRAINING.tolist()})
+    response = client.post("/metrics/drift/monitor", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "m", "window": 400, "min_points": 200})
+    assert response.status_code == 200
+
+    rng = np.random.default_rng(2)
+    batch = client.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                        json={"user_token": 1, "run_id": "m", "values": rng.normal(size=(300, 2)).tolist()})
+    assert batch.json()["summary"]["drift_detected"] is False
+
+    for point in rng.normal(loc=[3, 0], size=(250, 2)).tolist():
+        result = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                             json={"user_token": 1, "run_id": "m", "values": point}).json()["result"]
+    assert result["drift_detected"] is True
+
+    status = client.get("/metrics/drift/monitor/1/m", headers=HEADERS).json()
+    assert status["points"] == 400 and status["observed"] == 550
+    assert status["drifted_features"] == [0]
+
+    assert client.delete("/metrics/drift/monitor/1/m", headers=HEADERS).status_code == 200
+    assert client.get("/metrics/drift/monitor/1/m", headers=HEADERS).status_code == 404
+    result = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                         json={"user_token": 1, "run_id": "m", "values": [0.0, 0.0]}).json()["result"]
+    assert "drift_detected" not in result
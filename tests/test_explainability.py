@@ -0,0 +1,67 @@
+import io
+
+import numpy as np
+
+from metrics.anomaly.anomaly import AnomalyMetric
+from metrics.explainability.explainability import top_k
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(0)
+
+
+def test_mahalanobis_contributions_add_up_to_the_squared_distance():
+    mixing = RNG.normal(size=(6, 6))
+    detector = AnomalyMetric()
+    model = detector.prepare(detector.fit(RNG.normal(size=(500, 6)) @ mixing))
+    points = RNG.normal(scale=1.5, size=(40, 6)) @ mixing
+
+    explained = detector.detect_batch(points, model, as_arrays=True, top_k=6)["results"]
+    flagged = explained["anomaly_detected"]
+    assert 0 < flagged.sum() < len(points)
+    assert np.allclose(explained["top_contributions"][flagged].sum(axis=1), explained["mahalanobis_distance"][flagged] ** 2)
+    assert np.all(np.diff(explained["top_contributions"], axis=1) <= 0)
+    # Only flagged rows of a batch are explained.
+    assert np.all(explained["top_features"][~flagged] == -1)
+
+
+def test_top_k_matches_a_full_sort_on_wide_rows():
+    contributions = RNG.normal(size=(50, 300))
+    features, values = top_k(contributions, 5)
+    expected = np.argsort(-contributions, axis=1)[:, :5]
+    assert np.array_equal(features, expected)
+    assert np.array_equal(values, np.take_along_axis(contributions, expected, axis=1))
+
+
+def test_detect_explains_the_deviating_feature(client, store):
+    training_data = RNG.normal(size=(300, 8))
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "run_id": "wide", "training_data": training_data.tolist()})
+    point = np.zeros(8)
+    point[5] = 9.0
+
+    result = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                         json={"user_token": 1, "run_id": "wide", "values": point.tolist(), "explain_top_k": 3}).json()["result"]
+    assert result["anomaly_detected"] is True
+    assert result["top_features"][0] == 5 and len(result["top_features"]) == 3
+    assert result["top_z_scores"][0] > 8
+
+    plain = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                        json={"user_token": 1, "run_id": "wide", "values": point.tolist()}).json()["result"]
+    assert "top_features" not in plain
+
+    response = client.post("/metrics/anomaly/detect/batch", headers={**HEADERS, "Accept": "application/x-npy"},
+                           json={"user_token": 1, "run_id": "wide", "values": [point.tolist()] * 4, "explain_top_k": 2})
+    table = np.load(io.BytesIO(response.content))
+    assert table["top_features"].shape == (4, 2) and np.all(table["top_features"][:, 0] == 5)
+
+
+def test_unexplained_detectors_and_importance_ranking(client, store):
+    client.post("/metrics/anomaly/fit", headers=HEADERS,
+                json={"user_token": 1, "run_id": "forest", "training_data": RNG.normal(size=(300, 3)).tolist(),
+                      "algorithm": "isolation_forest"})
+    response = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "forest", "values": [0, 0, 0], "explain_top_k": 2})
+    assert response.status_code == 400
+
+    ranked = client.post("/metrics/explainability/compute", headers=HEADERS,
+                         json={"feature_importances": [0.1, 0.7, 0.2], "top_k": 2}).json()
+    assert ranked == {"importance_rank": [[1, 0.7], [2, 0.2]]}
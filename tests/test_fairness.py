@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from metrics.fairness.fairness import FairnessMetric, encode_groups
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+
+
+def reference_rates(predictions, actuals, groups, label):
+    rows = groups == label
+    p, a = predictions[rows], actuals[rows]
+    return {
+        "selection_rate": np.mean(p == 1),
+        "TPR": np.sum((p == 1) & (a == 1)) / np.sum(a == 1),
+        "FPR": np.sum((p == 1) & (a == 0)) / np.sum(a == 0),
+        "PPV": np.sum((p == 1) & (a == 1)) / np.sum(p == 1),
+    }
+
+
+def test_multi_group_report_matches_per_group_counts():
+    rng = np.random.default_rng(0)
+    predictions = rng.integers(0, 2, 5000)
+    actuals = rng.integers(0, 2, 5000)
+    region = rng.choice(np.array(["north", "south", "east"]), 5000)
+
+    report = FairnessMetric().compute(predictions, actuals, {"region": region}, {"region": "south"})["region"]
+
+    assert report["reference_group"] == "south"
+    for label in ("north", "south", "east"):
+        expected = reference_rates(predictions, actuals, region, label)
+        for name, value in expected.items():
+            assert report["groups"][label][name] == pytest.approx(value)
+
+    selection = {label: report["groups"][label]["selection_rate"] for label in report["groups"]}
+    assert report["disparate_impact"]["by_group"]["north"] == pytest.approx(selection["north"] / selection["south"])
+    assert report["demographic_parity"]["difference"] == pytest.approx(max(selection.values()) - min(selection.values()))
+
+
+def test_binary_methods_keep_their_legacy_results():
+    predictions = [1, 0, 1, 1, 0, 1, 0, 0]
+    actuals = [1, 0, 0, 1, 1, 1, 0, 1]
+    sensitive = [0, 0, 0, 0, 1, 1, 1, 1]
+    metric = FairnessMetric()
+
+    assert metric.disparate_impact(predictions, sensitive)["disparate_impact"] == pytest.approx(0.25 / 0.75)
+    odds = metric.equalized_odds(predictions, actuals, sensitive)
+    assert odds["TPR_difference"] == pytest.approx(1.0 - 1 / 3)
+    assert odds["FPR_difference"] == pytest.approx(0.5)
+
+    report = metric.compute(predictions, actuals, {"s": sensitive})["s"]
+    assert report["disparate_impact"]["ratio"] == pytest.approx(0.25 / 0.75)
+    assert report["equalized_odds"]["TPR_difference"] == pytest.approx(odds["TPR_difference"])
+
+
+def test_integer_groups_skip_the_sort():
+    labels, codes = encode_groups(np.array([7, 3, 7, 0]))
+    assert labels.tolist() == [0, 3, 7]
+    assert codes.tolist() == [2, 1, 2, 0]
+
+
+def test_fairness_route(client):
+    response = client.post("/metrics/fairness/compute", headers=HEADERS, json={
+        "predictions": [1, 0, 1, 1], "actuals": [1, 0, 0, 1],
+        "sensitive_attribute": [0, 0, 1, 1], "sensitive_attributes": {"age": ["young", "old", "old", "young"]},
+    })
+    assert response.status_code == 200
+    assert set(response.json()) == {"sensitive_attribute", "age"}
+
+    response = client.post("/metrics/fairness/compute", headers=HEADERS, json={
+        "predictions": [1, 0], "actuals": [1, 0], "sensitive_attribute": [0]})
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+import numpy as np
+
+from metrics.anomaly.anomaly import AnomalyMetric
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(0)
+
+
+def test_stacked_scores_match_one_model_at_a_time():
+    detector = AnomalyMetric()
+    models = [detector.prepare(detector.fit(RNG.normal(loc=i, size=(200, 3)))) for i in range(4)]
+    models.append(detector.prepare(detector.fit(RNG.normal(size=(200, 2)))))
+    points = RNG.normal(loc=1, scale=2, size=(7, 3))
+
+    results = detector.detect_many(points, models)
+    assert results[-1] == "Dimension mismatch"
+    for model, result in zip(models, results[:-1]):
+        expected = detector.detect_batch(points, model)["results"]
+        for name, column in expected.items():
+            assert np.allclose(result[name], column)
+
+
+def test_detect_many_fetches_misses_in_one_store_call(client, store, monkeypatch):
+    for i in range(3):
+        client.post("/metrics/anomaly/fit", headers=HEADERS,
+                    json={"user_token": 1, "run_id": f"host-{i}", "training_data": RNG.normal(loc=i, size=(100, 2)).tolist()})
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 2, "run_id": "host-9", "training_data": RNG.normal(size=(100, 2)).tolist()})
+
+    calls = []
+    load_models_versioned = store.load_models_versioned
+
+    async def counting_load_models_versioned(user_token, run_ids):
+        calls.append(list(run_ids))
+        return await load_models_versioned(user_token, run_ids)
+
+    monkeypatch.setattr(store, "load_models_versioned", counting_load_models_versioned)
+    body = {"user_token": 1, "run_ids": ["host-0", "host-1", "host-2", "host-9"], "values": [[4.0, 4.0]]}
+    result = client.post("/metrics/anomaly/detect/many", headers=HEADERS, json=body).json()
+    assert calls == [["host-0", "host-1", "host-2", "host-9"]]
+    assert set(result["results"]) == {"host-0", "host-1", "host-2"} and result["not_found"] == ["host-9"]
+    assert "host-0" in result["anomalous_run_ids"] and "host-2" not in result["anomalous_run_ids"]
+
+    by_prefix = client.post("/metrics/anomaly/detect/many", headers=HEADERS,
+                            json={"user_token": 1, "run_id_prefix": "host-", "values": [[4.0, 4.0]]}).json()
+    assert by_prefix["results"] == result["results"] and len(calls) == 1
+
+    both = client.post("/metrics/anomaly/detect/many", headers=HEADERS, json={**body, "run_id_prefix": "host-"})
+    assert both.status_code == 400
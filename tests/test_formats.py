@@ -0,0 +1,60 @@
+import importlib.util
+import io
+import json
+
+import numpy as np
+import pytest
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+TRAINING = np.random.default_rng(0).normal(size=(200, 3))
+
+
+def npy(array):
+    stream = io.BytesIO()
+    np.save(stream, array)
+    return stream.getvalue()
+
+
+def test_npy_fit_and_detect_match_json(client):
+    response = client.post("/metrics/anomaly/fit", params={"user_token": 1, "run_id": "npy"},
+                           headers={**HEADERS, "Content-Type": "application/x-npy"}, content=npy(TRAINING))
+    assert response.status_code == 200
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "run_id": "json", "training_data": TRAINING.tolist()})
+
+    points = TRAINING[:20] * 3
+    expected = client.post("/metrics/anomaly/detect/batch", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "json", "values": points.tolist()}).json()
+    response = client.post("/metrics/anomaly/detect/batch", params={"user_token": 1, "run_id": "npy"},
+                           headers={**HEADERS, "Content-Type": "application/x-npy", "Accept": "application/x-npy"},
+                           content=npy(np.asfortranarray(points.astype(np.float32))))
+    assert response.headers["content-type"] == "application/x-npy"
+    results = np.load(io.BytesIO(response.content))
+    assert np.allclose(results["mahalanobis_distance"], expected["results"]["mahalanobis_distance"], rtol=1e-5)
+    assert json.loads(response.headers["X-Metadata"])["anomalies"] == expected["summary"]["anomalies"]
+
+    single = client.post("/metrics/anomaly/detect", params={"user_token": 1, "run_id": "npy"},
+                         headers={**HEADERS, "Content-Type": "application/x-npy"}, content=npy(TRAINING[0]))
+    assert single.json()["result"]["anomaly_detected"] is False
+
+
+def test_structured_npy_fairness_columns(client):
+    rows = np.zeros(4, dtype=[("predictions", "i8"), ("actuals", "i8"), ("group", "i8")])
+    rows["predictions"], rows["actuals"], rows["group"] = [1, 0, 1, 1], [1, 0, 0, 1], [0, 0, 1, 1]
+    response = client.post("/metrics/fairness/compute", headers={**HEADERS, "Content-Type": "application/x-npy"}, content=npy(rows))
+    assert response.status_code == 200
+    assert response.json()["group"]["disparate_impact"]["ratio"] == 2.0
+
+
+def test_bad_binary_bodies_are_rejected(client):
+    binary = {**HEADERS, "Content-Type": "application/x-npy"}
+    assert client.post("/metrics/anomaly/fit", params={"user_token": 1}, headers=binary, content=b"not npy").status_code == 400
+    assert client.post("/metrics/anomaly/fit", params={"user_token": 1}, headers=binary,
+                       content=npy(np.array(["a", "b"]))).status_code == 400
+    assert client.post("/metrics/anomaly/fit", headers=binary, content=npy(TRAINING)).status_code == 422
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed")
+def test_missing_codec_answers_415(client):
+    response = client.post("/metrics/anomaly/fit", params={"user_token": 1},
+                           headers={**HEADERS, "Content-Type": "application/vnd.apache.arrow.stream"}, content=b"")
+    assert response.status_code == 415
@@ -0,0 +1,63 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher, batch_sizes
+from metrics.anomaly.registry import DETECTORS
+from services.anomaly_service import AnomalyService
+
+RNG = np.random.default_rng(0)
+
+
+def test_concurrent_detects_share_one_lookup_and_pass(loads, monkeypatch):
+    service = AnomalyService()
+    asyncio.run(service.fit(1, "shared", RNG.normal(size=(200, 3))))
+    service.cache.clear()
+    loads.clear()
+    points = RNG.normal(scale=2, size=(12, 3)).tolist()
+    expected = [asyncio.run(AnomalyService().detect(1, "shared", point)) for point in points]
+
+    service.cache.clear()
+    loads.clear()
+    service.batcher = MicroBatcher("test", service._detect_points, 0.005, 64)
+    passes = []
+    score = DETECTORS["gaussian"]._score
+    monkeypatch.setattr(DETECTORS["gaussian"], "_score", lambda *args: passes.append(1) or score(*args))
+
+    async def concurrent():
+        return await asyncio.gather(*(service.detect(1, "shared", point) for point in points),
+                                    service.detect(1, "shared", [1.0, 2.0]),
+                                    service.detect(2, "shared", points[0]))
+
+    *results, mismatch, unauthorized = asyncio.run(concurrent())
+    # One lookup per (user, run) batch; the 3-feature points are scored in one pass, the 2-feature one fails.
+    assert loads == ["shared", "shared"] and len(passes) == 2
+    for result, single in zip(results, expected):
+        assert result.keys() == single.keys()
+        assert result["anomaly_detected"] == single["anomaly_detected"]
+        assert result["mahalanobis_distance"] == pytest.approx(single["mahalanobis_distance"])
+    assert mismatch == "Dimension mismatch" and unauthorized is None
+
+
+def test_batches_close_at_max_size_and_share_errors():
+    calls = []
+
+    async def process(key, items):
+        calls.append(list(items))
+        if key == "broken":
+            raise RuntimeError("store down")
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher("test", process, 10.0, 3)
+
+    async def run():
+        doubled = await asyncio.gather(*(batcher.submit("ok", i) for i in range(3)))
+        failed = await asyncio.gather(*(batcher.submit("broken", i) for i in range(3)), return_exceptions=True)
+        return doubled, failed
+
+    doubled, failed = asyncio.run(run())
+    # The 10 s window never fired: both batches closed on size.
+    assert doubled == [0, 2, 4] and calls[0] == [0, 1, 2]
+    assert all(isinstance(error, RuntimeError) for error in failed)
+    assert any('batcher="test",reason="size"' in line for line in batch_sizes.collect())
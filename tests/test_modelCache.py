@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from cache import ModelCache
+from services.anomaly_service import AnomalyService
+
+
+def test_lru_eviction():
+    cache = ModelCache(maxsize=2, ttl=60)
+    cache.put(1, "a", "A")
+    cache.put(1, "b", "B")
+    cache.get(1, "a")
+    cache.put(1, "c", "C")
+
+    assert cache.get(1, "b") is None
+    assert cache.get(1, "a") == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = ModelCache(maxsize=2, ttl=5)
+    cache.put(1, "a", "A")
+
+    now[0] += 4
+    assert cache.get(1, "a") == "A"
+    now[0] += 2
+    assert cache.get(1, "a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_invalidate_drops_all_users_of_a_run():
+    cache = ModelCache(maxsize=4, ttl=60)
+    cache.put(1, "a", "A")
+    cache.put(2, "a", "A")
+    cache.put(1, "b", "B")
+
+    cache.invalidate("a")
+
+    assert cache.get(1, "a") is None
+    assert cache.get(2, "a") is None
+    assert cache.get(1, "b") == "B"
+
+
+@pytest.fixture
+def service(store):
+    service = AnomalyService()
+    service.cache = ModelCache(maxsize=8, ttl=60)
+    return service
+
+
+def test_service_serves_repeated_detects_from_cache(loads, service):
+    asyncio.run(service.fit(1, "run", [[10, 20], [12, 22], [14, 21]]))
+    asyncio.run(service.detect(1, "run", [11, 21]))
+    asyncio.run(service.detect(1, "run", [11, 21]))
+
+    assert loads == ["run"]
+    cached = service.cache.get(1, "run")
+    assert isinstance(cached["means"], np.ndarray)
+    assert not cached["means"].flags.writeable
+
+
+def test_service_refit_and_delete_invalidate(service):
+    asyncio.run(service.fit(1, "run", [[10, 20], [12, 22], [14, 21]]))
+    asyncio.run(service.detect(1, "run", [11, 21]))
+    asyncio.run(service.fit(1, "run", [[100, 200], [120, 220], [140, 210]]))
+
+    assert asyncio.run(service.detect(1, "run", [120, 210]))["anomaly_detected"] is False
+    assert asyncio.run(service.delete_model(1, "run"))
+    assert asyncio.run(service.detect(1, "run", [120, 210])) is None
+
+
+def test_saves_by_another_worker_are_seen_within_the_revalidation_interval(loads, service, monkeypatch):
+    import services.base_service as base_service
+    monkeypatch.setattr(base_service, "MODEL_CACHE_REVALIDATE_SECONDS", 0.05)
+    other_worker = AnomalyService()
+    other_worker.cache = ModelCache(maxsize=8, ttl=60)
+
+    asyncio.run(service.fit(1, "run", [[10, 20], [12, 22], [14, 21]]))
+    assert asyncio.run(service.detect(1, "run", [120, 210]))["anomaly_detected"] is True
+    asyncio.run(other_worker.fit(1, "run", [[100, 200], [120, 220], [140, 210]]))
+    # Within the interval the cached model is served as is; after it, one version read finds the refit.
+    assert asyncio.run(service.detect(1, "run", [120, 210]))["anomaly_detected"] is True
+    time.sleep(0.06)
+    assert asyncio.run(service.detect(1, "run", [120, 210]))["anomaly_detected"] is False
+    time.sleep(0.06)
+    asyncio.run(service.detect(1, "run", [120, 210]))
+    # An unchanged model is confirmed without being loaded again.
+    assert loads == ["run", "run"]
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from metrics.anomaly.anomaly import AnomalyMetric
+from storage import FileModelStore, MemoryModelStore
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(5)
+MODEL = AnomalyMetric().fit(RNG.normal(size=(50, 3)))
+
+
+@pytest.fixture(params=["memory", "file"])
+def backend(request, tmp_path):
+    store = MemoryModelStore() if request.param == "memory" else FileModelStore(str(tmp_path))
+    asyncio.run(store.connect())
+    return store
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_listing_pages_through_the_users_models(backend):
+    for run_id in ("c", "a", "b", "d"):
+        run(backend.save_model(1, run_id, MODEL))
+    run(backend.save_model(2, "z", MODEL))
+    run(backend.save_model(1, "a", MODEL))
+
+    first = run(backend.list_models(1, 2))
+    assert [entry["run_id"] for entry in first] == ["a", "b"]
+    assert [entry["run_id"] for entry in run(backend.list_models(1, 2, after="b"))] == ["c", "d"]
+    assert run(backend.list_models(1, 2, after="d")) == []
+
+    entry = first[0]
+    assert entry["algorithm"] == "gaussian" and entry["version"] == 2
+    assert entry["created_at"] <= entry["updated_at"] and entry["last_used"] is None
+    assert "means" not in entry
+
+
+def test_bulk_delete_and_garbage_collection(backend):
+    for run_id in ("a", "b", "c", "d"):
+        run(backend.save_model(1, run_id, MODEL))
+    run(backend.save_model(2, "e", MODEL))
+
+    assert run(backend.delete_models(1, ["a", "e", "missing"])) == 1
+    now = time.time()
+    run(backend.touch_models({"b": now + 10}))
+    assert run(backend.delete_unused_models(1, now + 5, 1)) == ["c"]
+    assert run(backend.delete_unused_models(1, now + 5, 10)) == ["d"]
+    assert run(backend.delete_unused_models(None, now + 5, 10)) == ["e"]
+    assert [entry["run_id"] for entry in run(backend.list_models(1, 10))] == ["b"]
+
+
+def test_catalog_routes(client, store):
+    for i in range(3):
+        client.post("/metrics/anomaly/fit", headers=HEADERS,
+                    json={"user_token": 1, "run_id": f"run-{i}", "training_data": RNG.normal(size=(100, 2)).tolist()})
+
+    page = client.get("/metrics/models/1", headers=HEADERS, params={"limit": 2}).json()
+    assert [entry["run_id"] for entry in page["models"]] == ["run-0", "run-1"] and page["next_after"] == "run-1"
+    page = client.get("/metrics/models/1", headers=HEADERS, params={"limit": 2, "after": "run-1"}).json()
+    assert [entry["run_id"] for entry in page["models"]] == ["run-2"] and page["next_after"] is None
+    assert client.get("/metrics/models/1", headers=HEADERS, params={"limit": 0}).status_code == 422
+
+    # A detection not yet flushed to the store still counts as a use.
+    time.sleep(0.2)
+    client.post("/metrics/anomaly/detect", headers=HEADERS, json={"user_token": 1, "run_id": "run-0", "values": [0.0, 0.0]})
+    result = client.post("/metrics/models/collect", headers=HEADERS, json={"user_token": 1, "unused_seconds": 0.1}).json()
+    assert result == {"deleted": 2, "run_ids": ["run-1", "run-2"]}
+
+    assert client.post("/metrics/models/delete", headers=HEADERS, json={"user_token": 1, "run_ids": ["run-0"]}).json() == {"deleted": 1}
+    # The cached model goes with the stored one.
+    detect = client.post("/metrics/anomaly/detect", headers=HEADERS, json={"user_token": 1, "run_id": "run-0", "values": [0.0, 0.0]})
+    assert detect.status_code == 403
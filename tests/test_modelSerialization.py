@@ -0,0 +1,60 @@
+import json
+import os
+
+import bson
+import numpy as np
+
+from metrics.anomaly.anomaly import AnomalyMetric
+from serialization import MODEL_FORMAT_VERSION, decode_model_data, encode_model_data
+
+TEST_RUN = os.path.join(os.path.dirname(__file__), "1_test_run.json")
+
+
+def test_round_trip_keeps_arrays_and_scalars():
+    model = AnomalyMetric().fit(np.random.default_rng(0).normal(size=(100, 4)))
+    stored = encode_model_data(model)
+    decoded = decode_model_data(bson.decode(bson.encode(stored)))
+
+    assert stored["format_version"] == MODEL_FORMAT_VERSION
+    assert decoded["n_samples"] == 100
+    for name in ("means", "stds", "precision_cholesky"):
+        assert np.array_equal(decoded[name], model[name])
+        assert not decoded[name].flags.writeable
+
+
+def test_float32_storage_halves_parameter_size():
+    model = AnomalyMetric().fit(np.random.default_rng(0).normal(size=(100, 50)))
+    model.pop("moments")
+    full = len(bson.encode(encode_model_data(model)))
+    compact = len(bson.encode(encode_model_data(model, dtype="float32")))
+
+    assert compact < 0.55 * full
+    assert decode_model_data(encode_model_data(model, dtype="float32"))["means"].dtype == np.float32
+
+
+def test_binary_is_smaller_than_lists():
+    model = AnomalyMetric().fit(np.random.default_rng(0).normal(size=(100, 50)))
+    model.pop("moments")
+    as_lists = {name: value.tolist() if isinstance(value, np.ndarray) else value for name, value in model.items()}
+
+    assert len(bson.encode(encode_model_data(model))) < len(bson.encode(as_lists))
+
+
+def test_legacy_document_is_decoded_into_arrays():
+    with open(TEST_RUN) as f:
+        legacy = json.load(f)
+
+    decoded = decode_model_data(legacy)
+
+    assert isinstance(decoded["means"], np.ndarray)
+    assert decoded["data_points"].shape == (3, 3)
+    result = AnomalyMetric().detect([50.0, 5.0, 100.0], AnomalyMetric().prepare(decoded))
+    assert result["anomaly_detected"] is False
+
+
+def test_moments_keep_full_precision():
+    model = AnomalyMetric().fit(np.random.default_rng(0).normal(size=(100, 5)))
+    decoded = decode_model_data(encode_model_data(model, dtype="float32"))
+
+    assert decoded["means"].dtype == np.float32
+    assert decoded["moments"]["comoment"].dtype == np.float64
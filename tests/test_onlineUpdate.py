@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from cache import ModelCache
+from metrics.anomaly.anomaly import AnomalyMetric
+from services.anomaly_service import AnomalyService
+
+rng = np.random.default_rng(2)
+BATCHES = [rng.normal(loc=i, size=(200, 3)) for i in range(3)]
+
+
+def test_update_matches_refit_on_all_data():
+    model = AnomalyMetric().fit(BATCHES[0])
+    updated = AnomalyMetric().update(model, BATCHES[1])
+    refit = AnomalyMetric().fit(np.vstack(BATCHES[:2]))
+
+    for name in ("means", "stds", "precision_cholesky"):
+        assert np.allclose(updated[name], refit[name])
+
+
+def test_decay_down_weights_old_data():
+    model = AnomalyMetric().fit(BATCHES[0])
+    updated = AnomalyMetric().update(model, BATCHES[1], decay=0.5)
+
+    assert updated["n_samples"] == pytest.approx(300)
+    expected_mean = (0.5 * 200 * BATCHES[0].mean(axis=0) + 200 * BATCHES[1].mean(axis=0)) / 300
+    assert np.allclose(updated["means"], expected_mean)
+
+
+def test_window_keeps_only_recent_batches():
+    model = AnomalyMetric().fit(BATCHES[0])
+    for batch in BATCHES[1:]:
+        model = AnomalyMetric().update(model, batch, window=2)
+
+    refit = AnomalyMetric().fit(np.vstack(BATCHES[1:]))
+    assert len(model["window"]) == 2
+    assert np.allclose(model["means"], refit["means"])
+    assert np.allclose(model["precision_cholesky"], refit["precision_cholesky"])
+
+
+def test_update_rejects_models_without_moments():
+    with pytest.raises(ValueError):
+        AnomalyMetric().update({"means": [0.0, 0.0, 0.0], "stds": [1.0, 1.0, 1.0]}, BATCHES[0])
+
+
+@pytest.fixture
+def lost_races(store, monkeypatch):
+    """Makes the next N compare-and-swaps lose against a concurrent writer."""
+    races = [0]
+    update_model_if_version = store.update_model_if_version
+
+    async def racing_update(user_token, run_id, model_data, expected_version):
+        if races[0]:
+            races[0] -= 1
+            model_data, version = await store.load_model_version(user_token, run_id)
+            await update_model_if_version(user_token, run_id, model_data, version)
+            return False
+        return await update_model_if_version(user_token, run_id, model_data, expected_version)
+
+    monkeypatch.setattr(store, "update_model_if_version", racing_update)
+    return races
+
+
+@pytest.fixture
+def service(store):
+    service = AnomalyService()
+    service.cache = ModelCache(maxsize=8, ttl=60)
+    return service
+
+
+def test_service_update_retries_after_a_lost_race(lost_races, service):
+    asyncio.run(service.fit(1, "live", BATCHES[0]))
+    lost_races[0] = 2
+
+    result = asyncio.run(service.update(1, "live", BATCHES[1]))
+
+    assert result["version"] == 4
+    assert result["n_samples"] == 400
+
+
+def test_service_update_gives_up_on_persistent_conflicts(lost_races, service):
+    asyncio.run(service.fit(1, "live", BATCHES[0]))
+    lost_races[0] = 100
+
+    assert asyncio.run(service.update(1, "live", BATCHES[1])) == "Concurrent update conflict"
+
+
+def test_service_update_invalidates_cached_model(store, service):
+    asyncio.run(service.fit(1, "live", BATCHES[0]))
+    before = asyncio.run(service.detect(1, "live", [2, 2, 2]))
+    asyncio.run(service.update(1, "live", BATCHES[2], decay=0.01))
+
+    assert asyncio.run(service.detect(1, "live", [2, 2, 2]))["mahalanobis_distance"] < before["mahalanobis_distance"]
+    assert asyncio.run(service.update(1, "missing", BATCHES[1])) is None
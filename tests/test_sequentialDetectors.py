@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from metrics.sequential import SequentialMonitor
+from metrics.sequential.sequential import season_slots
+from routes import sequential_service
+from services import sequential_service as sequential_module
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+RNG = np.random.default_rng(17)
+CHARTS = {"ewma": {"smoothing": 0.2, "width": 3.0}, "cusum": {"slack": 0.5, "threshold": 5.0},
+          "seasonal": {"season": "hour_of_day", "smoothing": 0.1, "threshold": 4.0, "min_points": 5}}
+
+
+def monitor():
+    return SequentialMonitor(np.zeros(2), np.ones(2), **CHARTS)
+
+
+def naive_scores(points, timestamps):
+    """The chart recursions one point at a time."""
+    ewma, high, low, count = np.zeros(2), np.zeros(2), np.zeros(2), 0
+    slots = {}
+    scores = {"ewma": [], "cusum": [], "seasonal": []}
+    for x, timestamp in zip(points, timestamps):
+        count += 1
+        ewma = 0.2 * x + 0.8 * ewma
+        scores["ewma"].append(np.abs(ewma).max() / (3 * np.sqrt(0.2 / 1.8 * (1 - 0.8 ** (2 * count)))))
+        high, low = np.maximum(0, high + x - 0.5), np.maximum(0, low - x - 0.5)
+        scores["cusum"].append(np.maximum(high, low).max() / 5.0)
+        mean, square, seen = slots.get(int(timestamp // 3600) % 24, (np.zeros(2), np.zeros(2), 0))
+        score = 0.0
+        if seen >= 5:
+            weight = 1 - 0.9 ** seen
+            std = np.sqrt(square / weight - (mean / weight) ** 2)
+            score = (np.abs(x - mean / weight) / std).max() / 4.0
+        scores["seasonal"].append(score)
+        slots[int(timestamp // 3600) % 24] = (0.1 * x + 0.9 * mean, 0.1 * x ** 2 + 0.9 * square, seen + 1)
+    return scores
+
+
+def test_batched_scans_match_the_point_by_point_recursions():
+    points = RNG.normal(size=(200, 2))
+    points[150:] += 2.0
+    timestamps = 1_700_000_000 + 1800 * np.arange(200)
+    expected = naive_scores(points, timestamps)
+
+    whole = monitor().observe(points, timestamps)["results"]
+    split = monitor()
+    parts = [split.observe(points[start:stop], timestamps[start:stop])["results"]
+             for start, stop in ((0, 1), (1, 70), (70, 71), (71, 200))]
+    for name, scores in expected.items():
+        assert np.allclose(whole[f"{name}_score"], scores)
+        assert np.allclose(sum((part[f"{name}_score"] for part in parts), []), scores)
+    # The shift at row 150 is caught within a few points.
+    assert any(whole["cusum_alarm"][150:160]) and not any(whole["cusum_alarm"][:100])
+
+
+def test_register_observe_checkpoint_and_unregister(client, store):
+    sequential_module._monitors.clear()
+    client.post("/metrics/anomaly/fit", headers=HEADERS,
+                json={"user_token": 1, "run_id": "seq", "training_data": RNG.normal(size=(300, 2)).tolist()})
+    assert client.post("/metrics/sequential/register", headers=HEADERS,
+                       json={"user_token": 1, "run_id": "seq"}).status_code == 400
+    assert client.post("/metrics/sequential/register", headers=HEADERS,
+                       json={"user_token": 2, "run_id": "seq", "cusum": {}}).status_code == 403
+    registered = client.post("/metrics/sequential/register", headers=HEADERS,
+                             json={"user_token": 1, "run_id": "seq", "ewma": {}, "cusum": {}}).json()
+    assert registered["sequential"]["cusum"] == {"slack": 0.5, "threshold": 5.0} and registered["sequential"]["seasonal"] is None
+
+    observed = client.post("/metrics/sequential/observe", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "seq", "values": (RNG.normal(size=(20, 2)) + 4).tolist()}).json()
+    assert observed["summary"]["count"] == 20 and observed["summary"]["alarms"]["cusum"] > 0
+    assert set(observed["results"]) == {"ewma_score", "ewma_alarm", "cusum_score", "cusum_alarm"}
+    mismatch = client.post("/metrics/sequential/observe", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "seq", "values": [[1.0, 2.0, 3.0]]})
+    assert mismatch.status_code == 400 and mismatch.json()["detail"] == "Dimension mismatch"
+
+    # A restarted worker picks the charts up from the last checkpoint.
+    status = client.get("/metrics/sequential/1/seq", headers=HEADERS).json()
+    asyncio.run(sequential_service.flush_monitors())
+    sequential_module._monitors.clear()
+    assert client.get("/metrics/sequential/1/seq", headers=HEADERS).json() == status
+    assert status["observed"] == 20
+
+    assert client.delete("/metrics/sequential/1/seq", headers=HEADERS).status_code == 200
+    assert client.get("/metrics/sequential/1/seq", headers=HEADERS).status_code == 404
+    assert client.post("/metrics/sequential/observe", headers=HEADERS,
+                       json={"user_token": 1, "run_id": "seq", "values": [[0.0, 0.0]]}).status_code == 400
+
+
+@pytest.mark.parametrize("season, slots", [("hour_of_day", [0, 23, 0]), ("day_of_week", [3, 3, 4]), ("hour_of_week", [72, 95, 96])])
+def test_season_slots_are_utc(season, slots):
+    # Thursday 1 January 1970 at midnight and 23:00 UTC, then Friday at midnight.
+    assert season_slots([0, 23 * 3600, 24 * 3600], season).tolist() == slots
@@ -0,0 +1,44 @@
+import os
+import time
+
+import numpy as np
+
+import services.anomaly_service
+from metrics.anomaly.anomaly import AnomalyMetric
+from shared_models import SharedModelSegments
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+TRAINING = np.random.default_rng(0).normal(size=(100, 4))
+
+
+def test_workers_map_one_segment_per_model_version(tmp_path):
+    detector = AnomalyMetric()
+    prepared = detector.prepare(detector.fit(TRAINING))
+    first, second = SharedModelSegments(str(tmp_path), ttl=60), SharedModelSegments(str(tmp_path), ttl=60)
+
+    shared = first.share(prepared)
+    attached = second.share(detector.prepare(detector.fit(TRAINING)))
+    assert len(os.listdir(tmp_path)) == 1
+    assert not attached["precision_cholesky"].flags.writeable
+    assert np.array_equal(attached["precision_cholesky"], prepared["precision_cholesky"])
+    assert detector.detect(TRAINING[0] * 4, attached) == detector.detect(TRAINING[0] * 4, prepared)
+
+    refit = first.share(detector.prepare(detector.fit(TRAINING[:50])))
+    assert len(os.listdir(tmp_path)) == 2
+    assert not np.array_equal(refit["means"], shared["means"])
+
+    stale = time.time() - 120
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (stale, stale))
+    second._last_sweep = 0.0
+    second.share(prepared)
+    assert len(os.listdir(tmp_path)) == 1
+    assert np.array_equal(refit["means"], detector.prepare(detector.fit(TRAINING[:50]))["means"])
+
+
+def test_detect_reads_shared_parameters(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(services.anomaly_service, "shared_models", SharedModelSegments(str(tmp_path), ttl=60))
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "run_id": "s", "training_data": TRAINING.tolist()})
+    response = client.post("/metrics/anomaly/detect", headers=HEADERS, json={"user_token": 1, "run_id": "s", "values": [9, 9, 9, 9]})
+    assert response.json()["result"]["anomaly_detected"] is True
+    assert len(os.listdir(tmp_path)) == 1
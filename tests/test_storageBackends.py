@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from metrics.anomaly.anomaly import AnomalyMetric
+from storage import FileModelStore, MemoryModelStore
+
+MODEL = AnomalyMetric().fit(np.random.default_rng(3).normal(size=(50, 4)))
+
+
+@pytest.fixture(params=["memory", "file"])
+def backend(request, tmp_path):
+    store = MemoryModelStore() if request.param == "memory" else FileModelStore(str(tmp_path))
+    asyncio.run(store.connect())
+    return store
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_save_and_load_respects_access(backend):
+    run(backend.save_model(1, "run", MODEL))
+
+    loaded = run(backend.load_model(1, "run"))
+    assert np.allclose(loaded["precision_cholesky"], MODEL["precision_cholesky"])
+    assert "moments" not in loaded
+    assert run(backend.load_model(2, "run")) is None
+    assert run(backend.load_model(1, "missing")) is None
+
+
+def test_versions_and_compare_and_swap(backend):
+    run(backend.save_model(1, "run", MODEL))
+    run(backend.save_model(2, "run", MODEL))
+
+    model_data, version = run(backend.load_model_version(2, "run"))
+    assert version == 2
+    assert "moments" in model_data
+    assert run(backend.update_model_if_version(1, "run", MODEL, 2))
+    assert not run(backend.update_model_if_version(1, "run", MODEL, 2))
+    assert run(backend.load_model_version(1, "run"))[1] == 3
+
+    loaded = run(backend.load_models_versioned(1, ["run", "missing"]))
+    assert list(loaded) == ["run"] and loaded["run"][1] == 3
+    assert "moments" not in loaded["run"][0]
+    assert run(backend.load_models_versioned(3, ["run"])) == {}
+
+
+def test_delete(backend):
+    run(backend.save_model(1, "run", MODEL))
+
+    assert not run(backend.delete_model(2, "run"))
+    assert run(backend.delete_model(1, "run"))
+    assert run(backend.load_model(1, "run")) is None
+    assert not run(backend.delete_model(1, "run"))
+
+
+def test_states(backend):
+    state = {"run_id": None, "moments": MODEL["moments"]}
+    run(backend.save_state("fit_session", 1, "abc", state))
+
+    loaded = run(backend.load_state("fit_session", 1, "abc"))
+    assert loaded["run_id"] is None
+    assert np.allclose(loaded["moments"]["comoment"], MODEL["moments"]["comoment"])
+    assert run(backend.load_state("fit_session", 2, "abc")) is None
+    assert run(backend.delete_state("fit_session", 1, "abc"))
+    assert run(backend.load_state("fit_session", 1, "abc")) is None
+
+
+def test_migration_runs_on_every_backend(backend, monkeypatch):
+    import db
+    monkeypatch.setattr(db, "store", backend)
+    assert run(db.migrate()) == 0
+
+
+def test_file_store_memory_maps_arrays_and_keeps_paths_inside_root(tmp_path):
+    store = FileModelStore(str(tmp_path))
+    run(store.save_model(1, "../escape", MODEL))
+
+    loaded = run(store.load_model(1, "../escape"))
+    assert isinstance(loaded["means"], np.memmap)
+    assert not loaded["means"].flags.writeable
+    assert os.listdir(tmp_path) == ["models"]
+
+
+def test_file_store_drops_old_versions(tmp_path):
+    store = FileModelStore(str(tmp_path))
+    for _ in range(4):
+        run(store.save_model(1, "run", MODEL))
+
+    run_dir = os.path.join(tmp_path, "models", "run".encode().hex())
+    assert sorted(entry for entry in os.listdir(run_dir) if entry.startswith("v")) == ["v3", "v4"]
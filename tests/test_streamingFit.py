@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from metrics.anomaly.anomaly import AnomalyMetric
+from metrics.anomaly.moments import MomentAccumulator
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+DATA = np.random.default_rng(1).normal(loc=[5, -3, 100], scale=[1, 2, 10], size=(1000, 3))
+
+
+def test_merged_chunks_match_direct_moments():
+    moments = MomentAccumulator()
+    for chunk in np.array_split(DATA, [1, 7, 300, 640]):
+        moments.update(chunk)
+
+    centered = DATA - DATA.mean(axis=0)
+    squared_norms = np.sum(centered ** 2, axis=1)
+    assert moments.count == len(DATA)
+    assert np.allclose(moments.mean, DATA.mean(axis=0))
+    assert np.allclose(moments.covariance(), np.cov(DATA, rowvar=False))
+    assert np.allclose(moments.third_moment, squared_norms @ centered)
+    assert moments.fourth_moment == pytest.approx(np.sum(squared_norms ** 2))
+
+
+@pytest.mark.parametrize("covariance", ["empirical", "ledoit_wolf"])
+def test_chunked_fit_matches_one_shot_fit(covariance):
+    moments = MomentAccumulator()
+    for chunk in np.array_split(DATA, 10):
+        moments = MomentAccumulator.from_state(moments.update(chunk).to_state())
+
+    chunked = AnomalyMetric().fit_moments(moments, covariance)
+    one_shot = AnomalyMetric().fit(DATA, covariance)
+    for name in ("means", "stds", "precision_cholesky"):
+        assert np.allclose(chunked[name], one_shot[name])
+
+
+def test_dimension_mismatch_between_chunks():
+    moments = MomentAccumulator().update(DATA[:10])
+    with pytest.raises(ValueError):
+        moments.update(DATA[:10, :2])
+
+
+def test_session_with_json_and_ndjson_chunks(client):
+    response = client.post("/metrics/anomaly/fit/session", headers=HEADERS, json={"user_token": 1, "run_id": "streamed"})
+    session_id = response.json()["session_id"]
+
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/chunk", headers=HEADERS,
+                           json={"user_token": 1, "training_data": DATA[:400].tolist()})
+    assert response.json()["rows"] == 400
+
+    body = "\n".join(json.dumps(row) for row in DATA[400:].tolist())
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/stream", headers=HEADERS,
+                           params={"user_token": 1}, content=body.encode())
+    assert response.status_code == 200, response.text
+    assert response.json()["rows"] == 1000
+
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/finalize", headers=HEADERS, json={"user_token": 1})
+    assert response.json()["run_id"] == "streamed"
+
+    response = client.post("/metrics/anomaly/detect", headers=HEADERS,
+                           json={"user_token": 1, "run_id": "streamed", "values": [5, -3, 100]})
+    assert response.json()["result"]["anomaly_detected"] is False
+
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/finalize", headers=HEADERS, json={"user_token": 1})
+    assert response.status_code == 404
+
+
+def test_session_belongs_to_its_user(client):
+    session_id = client.post("/metrics/anomaly/fit/session", headers=HEADERS, json={"user_token": 1}).json()["session_id"]
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/chunk", headers=HEADERS,
+                           json={"user_token": 2, "training_data": [[1, 2, 3]]})
+    assert response.status_code == 404
+
+
+def test_one_row_fits_are_rejected(client):
+    response = client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "training_data": [[1, 2, 3]]})
+    assert response.status_code == 400 and response.json()["detail"] == "Training data must be a matrix with at least two rows"
+
+    session_id = client.post("/metrics/anomaly/fit/session", headers=HEADERS, json={"user_token": 1}).json()["session_id"]
+    client.post(f"/metrics/anomaly/fit/session/{session_id}/chunk", headers=HEADERS,
+                json={"user_token": 1, "training_data": [[1, 2, 3]]})
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/finalize", headers=HEADERS, json={"user_token": 1})
+    assert response.status_code == 400 and response.json()["detail"] == "Training data must be a matrix with at least two rows"
+
+
+def test_malformed_ndjson_is_rejected(client):
+    session_id = client.post("/metrics/anomaly/fit/session", headers=HEADERS, json={"user_token": 1}).json()["session_id"]
+    response = client.post(f"/metrics/anomaly/fit/session/{session_id}/stream", headers=HEADERS,
+                           params={"user_token": 1}, content=b"[1, 2, 3]\nnot json\n")
+    assert response.status_code == 400
+
+
+def test_overlapping_uploads_and_finalize_keep_every_row(store):
+    from routes import anomaly_service
+
+    async def chunks(rows):
+        for chunk in np.array_split(rows, 4):
+            # Yield to the other uploads between chunks.
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def scenario():
+        session_id = await anomaly_service.open_fit_session(1, "overlap")
+        uploads = [asyncio.create_task(anomaly_service.add_fit_stream(1, session_id, chunks(rows)))
+                   for rows in np.array_split(DATA, 3)]
+        await asyncio.sleep(0.005)
+        finalized = asyncio.create_task(anomaly_service.finalize_fit_session(1, session_id))
+        return await asyncio.gather(*uploads), await finalized
+
+    counts, finalized = asyncio.run(scenario())
+    # The uploads take turns on the session, and the finalize waits for them instead of fitting part of the data.
+    assert counts == [334, 667, 1000]
+    assert finalized == {"run_id": "overlap", "rows": len(DATA)}
@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+import pytest
+from sklearn.metrics import f1_score, precision_score
+
+from metrics.accuracy import AccuracyMetric, ClassCountAccumulator
+from metrics.buckets import BucketedCounts
+from metrics.fairness import FairnessMetric, GroupConfusionAccumulator
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+
+
+def labelled(rng, n):
+    y_true = rng.integers(0, 4, n)
+    y_pred = np.where(rng.random(n) < 0.7, y_true, rng.integers(0, 5, n))
+    return y_true, y_pred
+
+
+def test_accuracy_matches_sklearn_weighted_scores():
+    y_true, y_pred = labelled(np.random.default_rng(0), 2000)
+    result = AccuracyMetric().calculate(y_true, y_pred)
+    assert result["accuracy"] == pytest.approx(np.mean(y_true == y_pred))
+    assert result["precision"] == pytest.approx(precision_score(y_true, y_pred, average="weighted", zero_division=0))
+    assert result["f1_score"] == pytest.approx(f1_score(y_true, y_pred, average="weighted"))
+
+
+def test_merged_accumulators_equal_one_pass():
+    rng = np.random.default_rng(1)
+    y_true, y_pred = labelled(rng, 3000)
+    timestamps = rng.uniform(0, 5 * 3600, 3000)
+
+    whole = ClassCountAccumulator(3600).update(y_true, y_pred, timestamps)
+    parts = ClassCountAccumulator(3600).update(y_true[:1000], y_pred[:1000], timestamps[:1000])
+    parts.merge(ClassCountAccumulator.from_state(ClassCountAccumulator(3600).update(y_true[1000:], y_pred[1000:], timestamps[1000:]).to_state()))
+
+    assert parts.report() == pytest.approx(whole.report())
+    assert parts.report() == pytest.approx({"rows": 3000, **AccuracyMetric().calculate(y_true, y_pred)})
+
+    windows = whole.tumbling_reports(2 * 3600)
+    assert [window["start"] for window in windows] == [0, 7200, 14400]
+    first = timestamps < 7200
+    assert windows[0]["accuracy"] == pytest.approx(np.mean(y_true[first] == y_pred[first]))
+
+
+def test_fairness_accumulator_matches_batch_report():
+    rng = np.random.default_rng(2)
+    predictions, actuals = rng.integers(0, 2, 1000), rng.integers(0, 2, 1000)
+    groups = rng.choice(np.array(["b", "a", "c"]), 1000)
+
+    counts = GroupConfusionAccumulator(3600)
+    counts.update(predictions[:400], actuals[:400], {"g": groups[:400]}, 100.0)
+    counts.update(predictions[400:], actuals[400:], {"g": groups[400:]}, 200.0)
+
+    streamed = counts.report()["g"]
+    batch = FairnessMetric().compute(predictions, actuals, {"g": groups})["g"]
+    assert streamed["rows"] == 1000
+    assert streamed["reference_group"] == "a"
+    assert streamed["groups"] == batch["groups"]
+    assert streamed["equalized_odds"] == pytest.approx(batch["equalized_odds"])
+
+
+def test_sliding_windows_include_the_bucket_they_start_in():
+    buckets = BucketedCounts(3600, (2,)).add([0, 3600, 7200], [[1, 1], [2, 2], [5, 5]])
+    # At 02:30 the last minute and the last hour both reach into the 02:00 bucket; the hour also into 01:00.
+    assert buckets.total(start=9000 - 60).tolist() == [5, 5]
+    assert buckets.total(start=9000 - 3600).tolist() == [7, 7]
+    assert buckets.total(start=7200).tolist() == [5, 5]
+
+
+def test_push_and_report_routes(client, store):
+    rng = np.random.default_rng(3)
+    now = time.time()
+    for timestamp in (now - 3 * 86400, now):
+        y_true, y_pred = labelled(rng, 200)
+        response = client.post("/metrics/accuracy/stream/push", headers=HEADERS, json={
+            "user_token": 1, "run_id": "acc", "y_true": y_true.tolist(), "y_pred": y_pred.tolist(), "timestamps": [timestamp] * 200})
+        assert response.status_code == 200
+
+    report = client.post("/metrics/accuracy/stream/report", headers=HEADERS, json={"user_token": 1, "run_id": "acc"})
+    assert report.json()["rows"] == 400
+    recent = client.post("/metrics/accuracy/stream/report", headers=HEADERS,
+                         json={"user_token": 1, "run_id": "acc", "window_seconds": 86400})
+    assert recent.json()["rows"] == 200
+    # A window shorter than the hour bucket still sees the bucket it starts in.
+    last_minute = client.post("/metrics/accuracy/stream/report", headers=HEADERS,
+                              json={"user_token": 1, "run_id": "acc", "window_seconds": 60})
+    assert last_minute.json()["rows"] == 200
+    daily = client.post("/metrics/accuracy/stream/report", headers=HEADERS,
+                        json={"user_token": 1, "run_id": "acc", "tumbling_seconds": 86400})
+    assert [window["rows"] for window in daily.json()["windows"]] == [200, 200]
+
+    assert client.post("/metrics/accuracy/stream/report", headers=HEADERS, json={"user_token": 2, "run_id": "acc"}).status_code == 404
+
+    response = client.post("/metrics/fairness/stream/push", headers=HEADERS, json={
+        "user_token": 1, "run_id": "fair", "predictions": [1, 0, 1, 1], "actuals": [1, 0, 0, 1],
+        "sensitive_attributes": {"sex": [0, 0, 1, 1]}})
+    assert response.json()["rows"] == 4
+    report = client.post("/metrics/fairness/stream/report", headers=HEADERS,
+                         json={"user_token": 1, "run_id": "fair", "reference_groups": {"sex": 1}})
+    assert report.json()["attributes"]["sex"]["disparate_impact"]["by_group"] == {"0": 0.5, "1": 1.0}
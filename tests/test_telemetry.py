@@ -0,0 +1,45 @@
+import numpy as np
+
+from telemetry import Counter, Histogram, Registry, stage_seconds, requests_total
+
+HEADERS = {"X-API-Key": "mySuperSecureAndSecretAPIKey"}
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    counter = registry.register(Counter("hits", "Hits.", ("route",)))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/a")
+    counter.inc('/"quoted"')
+
+    text = registry.render()
+    assert 'latency_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_count{route="/a"} 3' in text
+    assert 'hits{route="/\\"quoted\\""} 1.0' in text
+
+
+def test_requests_are_counted_with_stage_timings(client, store):
+    data = np.random.default_rng(0).normal(size=(50, 3)).tolist()
+    client.post("/metrics/anomaly/fit", headers=HEADERS, json={"user_token": 1, "run_id": "t", "training_data": data})
+    before = requests_total._values.get(("/metrics/anomaly/detect/batch", "POST", 200), 0.0)
+
+    response = client.post("/metrics/anomaly/detect/batch", headers=HEADERS, json={"user_token": 1, "run_id": "t", "values": data})
+    assert response.status_code == 200
+    assert requests_total._values[("/metrics/anomaly/detect/batch", "POST", 200)] == before + 1
+
+    stages = {name for route, name in stage_seconds._series if route == "/metrics/anomaly/detect/batch"}
+    assert {"auth", "db", "compute", "compute_queue", "serialize"} <= stages
+    assert "endpoint" not in stages
+
+
+def test_metrics_endpoint_exposes_gauges(client):
+    client.get("/no/such/route")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'anomaly_model_cache{stat="hit_rate"}' in response.text
+    assert 'anomaly_compute_jobs{state="in_flight"}' in response.text
+    assert 'anomaly_requests_total{route="unmatched",method="GET",status="404"}' in response.text